@@ -0,0 +1,4 @@
+"""
+Benchmarks for the Star Map API.
+Run individual scripts with python -m benchmarks.<name>
+"""
@@ -0,0 +1,215 @@
+"""
+Load test of the star endpoints against an in-process table.
+
+Seeds the test-mode table stand-in with 1k, 10k and 100k stars and drives
+the real FastAPI app through an in-process ASGI client, with a number of
+requests in flight at once. Reports throughput and latency percentiles per
+endpoint and table size. --save writes the results as a baseline and
+--baseline compares against one, exiting with status 1 when an endpoint
+lost more than --tolerance of its throughput or p95.
+
+Runs without Redis, as a replica does when Redis is down: rate limits are
+enforced in process and /stars/popular takes its no-Redis path. Table calls
+take no time unless --table-latency gives them a latency distribution, and
+--throttle-rate makes that share of them fail with 503.
+
+Usage:
+    python -m benchmarks.bench_api [--sizes 1000,10000] [--seconds S] [--concurrency N]
+                                   [--table-latency MEDIAN_MS[,P99_MS]] [--throttle-rate R]
+                                   [--baseline FILE] [--save FILE]
+"""
+
+import os
+
+# The stand-in tables, no request logs, and rate limits too high to skew results
+os.environ["ENVIRONMENT"] = "test"
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+os.environ.setdefault("API_RATE_LIMIT_TIMES", "1000000000")
+os.environ.setdefault("API_RATE_LIMIT_VOTE_TIMES", "1000000000")
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from src.db.azure_tables import InstrumentedTableClient, _star_partitions, init_tables, tables
+from src.db.table_standin import Latency, LocalTableClient
+from src.db.versioning import bump_version
+from src.main import app
+from src.models.star import star_time
+
+DEFAULT_SIZES = "1000,10000,100000"
+
+# Name, method, path and body, given the ids of the seeded stars
+SCENARIOS = [
+    ("get_stars", lambda rng, ids: ("GET", "/stars/", None)),
+    ("get_star", lambda rng, ids: ("GET", f"/stars/{rng.choice(ids)}", None)),
+    ("active", lambda rng, ids: ("GET", "/stars/active", None)),
+    ("popular", lambda rng, ids: ("GET", "/stars/popular", None)),
+    ("like_star", lambda rng, ids: ("POST", f"/stars/{rng.choice(ids)}/like", None)),
+    ("add_star", lambda rng, ids: ("POST", "/stars/", {"x": rng.random(), "y": rng.random(), "message": "bench"})),
+]
+
+
+async def seed(count, rng, args):
+    """Replace the Stars table with `count` stars; about a tenth were liked within the popularity window"""
+    init_tables()
+    _star_partitions.clear()
+    stars = LocalTableClient("Stars", seed=args.seed)
+    tables["Stars"] = InstrumentedTableClient(stars, "Stars")
+    now = star_time()
+    partition = f"STAR_{datetime.now(timezone.utc).strftime('%Y%m')}"
+    ids = []
+    for i in range(count):
+        star_id = f"bench-{i:06d}"
+        age = rng.uniform(0, 3600) if rng.random() < 0.1 else rng.uniform(3600, 86400)
+        stars.create_entity({
+            "PartitionKey": partition,
+            "RowKey": star_id,
+            "X": rng.random(),
+            "Y": rng.random(),
+            "Message": f"Star {i}",
+            "LastLiked": now - age,
+            "creationDate": now - 86400,
+            "UserId": None,
+            "Username": None,
+        })
+        ids.append(star_id)
+    # Seeded without latency; the endpoints pay it from here on
+    stars.latency = args.table_latency
+    stars.throttle_rate = args.throttle_rate
+    # Drop the list cached for the previous table
+    await bump_version()
+    return ids
+
+
+async def fetch(client, method, path, body):
+    """Send a request and read the body as sent, leaving it compressed as a client would receive it"""
+    response = await client.send(client.build_request(method, path, json=body), stream=True)
+    async for _ in response.aiter_raw():
+        pass
+    await response.aclose()
+    return response
+
+
+def percentile(ordered, p):
+    return ordered[int(p / 100 * (len(ordered) - 1))] if ordered else 0.0
+
+
+async def drive(client, scenario, ids, seconds, concurrency, rng):
+    latencies = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            method, path, body = scenario(rng, ids)
+            start = time.perf_counter()
+            response = await fetch(client, method, path, body)
+            latencies.append(time.perf_counter() - start)
+            # Redirects count too: they mean the route was not the one meant
+            if response.status_code >= 300:
+                errors += 1
+
+    start = time.perf_counter()
+    deadline = start + seconds
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        **{f"p{p}_ms": round(percentile(latencies, p) * 1000, 2) for p in (50, 95, 99)},
+    }
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for size in args.sizes:
+            ids = await seed(size, rng, args)
+            for name, scenario in SCENARIOS:
+                if args.only and name not in args.only:
+                    continue
+                # One untimed request fills the caches a warm replica would have
+                await fetch(client, *scenario(rng, ids))
+                result = await drive(client, scenario, ids, args.seconds, args.concurrency, rng)
+                results[f"{name}@{size}"] = result
+                print(f"{name:<12}{size:>8}" + f"{result['rps']:>10.1f}"
+                      + "".join(f"{result[key]:>9.2f}" for key in ("p50_ms", "p95_ms", "p99_ms"))
+                      + f"{result['errors']:>8}", flush=True)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Lines describing every endpoint that regressed against the baseline"""
+    regressions = []
+    for key, result in results.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        if result["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(f"{key}: throughput {before['rps']:.1f} -> {result['rps']:.1f} req/s")
+        if result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{key}: p95 {before['p95_ms']:.2f} -> {result['p95_ms']:.2f} ms")
+        if result["errors"] > before["errors"]:
+            regressions.append(f"{key}: errors {before['errors']} -> {result['errors']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated table sizes to seed")
+    parser.add_argument("--seconds", type=float, default=2.0, help="Duration of each endpoint run")
+    parser.add_argument("--concurrency", type=int, default=32, help="Requests in flight at once")
+    parser.add_argument("--only", default="", help="Comma-separated endpoints to run; all by default")
+    parser.add_argument("--table-latency", help="Median and optional p99 table call latency in ms, e.g. 8,60")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of table calls failing with 503")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for data and request mix")
+    parser.add_argument("--baseline", help="Baseline file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed throughput drop or p95 rise relative to the baseline")
+    parser.add_argument("--save", help="Write the results to this file as the new baseline")
+    args = parser.parse_args(argv)
+    args.sizes = [int(size) for size in args.sizes.split(",")]
+    args.only = set(filter(None, args.only.split(",")))
+    args.table_latency = Latency(*map(float, args.table_latency.split(","))) if args.table_latency else None
+
+    print(f"{args.concurrency} concurrent requests, {args.seconds:.0f} s per endpoint")
+    print(f"{'endpoint':<12}{'stars':>8}{'req/s':>10}{'p50':>9}{'p95':>9}{'p99':>9}{'errors':>8}")
+    results = asyncio.run(run(args))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "concurrency": args.concurrency,
+                "seconds": args.seconds,
+                "results": results,
+            }, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Saved baseline to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.tolerance)
+        if regressions:
+            print(f"Regressions against {args.baseline} (tolerance {args.tolerance:.0%}):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+CPU per request and bytes on the wire for the full-map response.
+
+Compares sending the star list uncompressed, compressing it per request as
+a compression middleware would, and serving it from the precompressed
+CompressedBodyCache, where serialization and compression are paid once per
+data version and shared by every request until the next mutation.
+
+Usage:
+    python -m benchmarks.bench_compression [--stars N] [--requests N]
+"""
+
+import argparse
+import asyncio
+import gzip
+import random
+import time
+
+from src.api import compression
+from src.api.compression import CompressedBodyCache
+from src.api.serialization import stars_to_json
+
+from benchmarks.bench_serialization import make_entities
+
+
+def per_request(func, body, requests):
+    start = time.process_time()
+    for _ in range(requests):
+        out = func(body)
+    return (time.process_time() - start) / requests, len(out)
+
+
+def cached(entities, encoding, requests):
+    """CPU of the first (building) request and of each request after it"""
+    cache = CompressedBodyCache()
+
+    async def build():
+        return stars_to_json(entities)
+
+    async def run():
+        start = time.process_time()
+        _, body = await cache.get("g.1", build, encoding)
+        first = time.process_time() - start
+        start = time.process_time()
+        for _ in range(requests):
+            await cache.get("g.1", build, encoding)
+        return first, (time.process_time() - start) / requests, len(body)
+
+    return asyncio.run(run())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stars", type=int, default=10_000, help="Number of stars in the full map")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per on-the-fly path")
+    args = parser.parse_args(argv)
+
+    random.seed(42)
+    entities = make_entities(args.stars)
+
+    on_the_fly = [
+        ("identity", lambda body: body),
+        ("gzip-9 (GZipMiddleware)", lambda body: gzip.compress(body, compresslevel=9)),
+        (f"gzip-{compression.GZIP_LEVEL}", compression.COMPRESSORS["gzip"]),
+    ]
+    if "br" in compression.COMPRESSORS:
+        on_the_fly.append((f"br-{compression.BROTLI_QUALITY}", compression.COMPRESSORS["br"]))
+
+    print(f"Full map of {args.stars} stars, serialization included in every path")
+    print(f"{'path':<34}{'CPU ms/req':>11}{'wire KB':>10}")
+    for name, func in on_the_fly:
+        cpu, size = per_request(lambda _: func(stars_to_json(entities)), None, args.requests)
+        print(f"{'per request ' + name:<34}{cpu * 1000:>11.2f}{size / 1024:>10.1f}")
+
+    for encoding in ["identity", *compression.COMPRESSORS]:
+        first, cpu, size = cached(entities, encoding, args.requests * 1000)
+        print(f"{'cached ' + encoding:<34}{cpu * 1000:>11.4f}{size / 1024:>10.1f}"
+              f"   (first request {first * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Bandwidth and CPU comparison of the star event encodings.
+
+Compares the SSE stream against the WebSocket encodings for the update events
+that dominate traffic and for create events, then measures the publisher's
+fan-out cost through the connection hub for each encoding.
+
+Usage:
+    python -m benchmarks.bench_event_encoding [--events N] [--connections N]
+"""
+
+import argparse
+import random
+import time
+import uuid
+
+from src.api.event_codec import ENCODERS
+from src.api.sse_hub import ConnectionHub
+
+
+def make_update_event():
+    return {"type": "update", "data": {
+        "id": str(uuid.uuid4()),
+        "last_liked": random.uniform(0, 3e7),
+    }}
+
+
+def make_create_event():
+    now = random.uniform(0, 3e7)
+    return {"type": "create", "data": {
+        "id": str(uuid.uuid4()),
+        "x": random.uniform(-1, 1),
+        "y": random.uniform(-1, 1),
+        "message": None,
+        "last_liked": now,
+        "creation_date": now,
+        "user_id": str(uuid.uuid4()),
+        "username": None,
+    }}
+
+
+def wire_overhead(encoding, size):
+    """Transport framing bytes: HTTP chunk header for SSE, frame header for WebSocket"""
+    if encoding == "sse":
+        return len(f"{size:x}") + 4
+    return 2 if size < 126 else 4
+
+
+def bench_encode(encoding, events):
+    encoder = ENCODERS[encoding]
+    start = time.perf_counter()
+    frames = [encoder(event) for event in events]
+    elapsed = time.perf_counter() - start
+    sizes = [len(frame.encode() if isinstance(frame, str) else frame) for frame in frames]
+    payload = sum(sizes) / len(sizes)
+    wire = sum(size + wire_overhead(encoding, size) for size in sizes) / len(sizes)
+    return payload, wire, elapsed / len(events) * 1e6
+
+
+def bench_fanout(encoding, connections, publishes):
+    hub = ConnectionHub(heartbeat_interval=3600, queue_size=publishes + 1)
+    conns = [hub.register(encoding=encoding, keepalive=False) for _ in range(connections)]
+    events = [make_update_event() for _ in range(publishes)]
+    start = time.process_time()
+    for event in events:
+        hub.broadcast(event)
+    elapsed = time.process_time() - start
+    for conn in conns:
+        hub.unregister(conn)
+    return elapsed / publishes * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=20000, help="Events encoded per measurement")
+    parser.add_argument("--connections", type=int, default=10000, help="Connections for the fan-out measurement")
+    parser.add_argument("--publishes", type=int, default=20, help="Publishes for the fan-out measurement")
+    args = parser.parse_args(argv)
+
+    random.seed(42)
+    samples = {
+        "update": [make_update_event() for _ in range(args.events)],
+        "create": [make_create_event() for _ in range(args.events)],
+    }
+
+    print(f"Encoding cost over {args.events} events")
+    print(f"{'event':<8}{'encoding':<10}{'payload B':>10}{'wire B':>9}{'encode us':>11}")
+    for event_type, events in samples.items():
+        for encoding in ENCODERS:
+            payload, wire, cost = bench_encode(encoding, events)
+            print(f"{event_type:<8}{encoding:<10}{payload:>10.1f}{wire:>9.1f}{cost:>11.2f}")
+
+    print()
+    print(f"Publisher CPU per update event, {args.connections} connections")
+    print(f"{'encoding':<10}{'ms/publish':>11}")
+    for encoding in ENCODERS:
+        print(f"{encoding:<10}{bench_fanout(encoding, args.connections, args.publishes):>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
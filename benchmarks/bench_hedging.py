@@ -0,0 +1,66 @@
+"""
+Tail latency of star point reads with and without hedging.
+
+Simulates a table whose reads usually take a few milliseconds but stall
+now and then, and reports read latency percentiles and the extra load
+hedging added.
+
+Usage:
+    python -m benchmarks.bench_hedging [--reads N] [--concurrency N] [--stall-rate R]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from src.db.hedging import HedgePolicy
+
+
+def make_read(args, rng):
+    def read():
+        stalled = rng.random() < args.stall_rate
+        time.sleep(args.stall_ms / 1000 if stalled else rng.uniform(0.002, 0.006))
+        return stalled
+    return read
+
+
+async def run(policy, args):
+    rng = random.Random(42)
+    read = make_read(args, rng)
+    latencies = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await policy.call(read)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one() for _ in range(args.reads)))
+    latencies.sort()
+    return {p: latencies[int(p / 100 * (len(latencies) - 1))] * 1000 for p in (50, 95, 99, 99.9)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reads", type=int, default=5000, help="Point reads to issue")
+    parser.add_argument("--concurrency", type=int, default=16, help="Reads in flight at once")
+    parser.add_argument("--stall-rate", type=float, default=0.02, help="Fraction of reads that stall")
+    parser.add_argument("--stall-ms", type=float, default=150.0, help="Duration of a stalled read")
+    parser.add_argument("--max-extra-load", type=float, default=0.05, help="Hedge budget")
+    args = parser.parse_args(argv)
+
+    print(f"{args.reads} reads, {args.stall_rate:.0%} stalling for {args.stall_ms:.0f} ms")
+    print(f"{'policy':<12}{'p50':>8}{'p95':>8}{'p99':>8}{'p99.9':>8}{'extra load':>12}")
+    for name, policy in [
+        ("plain", HedgePolicy(enabled=False)),
+        ("hedged", HedgePolicy(enabled=True, max_extra_load=args.max_extra_load)),
+    ]:
+        result = asyncio.run(run(policy, args))
+        extra = policy.hedged / policy.reads if policy.reads else 0.0
+        print(f"{name:<12}" + "".join(f"{result[p]:>8.1f}" for p in (50, 95, 99, 99.9)) + f"{extra:>11.1%}")
+
+
+if __name__ == "__main__":
+    main()
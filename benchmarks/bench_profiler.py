@@ -0,0 +1,67 @@
+"""
+Cost of the sampling profiler to the code it profiles.
+
+Runs a CPU-bound workload (serializing star lists) next to a number of idle
+threads, with and without the profiler sampling, and reports the workload's
+throughput and the sampler's own CPU share.
+
+Usage:
+    python -m benchmarks.bench_profiler [--seconds S] [--hz N] [--threads N]
+"""
+
+import argparse
+import threading
+import time
+
+from src.api.serialization import dumps
+from src.utils.profiler import SamplingProfiler
+
+
+def workload(seconds):
+    stars = [{"id": str(i), "x": i / 1000, "y": i / 2000, "message": "hello", "last_liked": i} for i in range(1000)]
+    deadline = time.perf_counter() + seconds
+    done = 0
+    while time.perf_counter() < deadline:
+        dumps(stars)
+        done += 1
+    return done / seconds
+
+
+def run(args, profile):
+    stop = threading.Event()
+    idle = [threading.Thread(target=stop.wait, daemon=True) for _ in range(args.threads)]
+    for thread in idle:
+        thread.start()
+    result = {}
+    sampler = None
+    if profile:
+        sampler = threading.Thread(
+            target=lambda: result.setdefault("profile", SamplingProfiler().run(args.seconds, 1.0 / args.hz, idle=True))
+        )
+        sampler.start()
+    rate = workload(args.seconds)
+    if sampler is not None:
+        sampler.join()
+    stop.set()
+    return rate, result.get("profile")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each run")
+    parser.add_argument("--hz", type=int, default=100, help="Profiler sample rate")
+    parser.add_argument("--threads", type=int, default=32, help="Idle threads whose stacks are also sampled")
+    args = parser.parse_args(argv)
+
+    base, _ = run(args, profile=False)
+    profiled, profile = run(args, profile=True)
+    summary = profile.summary()
+    print(f"{args.threads} idle threads, {args.hz} Hz for {args.seconds:.0f} s")
+    print(f"workload without profiler: {base:10.1f} ops/s")
+    print(f"workload with profiler:    {profiled:10.1f} ops/s ({(base - profiled) / base:+.2%} slower)")
+    print(f"samples: {summary['samples']}, sampler CPU: {summary['overhead_pct']}% of a core, "
+          f"stretched intervals: {summary['stretched_intervals']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Microbenchmark for serializing the full star list.
+
+Compares the previous response path (dict comprehension, FastAPI's
+jsonable_encoder, stdlib json as used by JSONResponse) against
+src.api.serialization with orjson and with the stdlib fallback.
+
+Usage:
+    python -m benchmarks.bench_serialization [--stars N] [--repeat N]
+"""
+
+import argparse
+import json
+import random
+import time
+import uuid
+
+from azure.data.tables import TableEntity
+from fastapi.encoders import jsonable_encoder
+
+from src.api import serialization
+from src.api.serialization import star_to_dict
+
+
+def make_entities(count):
+    entities = []
+    for i in range(count):
+        now = random.uniform(0, 3e7)
+        entity = TableEntity(
+            PartitionKey="STAR_202501",
+            RowKey=str(uuid.uuid4()),
+            X=random.uniform(-1, 1),
+            Y=random.uniform(-1, 1),
+            Message=f"Star message {i}",
+            LastLiked=now,
+            creationDate=now,
+            UserId=f"user-{i % 1000}",
+            Username=f"username-{i % 1000}",
+        )
+        entity._metadata = {"etag": "W/\"datetime'2025-01-01T00%3A00%3A00Z'\"", "timestamp": None}
+        entities.append(entity)
+    return entities
+
+
+def legacy_path(entities):
+    content = [{
+        "id": star["RowKey"],
+        "x": star["X"],
+        "y": star["Y"],
+        "message": star["Message"],
+        "last_liked": star["LastLiked"],
+        "creation_date": star["creationDate"],
+        "user_id": star["UserId"],
+        "username": star["Username"]
+    } for star in entities]
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def stdlib_path(entities):
+    return json.dumps([star_to_dict(star) for star in entities], separators=(",", ":")).encode("utf-8")
+
+
+def timed(func, entities, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = func(entities)
+        best = min(best, time.perf_counter() - start)
+    return best, len(body)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stars", type=int, default=100_000, help="Number of stars to serialize")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per path, best time is reported")
+    args = parser.parse_args(argv)
+
+    random.seed(42)
+    entities = make_entities(args.stars)
+
+    paths = [("jsonable_encoder + json", legacy_path), ("star_to_dict + json", stdlib_path)]
+    if serialization.orjson is not None:
+        paths.append(("star_to_dict + orjson", serialization.stars_to_json))
+
+    print(f"Serializing {args.stars} stars (best of {args.repeat})")
+    print(f"{'path':<26}{'ms':>9}{'MB':>8}{'speedup':>9}")
+    baseline = None
+    for name, func in paths:
+        elapsed, size = timed(func, entities, args.repeat)
+        baseline = baseline or elapsed
+        print(f"{name:<26}{elapsed * 1000:>9.1f}{size / 1e6:>8.2f}{baseline / elapsed:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
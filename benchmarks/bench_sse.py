@@ -0,0 +1,203 @@
+"""
+Fan-out and reconnect-storm load test of the star event stream.
+
+Opens thousands of in-process subscribers to /events/stars/stream, calling
+the app over ASGI so every frame passes through the route, StreamingResponse
+and the middleware stack. Events are published at a fixed rate through
+publish_star_event. Reports the memory each open stream holds, end-to-end
+delivery latency, and the publisher's CPU time per event. Then it
+disconnects a share of the subscribers at once and reconnects them while
+events keep flowing, and reports how long the storm took and what it did
+to delivery.
+
+Usage:
+    python -m benchmarks.bench_sse [--connections N] [--rate N] [--seconds S] [--storm F]
+"""
+
+import os
+
+os.environ["ENVIRONMENT"] = "test"
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+import argparse
+import asyncio
+import gc
+import re
+import time
+import tracemalloc
+
+from src.api.sse_hub import hub
+from src.api.sse_publisher import publish_star_event
+from src.main import app
+
+STREAM_PATH = "/events/stars/stream"
+
+# Events carry their sequence number in the star id
+SEQ_PATTERN = re.compile(rb'"id": ?"bench-(\d+)"')
+
+
+class Subscriber:
+    """One client stream, driven by calling the ASGI app directly"""
+
+    def __init__(self, client_id, sent, latencies):
+        self.client_id = client_id
+        self.sent = sent
+        self.latencies = latencies
+        self.received = 0
+        self.started = asyncio.Event()
+        self._disconnect = asyncio.Event()
+        self._requested = False
+        self._buffer = b""
+        self._task = None
+
+    async def connect(self):
+        self.started.clear()
+        self._disconnect.clear()
+        self._requested = False
+        self._buffer = b""
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": STREAM_PATH,
+            "raw_path": STREAM_PATH.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"bench"), (b"accept", b"text/event-stream")],
+            "client": ("127.0.0.1", 10000 + self.client_id % 50000),
+            "server": ("bench", 80),
+        }
+        self._task = asyncio.create_task(app(scope, self._receive, self._send))
+        await self.started.wait()
+
+    async def disconnect(self):
+        self._disconnect.set()
+        await self._task
+
+    async def _receive(self):
+        if not self._requested:
+            self._requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self._disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def _send(self, message):
+        if message["type"] == "http.response.start":
+            self.started.set()
+            return
+        self._buffer += message.get("body", b"")
+        *frames, self._buffer = self._buffer.split(b"\n\n")
+        now = time.perf_counter()
+        for frame in frames:
+            match = SEQ_PATTERN.search(frame)
+            if match:
+                self.received += 1
+                self.latencies.append(now - self.sent[int(match.group(1))])
+
+
+class Publisher:
+    """Publishes update events at a fixed rate and measures its own CPU time"""
+
+    def __init__(self, rate, sent):
+        self.rate = rate
+        self.sent = sent
+        self.cpu = 0.0
+        self._seq = 0
+
+    async def run(self, seconds):
+        start = time.perf_counter()
+        count = int(seconds * self.rate)
+        for i in range(count):
+            delay = start + i / self.rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            seq = self._seq
+            self._seq += 1
+            # publish_star_event never yields, so this is the publisher's time alone
+            cpu_before = time.thread_time()
+            self.sent[seq] = time.perf_counter()
+            await publish_star_event("update", {"id": f"bench-{seq}", "last_liked": seq})
+            self.cpu += time.thread_time() - cpu_before
+        return count
+
+
+def percentiles(latencies):
+    latencies.sort()
+    if not latencies:
+        return "no deliveries"
+    pick = lambda p: latencies[int(p / 100 * (len(latencies) - 1))] * 1000
+    return f"p50 {pick(50):.1f} ms, p95 {pick(95):.1f} ms, p99 {pick(99):.1f} ms, max {latencies[-1] * 1000:.1f} ms"
+
+
+async def run(args):
+    sent = {}
+    latencies = []
+    subscribers = [Subscriber(i, sent, latencies) for i in range(args.connections)]
+
+    # Memory held per open stream, client side included
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    for subscriber in subscribers:
+        await subscriber.connect()
+    connect_time = time.perf_counter() - start
+    gc.collect()
+    per_connection = (tracemalloc.get_traced_memory()[0] - before) / args.connections
+    tracemalloc.stop()
+    print(f"connected {len(hub)} streams in {connect_time:.2f} s, "
+          f"{per_connection / 1024:.1f} KiB per stream")
+
+    publisher = Publisher(args.rate, sent)
+    events = await publisher.run(args.seconds)
+    await asyncio.sleep(0.5)
+    expected = events * args.connections
+    delivered = sum(subscriber.received for subscriber in subscribers)
+    print(f"steady: {events} events to {args.connections} streams, "
+          f"delivered {delivered}/{expected}, dropped streams {hub.total_dropped}")
+    print(f"  delivery latency {percentiles(latencies)}")
+    print(f"  publisher CPU {publisher.cpu / events * 1e6:.0f} us per event, "
+          f"{publisher.cpu / expected * 1e9:.0f} ns per delivery, "
+          f"{publisher.cpu / args.seconds:.1%} of a core")
+
+    # Reconnect storm: a share of the clients drop and come back at once
+    # while events keep flowing
+    latencies.clear()
+    publisher.cpu = 0.0
+    storm = subscribers[:int(args.connections * args.storm)]
+    publishing = asyncio.create_task(publisher.run(args.seconds))
+    await asyncio.sleep(args.seconds / 4)
+    start = time.perf_counter()
+    await asyncio.gather(*(subscriber.disconnect() for subscriber in storm))
+    disconnect_time = time.perf_counter() - start
+    remaining = len(hub)
+    start = time.perf_counter()
+    await asyncio.gather(*(subscriber.connect() for subscriber in storm))
+    reconnect_time = time.perf_counter() - start
+    events = await publishing
+    await asyncio.sleep(0.5)
+    print(f"storm: {len(storm)} streams closed in {disconnect_time * 1000:.0f} ms "
+          f"({remaining} left open), reopened in {reconnect_time * 1000:.0f} ms, {len(hub)} open after")
+    print(f"  delivery latency {percentiles(latencies)}")
+    print(f"  publisher CPU {publisher.cpu / events * 1e6:.0f} us per event, dropped streams {hub.total_dropped}")
+
+    await asyncio.gather(*(subscriber.disconnect() for subscriber in subscribers))
+    await hub.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--connections", type=int, default=2000, help="Concurrent subscribers")
+    parser.add_argument("--rate", type=float, default=20, help="Events published per second")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each phase")
+    parser.add_argument("--storm", type=float, default=1.0, help="Share of subscribers that reconnect at once")
+    args = parser.parse_args(argv)
+
+    print(f"{args.connections} subscribers, {args.rate:.0f} events/s, {args.seconds:.0f} s per phase")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
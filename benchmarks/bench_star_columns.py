@@ -0,0 +1,127 @@
+"""
+Vectorized columnar queries versus Python loops over entity dicts.
+
+Times the active-since, expiry, bounding-box and top-N queries over the same
+star set held as entity dicts and as a StarColumns store, then the active
+star and viewport queries of the in-memory backend with and without
+MEMORY_COLUMNAR.
+
+Usage:
+    python -m benchmarks.bench_star_columns [--sizes 100000 1000000]
+"""
+
+import argparse
+import asyncio
+import heapq
+import random
+import tempfile
+import time
+import uuid
+
+from src.db.memory_store import MemoryProvider
+from src.db.star_columns import StarColumns
+
+
+def make_entities(count):
+    entities = []
+    for _ in range(count):
+        created = random.uniform(0, 3e7)
+        entities.append({
+            "PartitionKey": "STAR_202501",
+            "RowKey": str(uuid.uuid4()),
+            "X": random.uniform(-1, 1),
+            "Y": random.uniform(-1, 1),
+            "Message": "",
+            "LastLiked": created + random.uniform(0, 86400),
+            "creationDate": created,
+        })
+    return entities
+
+
+def dict_queries(entities, cutoff, expiry, box):
+    x_min, y_min, x_max, y_max = box
+    return {
+        "active_since": lambda: [s["RowKey"] for s in entities if "LastLiked" in s and s["LastLiked"] >= cutoff],
+        "expired_before": lambda: [s["RowKey"] for s in entities if s.get("LastLiked", 0) < expiry],
+        "in_bbox": lambda: [
+            s["RowKey"] for s in entities
+            if x_min <= s["X"] <= x_max and y_min <= s["Y"] <= y_max
+        ],
+        "top_100": lambda: [s["RowKey"] for s in heapq.nlargest(100, entities, key=lambda s: s["LastLiked"])],
+    }
+
+
+def column_queries(store, cutoff, expiry, box):
+    return {
+        "active_since": lambda: store.active_since(cutoff),
+        "expired_before": lambda: store.expired_before(expiry),
+        "in_bbox": lambda: store.in_bbox(*box),
+        "top_100": lambda: store.top_n(100),
+    }
+
+
+def memory_store_queries(provider, cutoff, box):
+    return {
+        "active_stars": lambda: asyncio.run(provider.active_stars(cutoff)),
+        "stars_in_viewport": lambda: asyncio.run(provider.stars_in_viewport(*box)),
+    }
+
+
+def best_time(func, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000], help="Star counts")
+    args = parser.parse_args(argv)
+
+    random.seed(42)
+    print(f"{'stars':>9}  {'query':<16}{'dict ms':>10}{'numpy ms':>10}{'speedup':>9}")
+    for size in args.sizes:
+        entities = make_entities(size)
+        store = StarColumns.from_entities(entities)
+        cutoff, expiry = 2.9e7, 1e6
+        box = (-0.25, -0.25, 0.25, 0.25)
+        baseline = dict_queries(entities, cutoff, expiry, box)
+        vectorized = column_queries(store, cutoff, expiry, box)
+        for name in baseline:
+            assert sorted(baseline[name]()) == sorted(vectorized[name]()), name
+            dict_time = best_time(baseline[name])
+            numpy_time = best_time(vectorized[name])
+            print(f"{size:>9}  {name:<16}{dict_time * 1000:>10.2f}{numpy_time * 1000:>10.2f}"
+                  f"{dict_time / numpy_time:>8.1f}x")
+
+    print()
+    print(f"{'stars':>9}  {'memory store':<20}{'records ms':>11}{'columnar ms':>12}{'speedup':>9}")
+    for size in args.sizes:
+        entities = make_entities(size)
+        cutoff = 2.9e7
+        box = (-0.25, -0.25, 0.25, 0.25)
+        with tempfile.TemporaryDirectory() as records_dir, tempfile.TemporaryDirectory() as columnar_dir:
+            plain = MemoryProvider(records_dir, fsync=False, snapshot_interval=3600).open()
+            columnar = MemoryProvider(columnar_dir, fsync=False, snapshot_interval=3600, columnar=True).open()
+            try:
+                plain.import_stars(entities)
+                columnar.import_stars(entities)
+                baseline = memory_store_queries(plain, cutoff, box)
+                vectorized = memory_store_queries(columnar, cutoff, box)
+                for name in baseline:
+                    assert sorted(s["RowKey"] for s in baseline[name]()) == \
+                        sorted(s["RowKey"] for s in vectorized[name]()), name
+                    plain_time = best_time(baseline[name])
+                    columnar_time = best_time(vectorized[name])
+                    print(f"{size:>9}  {name:<20}{plain_time * 1000:>11.2f}{columnar_time * 1000:>12.2f}"
+                          f"{plain_time / columnar_time:>8.1f}x")
+            finally:
+                plain.close()
+                columnar.close()
+
+
+if __name__ == "__main__":
+    main()
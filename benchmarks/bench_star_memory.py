@@ -0,0 +1,77 @@
+"""
+Memory per star: Azure table entities versus StarRecord.
+
+Builds the same star set as TableEntity dicts (with the metadata the SDK
+attaches) and as StarRecords, and reports traced bytes per star for each.
+
+Usage:
+    python -m benchmarks.bench_star_memory [--stars N]
+"""
+
+import argparse
+import datetime as dt
+import gc
+import random
+import tracemalloc
+import uuid
+
+from azure.data.tables import TableEntity
+
+from src.models.star_record import StarRecord
+
+
+def make_entity(i):
+    now = random.uniform(0, 3e7)
+    user = i % 5000
+    entity = TableEntity(
+        # Every string is a fresh object, as when decoded from a response
+        PartitionKey=f"STAR_2025{i % 12 + 1:02d}",
+        RowKey=str(uuid.uuid4()),
+        X=random.uniform(-1, 1),
+        Y=random.uniform(-1, 1),
+        Message=f"Star message {i}",
+        LastLiked=now,
+        creationDate=now,
+        UserId=f"user-{user:08d}",
+        Username=f"username-{user}",
+    )
+    entity._metadata = {
+        "etag": f"W/\"datetime'2025-01-01T00%3A00%3A{i % 60:02d}.{i:07d}Z'\"",
+        "timestamp": dt.datetime(2025, 1, 1, tzinfo=dt.timezone.utc),
+    }
+    return entity
+
+
+def measure(build, count):
+    gc.collect()
+    tracemalloc.start()
+    items = build(count)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return items, current / count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stars", type=int, default=1_000_000, help="Number of stars to hold in memory")
+    args = parser.parse_args(argv)
+
+    random.seed(42)
+    entities, entity_bytes = measure(lambda n: [make_entity(i) for i in range(n)], args.stars)
+    del entities
+
+    # Records are built from fresh entities that are dropped straight away,
+    # so only what a record keeps alive is still traced at the end
+    random.seed(42)
+    records, record_bytes = measure(
+        lambda n: [StarRecord.from_entity(make_entity(i)) for i in range(n)], args.stars
+    )
+
+    print(f"Bytes per star over {args.stars} stars")
+    print(f"{'TableEntity':<14}{entity_bytes:>9.0f}")
+    print(f"{'StarRecord':<14}{record_bytes:>9.0f}")
+    print(f"{'saving':<14}{(1 - record_bytes / entity_bytes) * 100:>8.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Star storage backends compared operation by operation.
+
+Seeds the same stars into the Azure path (TableStorageProvider over the local
+table stand-in), into a SqliteProvider on a temporary file and into a
+MemoryProvider journaling to a temporary directory, then runs
+each DatabaseProvider operation with a number of calls in flight at once.
+Reports calls per second and latency percentiles per backend. The stand-in
+answers instantly unless --table-latency gives its calls the latency of a
+real storage account; SQLite and the memory store's journal run on the
+local disk either way.
+
+Usage:
+    python -m benchmarks.bench_storage [--sizes 10000,100000] [--seconds S] [--concurrency N]
+                                       [--table-latency MEDIAN_MS[,P99_MS]] [--backends azure,sqlite,memory]
+"""
+
+import os
+
+os.environ["ENVIRONMENT"] = "test"
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+import uuid
+
+from src.db.azure_tables import InstrumentedTableClient, TableStorageProvider, _star_partitions
+from src.db.memory_store import MemoryProvider
+from src.db.sqlite_provider import SqliteProvider
+from src.db.table_standin import Latency, LocalTableClient
+
+DEFAULT_SIZES = "10000,100000"
+USERS = 500
+
+# Name and call, given the provider, a random source and the seeded stars
+OPERATIONS = [
+    ("get_star", lambda db, rng, stars: db.get_star(rng.choice(stars)["RowKey"])),
+    ("list_stars", lambda db, rng, stars: db.list_stars()),
+    ("active_stars", lambda db, rng, stars: db.active_stars(stars[0]["LastLiked"] - 3600)),
+    ("viewport", lambda db, rng, stars: db.stars_in_viewport(*viewport(rng))),
+    ("stars_by_user", lambda db, rng, stars: db.stars_by_user(f"user-{rng.randrange(USERS)}")),
+    ("update_star", lambda db, rng, stars: db.update_star(dict(rng.choice(stars), LastLiked=time.time()))),
+    ("create_star", lambda db, rng, stars: db.create_star(make_star(rng, str(uuid.uuid4()), time.time()))),
+]
+
+
+def viewport(rng):
+    """A rectangle covering about 1% of the map, as a zoomed-in client sees it"""
+    x, y = rng.uniform(-1, 0.8), rng.uniform(-1, 0.8)
+    return x, y, x + 0.2, y + 0.2
+
+
+def make_star(rng, star_id, now):
+    age = rng.uniform(0, 3600) if rng.random() < 0.1 else rng.uniform(3600, 86400)
+    return {
+        "PartitionKey": "STAR_202501",
+        "RowKey": star_id,
+        "X": rng.uniform(-1, 1),
+        "Y": rng.uniform(-1, 1),
+        "Message": "bench",
+        "LastLiked": now - age,
+        "creationDate": now - 86400,
+        "UserId": f"user-{rng.randrange(USERS)}",
+        "Username": None,
+    }
+
+
+def make_stars(count, rng):
+    now = time.time()
+    stars = [make_star(rng, f"bench-{i:06d}", now) for i in range(count)]
+    # Most recently liked first, so active_stars can pick a cutoff from it
+    stars.sort(key=lambda star: star["LastLiked"], reverse=True)
+    return stars
+
+
+def azure_backend(stars, args, directory):
+    _star_partitions.clear()
+    table = LocalTableClient("Stars", seed=args.seed)
+    for star in stars:
+        table.create_entity(star)
+    # Seeded without latency; the operations pay it from here on
+    table.latency = args.table_latency
+    return TableStorageProvider(InstrumentedTableClient(table, "Stars"))
+
+
+def sqlite_backend(stars, args, directory):
+    db = SqliteProvider(os.path.join(directory, f"stars-{len(stars)}.db")).open()
+    db.import_stars(stars)
+    return db
+
+
+def memory_backend(stars, args, directory):
+    db = MemoryProvider(os.path.join(directory, f"memory-{len(stars)}")).open()
+    db.import_stars(stars)
+    return db
+
+
+BACKENDS = {"azure": azure_backend, "sqlite": sqlite_backend, "memory": memory_backend}
+
+
+def percentile(ordered, p):
+    return ordered[int(p / 100 * (len(ordered) - 1))] if ordered else 0.0
+
+
+async def drive(db, operation, stars, seconds, concurrency, rng):
+    latencies = []
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await operation(db, rng, stars)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    deadline = start + seconds
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return len(latencies) / elapsed, [percentile(latencies, p) * 1000 for p in (50, 95, 99)]
+
+
+async def run(args, directory):
+    rng = random.Random(args.seed)
+    for size in args.sizes:
+        stars = make_stars(size, rng)
+        for backend in args.backends:
+            db = BACKENDS[backend](stars, args, directory)
+            try:
+                for name, operation in OPERATIONS:
+                    # One untimed call warms caches, e.g. the Azure path's known partitions
+                    await operation(db, rng, stars)
+                    rate, (p50, p95, p99) = await drive(db, operation, stars, args.seconds, args.concurrency, rng)
+                    print(f"{backend:<8}{name:<15}{size:>8}{rate:>10.1f}{p50:>9.2f}{p95:>9.2f}{p99:>9.2f}",
+                          flush=True)
+            finally:
+                if isinstance(db, (SqliteProvider, MemoryProvider)):
+                    db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated star counts to seed")
+    parser.add_argument("--seconds", type=float, default=2.0, help="Duration of each operation run")
+    parser.add_argument("--concurrency", type=int, default=8, help="Calls in flight at once")
+    parser.add_argument("--table-latency", help="Median and optional p99 table call latency in ms, e.g. 8,60")
+    parser.add_argument("--backends", default="azure,sqlite,memory", help="Comma-separated backends to run")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for data and call mix")
+    args = parser.parse_args(argv)
+    args.sizes = [int(size) for size in args.sizes.split(",")]
+    args.backends = [backend for backend in args.backends.split(",") if backend]
+    args.table_latency = Latency(*map(float, args.table_latency.split(","))) if args.table_latency else None
+
+    print(f"{args.concurrency} concurrent calls, {args.seconds:.0f} s per operation")
+    print(f"{'backend':<8}{'operation':<15}{'stars':>8}{'calls/s':>10}{'p50':>9}{'p95':>9}{'p99':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(args, directory))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
-"""
-Star Map API
-A FastAPI backend service for the Star Map application
-"""
-
-__version__ = "1.1.0"
-__author__ = "hillcallum"
+"""
+Star Map API
+A FastAPI backend service for the Star Map application
+"""
+
+__version__ = "1.1.0"
+__author__ = "hillcallum"
@@ -0,0 +1,131 @@
+"""
+Precompressed response bodies.
+The full star list only changes when the mutation version does, so its JSON
+body is serialized once per version and compressed at most once per content
+coding. Every client then receives the stored bytes instead of the server
+recompressing the same payload per request.
+
+brotli is an optional dependency; without it only gzip is offered.
+"""
+
+import asyncio
+import gzip
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # Optional dependency
+    brotli = None
+
+from src.utils.tracing import span
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_SIZE = 1024
+
+def _gzip(body: bytes) -> bytes:
+    # mtime=0 keeps the output identical for identical bodies
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+def _brotli(body: bytes) -> bytes:
+    return brotli.compress(body, quality=BROTLI_QUALITY)
+
+COMPRESSORS: Dict[str, Callable[[bytes], bytes]] = {"gzip": _gzip}
+if brotli is not None:
+    COMPRESSORS["br"] = _brotli
+
+def _timed_compress(encoding: str, body: bytes) -> bytes:
+    with span("compress"):
+        return COMPRESSORS[encoding](body)
+
+# Server preference between codings the client accepts equally
+PREFERENCE = ("br", "gzip")
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> str:
+    """Pick the content coding to send for an Accept-Encoding header"""
+    if not accept_encoding:
+        return "identity"
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        weights[coding.strip().lower()] = quality
+
+    best, best_quality = "identity", 0.0
+    for coding in PREFERENCE:
+        if coding in COMPRESSORS:
+            quality = weights.get(coding, weights.get("*", 0.0))
+            if quality > best_quality:
+                best, best_quality = coding, quality
+    return best
+
+class CompressedBodyCache:
+    """
+    One serialized body and its compressed forms, for the current key.
+
+    The body is rebuilt when the key changes, and for volatile keys also
+    after `ttl` seconds. Requests that arrive while a body or a compression
+    is still being produced wait for the same task instead of starting
+    their own.
+    """
+
+    def __init__(self, ttl: float = 5.0):
+        self.ttl = ttl
+        self._key: Optional[str] = None
+        self._expires: Optional[float] = None
+        self._bodies: Dict[str, asyncio.Future] = {}
+
+    def clear(self) -> None:
+        self._key = None
+        self._bodies = {}
+
+    async def _compress(self, identity: asyncio.Future, encoding: str) -> Optional[bytes]:
+        body = await asyncio.shield(identity)
+        if len(body) < MIN_COMPRESS_SIZE:
+            return None
+        return await asyncio.to_thread(_timed_compress, encoding, body)
+
+    async def get(
+        self,
+        key: str,
+        build: Callable[[], Awaitable[bytes]],
+        encoding: str = "identity",
+        volatile: bool = False
+    ) -> Tuple[str, bytes]:
+        """
+        Return (content coding, body) for `key`, building it with `build` if needed.
+
+        Falls back to identity when the body is too small to be worth compressing.
+        """
+        now = time.monotonic()
+        if key != self._key or (self._expires is not None and now >= self._expires):
+            self._key = key
+            self._expires = now + self.ttl if volatile else None
+            self._bodies = {"identity": asyncio.ensure_future(build())}
+        bodies = self._bodies
+        if encoding not in bodies:
+            bodies[encoding] = asyncio.ensure_future(self._compress(bodies["identity"], encoding))
+
+        try:
+            # Shielded so a client that disconnects does not cancel the shared task
+            body = await asyncio.shield(bodies[encoding])
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Do not keep serving a failed build
+            if self._bodies is bodies:
+                self.clear()
+            raise
+        if body is None:
+            return "identity", await asyncio.shield(bodies["identity"])
+        return encoding, body
@@ -0,0 +1,123 @@
+"""
+Wire encodings for star events.
+Each encoder turns a published event into one frame; the connection hub calls
+every encoder at most once per event, however many clients share it.
+
+Encodings:
+    sse      "data: <json>\\n\\n" text frames for the SSE stream
+    json     JSON text frames
+    msgpack  MessagePack binary frames with single-letter keys (needs msgpack)
+    struct   fixed-layout binary frames for update and delete events,
+             including batched deletes; other events fall back to JSON
+             text frames
+"""
+
+import json
+import struct
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Union
+
+try:
+    import msgpack
+except ImportError:  # Optional dependency
+    msgpack = None
+
+Frame = Union[str, bytes]
+
+# Event type codes shared by the binary encodings
+EVENT_TYPE_CODES = {"create": 1, "update": 2, "delete": 3}
+
+# Single-letter keys used by the msgpack encoding
+COMPACT_KEYS = {
+    "id": "i",
+    "x": "x",
+    "y": "y",
+    "message": "m",
+    "last_liked": "l",
+    "creation_date": "c",
+    "user_id": "u",
+    "username": "n",
+}
+
+# struct layouts: type code, 16 byte star UUID, then the event payload
+UPDATE_LAYOUT = struct.Struct("<B16sd")  # last_liked
+DELETE_LAYOUT = struct.Struct("<B16s")
+STAR_ID_LAYOUT = struct.Struct("<16s")
+# Batched deletes ({"ids": [...]}): type code, id count, then that many UUIDs
+DELETE_BATCH_CODE = 4
+DELETE_BATCH_LAYOUT = struct.Struct("<BI")
+
+
+def encode_sse(event: Dict[str, Any]) -> str:
+    return f"data: {json.dumps(event)}\n\n"
+
+
+def encode_json(event: Dict[str, Any]) -> str:
+    return json.dumps(event, separators=(",", ":"))
+
+
+def encode_msgpack(event: Dict[str, Any]) -> bytes:
+    data = event.get("data")
+    if isinstance(data, dict):
+        data = {COMPACT_KEYS.get(key, key): value for key, value in data.items()}
+    return msgpack.packb([EVENT_TYPE_CODES.get(event.get("type"), 0), data])
+
+
+def _uuid_bytes(star_id: Any) -> Optional[bytes]:
+    try:
+        return uuid.UUID(star_id).bytes
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def encode_struct(event: Dict[str, Any]) -> Frame:
+    data = event.get("data") or {}
+    event_type = event.get("type")
+    if event_type == "delete" and "ids" in data:
+        ids = [_uuid_bytes(star_id) for star_id in data["ids"]]
+        if None not in ids:
+            return DELETE_BATCH_LAYOUT.pack(DELETE_BATCH_CODE, len(ids)) + b"".join(ids)
+        return encode_json(event)
+    id_bytes = _uuid_bytes(data.get("id"))
+    if id_bytes is not None:
+        if event_type == "update" and data.keys() == {"id", "last_liked"}:
+            return UPDATE_LAYOUT.pack(EVENT_TYPE_CODES["update"], id_bytes, data["last_liked"])
+        if event_type == "delete":
+            return DELETE_LAYOUT.pack(EVENT_TYPE_CODES["delete"], id_bytes)
+    return encode_json(event)
+
+
+ENCODERS: Dict[str, Callable[[Dict[str, Any]], Frame]] = {
+    "sse": encode_sse,
+    "json": encode_json,
+    "struct": encode_struct,
+}
+if msgpack is not None:
+    ENCODERS["msgpack"] = encode_msgpack
+
+# Encodings a WebSocket client may negotiate
+WEBSOCKET_ENCODINGS = [name for name in ("json", "msgpack", "struct") if name in ENCODERS]
+
+
+def decode_like_batch(encoding: str, message: Frame) -> List[str]:
+    """
+    Decode a batch of liked star ids sent by a WebSocket client.
+
+    Text frames are always JSON {"likes": [...]}; binary frames are msgpack
+    {"likes": [...]} or, for the struct encoding, concatenated 16 byte UUIDs.
+    """
+    if isinstance(message, str):
+        payload = json.loads(message)
+    elif encoding == "struct":
+        if len(message) % STAR_ID_LAYOUT.size:
+            raise ValueError("Binary like batch must be a multiple of 16 bytes")
+        return [str(uuid.UUID(bytes=raw)) for (raw,) in STAR_ID_LAYOUT.iter_unpack(message)]
+    elif encoding == "msgpack":
+        payload = msgpack.unpackb(message)
+    else:
+        raise ValueError(f"Binary frames are not supported with the {encoding} encoding")
+
+    likes = payload.get("likes") if isinstance(payload, dict) else None
+    if not isinstance(likes, list) or not all(isinstance(star_id, str) for star_id in likes):
+        raise ValueError("Expected {\"likes\": [star ids]}")
+    return likes
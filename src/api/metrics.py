@@ -0,0 +1,87 @@
+"""
+Prometheus scrape endpoint.
+Request, storage, Redis and publish metrics are recorded where they happen;
+this module adds collectors for the state other components already keep
+(connection hub, Redis pools and breaker, hedged reads, rate limiters).
+"""
+
+from typing import Iterable
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from src.api.sse_hub import hub
+from src.db.azure_tables import point_reads
+from src.db.redis_cache import CircuitBreaker, breakers, get_pool_stats
+from src.utils.logging import logging_stats
+from src.utils.metrics import CONTENT_TYPE, Family, registry
+from src.utils.rate_limit import create_limiter, vote_limiter
+
+router = APIRouter()
+
+def _collect_sse() -> Iterable[Family]:
+    stats = hub.stats()
+    yield Family("sse_connections", "gauge", "Open event stream connections by encoding",
+                 [({"encoding": encoding}, count) for encoding, count in sorted(stats["encodings"].items())])
+    yield Family("sse_connections_opened_total", "counter", "Event stream connections opened",
+                 [({}, stats["total_connected"])])
+    yield Family("sse_connections_dropped_total", "counter", "Connections dropped because their queue was full",
+                 [({}, stats["total_dropped"])])
+    yield Family("sse_queued_events", "gauge", "Events waiting in all connection queues",
+                 [({}, stats["queue_depth_total"])])
+    yield Family("sse_queue_depth_max", "gauge", "Deepest connection queue",
+                 [({}, stats["queue_depth_max"])])
+    yield Family("sse_delivery_lag_max_seconds", "gauge", "Longest delay between publish and delivery on an open connection",
+                 [({}, stats["lag_max_ms"] / 1000)])
+
+def _collect_redis() -> Iterable[Family]:
+    pools = sorted(get_pool_stats().items())
+    for key, name, kind, help in (
+        ("size", "redis_pool_size", "gauge", "Connections allowed per pool"),
+        ("in_use", "redis_pool_in_use", "gauge", "Connections checked out per pool"),
+        ("waiters", "redis_pool_waiters", "gauge", "Callers waiting for a pooled connection"),
+        ("acquired", "redis_pool_acquired_total", "counter", "Connections handed out per pool"),
+        ("errors", "redis_pool_errors_total", "counter", "Pool checkouts that timed out or failed"),
+    ):
+        yield Family(name, kind, help, [({"role": role}, stats[key]) for role, stats in pools])
+
+    states = (CircuitBreaker.CLOSED, CircuitBreaker.OPEN, CircuitBreaker.HALF_OPEN)
+    breaker_stats = [(role, breaker.stats()) for role, breaker in sorted(breakers.items())]
+    yield Family("redis_breaker_state", "gauge", "Circuit breaker state per role, 1 for the current one",
+                 [({"role": role, "state": state}, 1 if stats["state"] == state else 0)
+                  for role, stats in breaker_stats for state in states])
+    yield Family("redis_breaker_trips_total", "counter", "Times each role's breaker opened",
+                 [({"role": role}, stats["trips"]) for role, stats in breaker_stats])
+    yield Family("redis_breaker_rejected_total", "counter", "Redis calls skipped while their role's breaker was open",
+                 [({"role": role}, stats["rejected"]) for role, stats in breaker_stats])
+
+def _collect_storage() -> Iterable[Family]:
+    stats = point_reads.stats()
+    yield Family("storage_hedged_point_reads_total", "counter", "Star point reads through the hedging policy",
+                 [({}, stats["reads"])])
+    yield Family("storage_hedges_total", "counter", "Second copies sent for slow point reads", [({}, stats["hedged"])])
+    yield Family("storage_hedge_wins_total", "counter", "Hedges that answered first", [({}, stats["hedge_wins"])])
+
+def _collect_rate_limits() -> Iterable[Family]:
+    samples = []
+    for scope, limiter in (("create", create_limiter), ("vote", vote_limiter)):
+        stats = limiter.stats()
+        for source in ("local", "redis", "degraded"):
+            samples.append(({"scope": scope, "source": source}, stats[f"{source}_hits"]))
+    yield Family("rate_limit_checks_total", "counter", "Rate limit checks by scope and where they were decided", samples)
+
+def _collect_logging() -> Iterable[Family]:
+    stats = logging_stats()
+    yield Family("log_records_queued", "gauge", "Log records waiting for the writer thread", [({}, stats["queued"])])
+    yield Family("log_records_dropped_total", "counter", "Log records dropped because the queue was full",
+                 [({}, stats["dropped"])])
+    yield Family("log_records_sampled_out_total", "counter", "INFO and DEBUG records over their per-message rate",
+                 [({}, stats["sampled_out"])])
+
+for _collector in (_collect_sse, _collect_redis, _collect_storage, _collect_rate_limits, _collect_logging):
+    registry.add_collector(_collector)
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Metrics in the Prometheus text format"""
+    return Response(registry.render(), media_type=CONTENT_TYPE)
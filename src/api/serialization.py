@@ -0,0 +1,90 @@
+"""
+Serialization of star entities for API responses.
+Maps Azure table entities straight to JSON bytes and returns them in a raw
+Response, skipping FastAPI's jsonable_encoder pass and stdlib json.
+"""
+
+import datetime as dt
+import json
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+from fastapi import Response
+
+from src.utils.tracing import span
+
+try:
+    import orjson
+except ImportError:  # Optional dependency, fall back to stdlib json
+    orjson = None
+
+def star_to_dict(entity: Mapping[str, Any]) -> Dict[str, Any]:
+    """Convert a Stars table entity to its API representation"""
+    get = entity.get
+    return {
+        "id": entity["RowKey"],
+        "x": entity["X"],
+        "y": entity["Y"],
+        "message": entity["Message"],
+        "last_liked": get("LastLiked"),
+        "creation_date": get("creationDate"),
+        "user_id": get("UserId"),
+        "username": get("Username")
+    }
+
+def _default(value: Any) -> Any:
+    """Handle the non-JSON types the table SDK can hand back"""
+    if hasattr(value, "value") and hasattr(value, "edm_type"):  # EntityProperty
+        return value.value
+    if isinstance(value, (dt.datetime, dt.date)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+if orjson is not None:
+    def dumps(content: Any) -> bytes:
+        """Serialize content to JSON bytes"""
+        with span("ser"):
+            return orjson.dumps(content, default=_default)
+else:
+    def dumps(content: Any) -> bytes:
+        """Serialize content to JSON bytes"""
+        with span("ser"):
+            return json.dumps(content, default=_default, separators=(",", ":")).encode("utf-8")
+
+def stars_to_json(entities: Iterable[Mapping[str, Any]]) -> bytes:
+    """Serialize Stars table entities to a JSON array"""
+    return dumps([star_to_dict(entity) for entity in entities])
+
+def json_response(
+    content: Any,
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    Build a JSON response without FastAPI's re-encoding.
+
+    Args:
+        content: Already serialized JSON bytes, or data to serialize
+        status_code: HTTP status code
+        headers: Extra response headers
+    """
+    body = content if isinstance(content, bytes) else dumps(content)
+    return Response(content=body, status_code=status_code, headers=headers, media_type="application/json")
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+def not_modified_response(etag: str, vary: Optional[str] = None) -> Response:
+    """304 response for a client that already has the current representation"""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if vary:
+        # Caches must store the 304 under the same variant key as the 200
+        headers["Vary"] = vary
+    return Response(status_code=304, headers=headers)
@@ -1,38 +1,51 @@
-import asyncio
-import logging
-from fastapi import APIRouter, Request
-from fastapi.responses import StreamingResponse
-import json
-from typing import List, Dict
-
-# Create separate routers for stars and users
-router = APIRouter()
-logger = logging.getLogger(__name__)
-
-# Create event queues for SSE
-connections: List[asyncio.Queue] = []  # one queue per SSE connection
-# star_event_queue = asyncio.Queue()
-
-@router.get("/stream")
-async def stream_stars(request: Request):
-    # 1) Create a new queue for this client
-    queue = asyncio.Queue()
-    # 2) Add it to the global list
-    connections.append(queue)
-
-    # 3) A generator that reads from *this* queue only
-    async def event_generator():
-        try:
-            while True:
-                if await request.is_disconnected():
-                    break
-                try:
-                    event = await asyncio.wait_for(queue.get(), timeout=15.0)
-                    yield f"data: {json.dumps(event)}\n\n"  # Serialize with json.dumps
-                except asyncio.TimeoutError:
-                    yield ": keep-alive\n\n"
-        finally:
-            # 4) On disconnect, remove queue from global list
-            connections.remove(queue)
-
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+import logging
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+
+from src.api.sse_hub import HubConnection, hub
+
+# Create separate routers for stars and users
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/stream")
+async def stream_stars():
+    # 1) Register a connection for this client with the shared hub
+    conn = hub.register()
+
+    # 2) A generator that reads from *this* connection's queue only.
+    # Keep-alives come from the hub's heartbeat.
+    async def event_generator():
+        async for frame in conn.frames():
+            yield frame
+
+    # 3) On disconnect, remove the connection from the hub
+    return HubStreamingResponse(conn, event_generator(), media_type="text/event-stream")
+
+class HubStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that unregisters its hub connection when it ends.
+
+    A disconnect cancels the response while the generator may be suspended
+    at a yield, and the generator's own cleanup would then only run once it
+    is garbage collected; the hub would keep queueing frames for the dead
+    client until then.
+    """
+
+    def __init__(self, conn: HubConnection, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.conn = conn
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            hub.unregister(self.conn)
+
+@router.get("/stats")
+async def stream_stats(limit: int = Query(20, ge=0, le=1000)):
+    """Connection count, queue depth and delivery lag for the star stream."""
+    return {
+        "hub": hub.stats(),
+        "connections": hub.connection_stats(limit=limit)
+    }
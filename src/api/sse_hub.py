@@ -0,0 +1,218 @@
+"""
+Connection hub for Server-Sent Events and WebSocket streams.
+Keeps every open stream in a registry keyed by connection id, sends keep-alives
+to idle SSE clients from a single shared heartbeat task and tracks delivery lag.
+Events are encoded once per wire encoding and the frame is shared by every
+client that negotiated it.
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.api.event_codec import ENCODERS, Frame
+from src.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+KEEPALIVE_FRAME = ": keep-alive\n\n"
+
+# Queue items are (enqueued_at, frame) tuples; None tells the stream to close
+QueueItem = Optional[Tuple[float, Frame]]
+
+
+class HubConnection:
+    """A single client stream and its delivery statistics"""
+
+    __slots__ = (
+        "id", "encoding", "keepalive", "queue", "connected_at", "last_sent",
+        "events_sent", "last_lag", "max_lag", "closed",
+    )
+
+    def __init__(self, conn_id: int, queue_size: int, encoding: str, keepalive: bool):
+        now = time.monotonic()
+        self.id = conn_id
+        self.encoding = encoding
+        self.keepalive = keepalive
+        self.queue: "asyncio.Queue[QueueItem]" = asyncio.Queue(maxsize=queue_size)
+        self.connected_at = now
+        self.last_sent = now
+        self.events_sent = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.closed = False
+
+    def offer(self, item: Tuple[float, Frame]) -> bool:
+        """Queue a frame without waiting; returns False if the client is too far behind"""
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def close(self) -> None:
+        """Discard pending frames and wake the stream so it can finish"""
+        if self.closed:
+            return
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def frames(self):
+        """Yield frames for this client until the connection is closed"""
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+            enqueued_at, frame = item
+            yield frame
+            # Resuming here means the previous frame was handed to the transport
+            now = time.monotonic()
+            self.last_sent = now
+            if frame is not KEEPALIVE_FRAME:
+                lag = now - enqueued_at
+                self.events_sent += 1
+                self.last_lag = lag
+                if lag > self.max_lag:
+                    self.max_lag = lag
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "id": self.id,
+            "encoding": self.encoding,
+            "age_seconds": round(now - self.connected_at, 3),
+            "idle_seconds": round(now - self.last_sent, 3),
+            "queue_depth": self.queue.qsize(),
+            "events_sent": self.events_sent,
+            "last_lag_ms": round(self.last_lag * 1000, 3),
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+        }
+
+
+class ConnectionHub:
+    """Registry of open event stream connections with a shared heartbeat"""
+
+    def __init__(self, heartbeat_interval: float, queue_size: int):
+        self.heartbeat_interval = heartbeat_interval
+        self.queue_size = queue_size
+        self._connections: Dict[int, HubConnection] = {}
+        self._ids = itertools.count(1)
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self.total_connected = 0
+        self.total_dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._connections)
+
+    def register(self, encoding: str = "sse", keepalive: bool = True) -> HubConnection:
+        """
+        Create and register a connection for a new client.
+
+        Args:
+            encoding: Name of the encoder in event_codec.ENCODERS for this client
+            keepalive: Whether the shared heartbeat should send keep-alive frames
+        """
+        if encoding not in ENCODERS:
+            raise ValueError(f"Unknown event encoding: {encoding}")
+        conn = HubConnection(next(self._ids), self.queue_size, encoding, keepalive)
+        self._connections[conn.id] = conn
+        self.total_connected += 1
+        if keepalive and (self._heartbeat_task is None or self._heartbeat_task.done()):
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+        return conn
+
+    def unregister(self, conn: HubConnection) -> None:
+        self._connections.pop(conn.id, None)
+
+    def broadcast(self, event: Dict[str, Any]) -> int:
+        """
+        Encode an event and queue it for every connection.
+
+        The event is encoded at most once per encoding in use. Clients whose
+        queue is full are dropped instead of slowing down the publisher.
+        Returns the number of connections the event was queued for.
+        """
+        now = time.monotonic()
+        items: Dict[str, Tuple[float, Frame]] = {}
+        slow = []
+        for conn in self._connections.values():
+            item = items.get(conn.encoding)
+            if item is None:
+                item = items[conn.encoding] = (now, ENCODERS[conn.encoding](event))
+            if not conn.offer(item):
+                slow.append(conn)
+        for conn in slow:
+            logger.warning(f"Dropping SSE connection {conn.id}: queue full ({self.queue_size} events)")
+            self.unregister(conn)
+            conn.close()
+        self.total_dropped += len(slow)
+        return len(self._connections)
+
+    async def _heartbeat_loop(self) -> None:
+        """Send keep-alives to idle SSE clients; exits once no connections remain"""
+        while self._connections:
+            await asyncio.sleep(self.heartbeat_interval)
+            now = time.monotonic()
+            idle_since = now - self.heartbeat_interval
+            item = (now, KEEPALIVE_FRAME)
+            for conn in self._connections.values():
+                if conn.keepalive and conn.last_sent <= idle_since and conn.queue.empty():
+                    conn.offer(item)
+
+    async def close(self) -> None:
+        """Stop the heartbeat and end every open stream (used on shutdown)"""
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+        for conn in list(self._connections.values()):
+            conn.close()
+        self._connections.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Aggregate connection count, queue depth and lag statistics"""
+        depth_total = 0
+        depth_max = 0
+        lag_total = 0.0
+        lag_max = 0.0
+        encodings: Dict[str, int] = {}
+        for conn in self._connections.values():
+            encodings[conn.encoding] = encodings.get(conn.encoding, 0) + 1
+            depth = conn.queue.qsize()
+            depth_total += depth
+            depth_max = max(depth_max, depth)
+            lag_total += conn.last_lag
+            lag_max = max(lag_max, conn.max_lag)
+        count = len(self._connections)
+        return {
+            "connections": count,
+            "encodings": encodings,
+            "total_connected": self.total_connected,
+            "total_dropped": self.total_dropped,
+            "queue_depth_total": depth_total,
+            "queue_depth_max": depth_max,
+            "lag_avg_ms": round(lag_total / count * 1000, 3) if count else 0.0,
+            "lag_max_ms": round(lag_max * 1000, 3),
+            "heartbeat_interval": self.heartbeat_interval,
+        }
+
+    def connection_stats(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Per-connection statistics, most lagging connections first"""
+        conns = sorted(self._connections.values(), key=lambda c: c.last_lag, reverse=True)
+        if limit is not None:
+            conns = conns[:limit]
+        return [conn.stats() for conn in conns]
+
+
+# Shared hub for the star event stream
+hub = ConnectionHub(
+    heartbeat_interval=settings.SSE.HEARTBEAT_INTERVAL,
+    queue_size=settings.SSE.QUEUE_SIZE,
+)
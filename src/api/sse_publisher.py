@@ -1,38 +1,46 @@
-"""
-Publisher for Server-Sent Events.
-This module provides functions to publish events to the SSE queues.
-"""
-
-import asyncio
-import logging
-from typing import Dict, Any, Optional, Union
-
-# Import the event queues from the SSE module
-from src.api.sse import connections
-
-logger = logging.getLogger(__name__)
-
-async def publish_star_event(event_type: str, data: Dict[str, Any]) -> None:
-    """
-    Publish an event to all SSE queues.
-    
-    Args:
-        event_type: Type of event ('create', 'update', 'delete')
-        data: Event data containing star information
-    """
-    event = {
-        "type": event_type,
-        "data": data
-    }
-    
-    try:
-        tasks = []
-        for queue in connections:
-            tasks.append(queue.put(event))  # Use awaitable put()
-
-        # Ensure all tasks are completed before continuing
-        await asyncio.gather(*tasks)
-
-        logger.debug(f"Published star event: {event_type}")
-    except Exception as e:
-        logger.error(f"Failed to publish star event: {str(e)}")
+"""
+Publisher for Server-Sent Events.
+This module provides functions to publish events to the connection hub, which
+feeds both the SSE stream and the WebSocket endpoint.
+"""
+
+import logging
+import time
+from typing import Dict, Any
+
+from src.api.sse_hub import hub
+from src.utils.metrics import sse_publish_duration, sse_publish_fanout
+from src.utils.tracing import record_span
+
+logger = logging.getLogger(__name__)
+
+async def publish_event(event: Dict[str, Any]) -> None:
+    """
+    Publish a raw event to all SSE and WebSocket connections.
+
+    The event is serialized once per wire encoding and the same frame is
+    queued for every client using that encoding.
+    """
+    try:
+        start = time.perf_counter()
+        delivered = hub.broadcast(event)
+        elapsed = time.perf_counter() - start
+        sse_publish_duration.observe(elapsed)
+        record_span("sse", start, elapsed)
+        sse_publish_fanout.observe(delivered)
+        logger.debug("Published event to %d connections", delivered)
+    except Exception as e:
+        logger.error(f"Failed to publish event: {str(e)}")
+
+async def publish_star_event(event_type: str, data: Dict[str, Any]) -> None:
+    """
+    Publish a star event to all SSE and WebSocket connections.
+
+    Args:
+        event_type: Type of event ('create', 'update', 'delete')
+        data: Event data containing star information
+    """
+    await publish_event({
+        "type": event_type,
+        "data": data
+    })
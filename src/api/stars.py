@@ -1,455 +1,524 @@
-# stars.py (backend)
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi_limiter.depends import RateLimiter
-import logging
-import json
-import asyncio
-import math
-import uuid
-
-from src.config.settings import settings
-from src.models.star import Star#, calculate_current_brightness
-from src.db.azure_tables import tables
-from src.db.redis_cache import is_cache_initialized
-from src.dependencies.providers import get_redis, get_table_storage
-from fastapi_cache import FastAPICache
-from datetime import datetime
-import datetime as dt
-from src.api.sse_publisher import publish_star_event
-
-import time
-
-router = APIRouter()
-logger = logging.getLogger(__name__)
-
-@router.get("/")
-async def get_stars():
-    """Return all stars with their current brightness."""
-    logger.info("Fetching stars from Azure Table Storage")
-    
-    all_stars = list(tables["Stars"].list_entities())
-    logger.info(f"Found {len(all_stars)} total entities in the Stars table")
-    
-    return [{
-        "id": star["RowKey"],
-        "x": star["X"],
-        "y": star["Y"],
-        "message": star["Message"],
-        "last_liked": star["LastLiked"],
-        "creation_date": star["creationDate"],
-        "user_id": star["UserId"],
-        "username": star["Username"]
-    } for star in all_stars]
-
-@router.get("/active", include_in_schema=True)
-async def get_active_stars():
-    """Get all stars that have been liked recently."""
-    logger.info("Fetching active stars")
-    
-    try:
-        # Get the current time and calculate cutoff
-        current_time = datetime.now(dt.timezone.utc).timestamp()
-        cutoff_time = current_time - settings.REDIS.POPULARITY_WINDOW
-        logger.info(f"Current time: {current_time}, Cutoff time: {cutoff_time}")
-        
-        # Get all stars first, then filter
-        try:
-            all_stars = list(tables["Stars"].list_entities())
-            logger.info(f"Retrieved {len(all_stars)} total stars")
-        except Exception as e:
-            logger.error(f"Error retrieving stars from table: {str(e)}")
-            # Return empty list instead of error
-            return []
-        
-        # Filter stars manually
-        active_stars = []
-        for star in all_stars:
-            # Debug log to see what's in the star record
-            logger.debug(f"Star: {star.get('RowKey')}, LastLiked: {star.get('LastLiked')}")
-            
-            # Check if LastLiked exists and is recent
-            if "LastLiked" in star and star["LastLiked"] >= cutoff_time:
-                try:
-                    active_stars.append({
-                        "id": star["RowKey"],
-                        "x": star["X"],
-                        "y": star["Y"],
-                        "message": star["Message"],
-                        "last_liked": star["LastLiked"],
-                        "creation_date": star["creationDate"],
-                        "user_id": star["UserId"],
-                        "username": star["Username"]
-                    })
-                except Exception as star_error:
-                    logger.warning(f"Error processing star {star.get('RowKey')}: {str(star_error)}")
-                    continue
-        
-        logger.info(f"Found {len(active_stars)} active stars")
-        
-        # Try to cache the result if Redis is available
-        if is_cache_initialized():
-            try:
-                await FastAPICache.get_backend().set(
-                    "active_stars",
-                    json.dumps(active_stars),
-                    expire=300
-                )
-                logger.info("Cached active stars in Redis")
-            except Exception as e:
-                logger.warning(f"Failed to cache active stars: {str(e)}")
-        
-        # Return empty list if no active stars found
-        return active_stars
-        
-    except Exception as e:
-        logger.error(f"Unexpected error in get_active_stars: {str(e)}")
-        # Return empty list instead of error for robustness
-        return []
-
-async def _get_star_impl(star_id: str):  # Ensure star_id is str
-    """Implementation of get_star without the cache decorator."""
-    try:
-        # Check if Redis is initialized and available
-        redis = None
-        recent_likes = None
-        try:
-            if is_cache_initialized():
-                redis = FastAPICache.get_backend().client
-                popularity_key = f"star_popularity:{star_id}"
-                recent_likes = await redis.get(popularity_key)
-        except Exception as redis_error:
-            logger.warning(f"Redis error when getting star {star_id}: {str(redis_error)}")
-            # Continue without Redis
-        
-        logger.info(f"Looking up star with id: {star_id}")
-        
-        # Try to find the star across all partition keys
-        star = None
-        all_entities = list(tables["Stars"].list_entities())
-        
-        for entity in all_entities:
-            if entity.get("RowKey") == star_id:
-                star = entity
-                logger.info(f"Found star with PartitionKey: {star.get('PartitionKey')}")
-                break
-                
-        if not star:
-            logger.warning(f"Star with id {star_id} not found in any partition")
-            raise HTTPException(status_code=404, detail="Star not found")
-        
-        response = { # TODO CHANGE!!!
-            "id": star["RowKey"],
-            "x": star["X"],
-            "y": star["Y"],
-            "message": star["Message"],
-            "last_liked": star["LastLiked"],
-            "creation_date": star["creationDate"],
-            "user_id": star["UserId"],
-            "username": star["Username"],
-            "is_popular": recent_likes is not None and int(recent_likes) >= settings.REDIS.POPULARITY_THRESHOLD
-        }
-
-        # If star is popular and Redis is available, update cache with longer TTL
-        if response["is_popular"] and redis is not None:
-            try:
-                await FastAPICache.get_backend().set(
-                    f"star:{star_id}",
-                    json.dumps(response),
-                    expire=settings.REDIS.POPULAR_CACHE_TTL
-                )
-            except Exception as cache_error:
-                logger.warning(f"Could not cache popular star {star_id}: {str(cache_error)}")
-            
-        return response
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error retrieving star {star_id}: {str(e)}")
-        raise HTTPException(status_code=404, detail="Star not found")
-
-@router.get("/{star_id}")
-async def get_star(star_id: str):  # Ensure star_id is str
-    """Get a specific star with automatic caching if available."""
-    if star_id == "active":
-        logger.warning("get_star was called with 'active' as the star_id, which might indicate a routing issue")
-        return []
-    return await _get_star_impl(star_id)
-
-@router.post("/{star_id}/like")
-async def like_star(
-    star_id: str,  # Ensure star_id is str
-):
-    """Like a star and update popularity metrics."""
-    try:
-        logger.info(f"Liking star with id: {star_id}")
-        
-        # Try to find the star across all partition keys
-        star = None
-        all_entities = list(tables["Stars"].list_entities())
-        
-        for entity in all_entities: # TODO maybe this should be a more efficient search
-            if entity.get("RowKey") == star_id:
-                star = entity
-                logger.info(f"Found star to like with PartitionKey: {star.get('PartitionKey')}")
-                break
-                
-        if not star:
-            logger.warning(f"Star with id {star_id} not found in any partition")
-            raise HTTPException(status_code=404, detail="Star not found")
-            
-        current_time = time.time() - 1735689600
-        
-        # Update the star's brightness and last_liked time
-        try:
-            star["LastLiked"] =min(star["LastLiked"] + 3600 , current_time)
-        except Exception as e:
-            logger.error(f"Error updating star {star_id}: {str(e)}")
-            raise HTTPException(status_code=500, detail="Error updating star")
-
-        # Try to update popularity counter in Redis if available
-        try:
-            if is_cache_initialized():
-                redis = FastAPICache.get_backend().client
-                popularity_key = f"star_popularity:{star_id}"
-                
-                # Increment likes counter with expiry
-                await redis.incr(popularity_key)
-                await redis.expire(popularity_key, settings.REDIS.POPULARITY_WINDOW)
-                
-                # Try to invalidate the star's cache to force refresh
-                try:
-                    await FastAPICache.get_backend().delete(f"star:{star_id}")
-                except Exception as cache_error:
-                    logger.warning(f"Failed to invalidate cache for star {star_id}: {str(cache_error)}")
-        except Exception as redis_error:
-            logger.warning(f"Redis error during like operation for star {star_id}: {str(redis_error)}")
-            # Continue without Redis functionality
-
-        tables["Stars"].update_entity(star)
-        
-        # Use the new publisher module
-        try:
-            await publish_star_event("update", {
-                "id": star_id,
-                "last_liked": star["LastLiked"]
-            })
-        except Exception as e:
-            logger.warning(f"Failed to publish event for star {star_id}: {str(e)}")
-        
-        return {
-            "id": star_id,
-            "last_liked": star["LastLiked"]
-        }
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error liking star {star_id}: {str(e)}")
-        raise HTTPException(status_code=404, detail="Star not found")
-
-@router.post("/{star_id}/dislike")
-async def dislike_star(
-    star_id: str,  # Ensure star_id is str
-):
-    """Like a star and update popularity metrics."""
-    try:
-        logger.info(f"Liking star with id: {star_id}")
-        
-        # Try to find the star across all partition keys
-        star = None
-        all_entities = list(tables["Stars"].list_entities())
-        
-        for entity in all_entities: # TODO maybe this should be a more efficient search
-            if entity.get("RowKey") == star_id:
-                star = entity
-                logger.info(f"Found star to like with PartitionKey: {star.get('PartitionKey')}")
-                break
-                
-        if not star:
-            logger.warning(f"Star with id {star_id} not found in any partition")
-            raise HTTPException(status_code=404, detail="Star not found")
-            
-        current_time = time.time() - 1735689600
-        
-        # Update the star's brightness and last_liked time
-        try:
-            star["LastLiked"] = (star["LastLiked"] - 3600)
-        except Exception as e:
-            logger.error(f"Error updating star {star_id}: {str(e)}")
-            raise HTTPException(status_code=500, detail="Error updating star")
-
-        # Try to update popularity counter in Redis if available
-        try:
-            if is_cache_initialized():
-                redis = FastAPICache.get_backend().client
-                popularity_key = f"star_popularity:{star_id}"
-                
-                # Increment likes counter with expiry
-                await redis.incr(popularity_key)
-                await redis.expire(popularity_key, settings.REDIS.POPULARITY_WINDOW)
-                
-                # Try to invalidate the star's cache to force refresh
-                try:
-                    await FastAPICache.get_backend().delete(f"star:{star_id}")
-                except Exception as cache_error:
-                    logger.warning(f"Failed to invalidate cache for star {star_id}: {str(cache_error)}")
-        except Exception as redis_error:
-            logger.warning(f"Redis error during like operation for star {star_id}: {str(redis_error)}")
-            # Continue without Redis functionality
-
-        tables["Stars"].update_entity(star)
-        
-        # Use the new publisher module
-        try:
-            await publish_star_event("update", {
-                "id": star_id,
-                "last_liked": star["LastLiked"]
-            })
-        except Exception as e:
-            logger.warning(f"Failed to publish event for star {star_id}: {str(e)}")
-        
-        return {
-            "id": star_id,
-            "last_liked": star["LastLiked"]
-        }
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error liking star {star_id}: {str(e)}")
-        raise HTTPException(status_code=404, detail="Star not found")
-
-@router.post("/")
-async def add_star(star: Star):
-    """Create a new star"""
-    try:
-        current_time = time.time() - 1735689600
-        star_id = str(uuid.uuid4())  # Generate ID on the backend
-        star_entity = {
-            "PartitionKey": f"STAR_{datetime.now(dt.timezone.utc).strftime('%Y%m')}",
-            "RowKey": star_id,  # Use the backend-generated ID
-            "X": star.x,
-            "Y": star.y,
-            "Message": star.message,
-            "LastLiked": current_time,
-            "creationDate": current_time,
-            "UserId": star.user_id,
-            "Username": star.username
-        }
-        tables["Stars"].create_entity(star_entity)
-
-        # Publish the create event
-        try:
-            await publish_star_event("create", {
-                "id": star_id,
-                "x": star.x,
-                "y": star.y,
-                "message": None,
-                "last_liked": current_time,
-                "creation_date": current_time,
-                "user_id": star.user_id,
-                "username": None
-            })
-        except Exception as e:
-            logger.warning(f"Failed to publish event for new star: {str(e)}")
-            
-        return {
-            "id": star_id,  # Return the backend-generated ID
-            "x": star.x,
-            "y": star.y,
-            "message": star.message,
-            "last_liked": current_time,
-            "creation_date": current_time,
-            "user_id": star.user_id,
-            "username": star.username
-        }
-    except Exception as e:
-        logger.error(f"Error creating star: {str(e)}")
-        raise HTTPException(status_code=500, detail="Error creating star")
-
-@router.get("/popular")
-async def get_popular_stars():
-    """Get currently popular stars."""
-    popular_stars = []
-    
-    # Check if Redis is available
-    if not is_cache_initialized():
-        logger.warning("Redis cache not initialized, cannot get popular stars")
-        return popular_stars
-        
-    try:
-        redis = FastAPICache.get_backend().client
-        
-        # Get all popularity counters
-        keys = await redis.keys("star_popularity:*")
-        
-        for key in keys:
-            star_id = key.split(":")[1]
-            likes = int(await redis.get(key) or 0)
-            
-            if likes >= settings.REDIS.POPULARITY_THRESHOLD:
-                try:
-                    star = await _get_star_impl(star_id)
-                    popular_stars.append(star)
-                except HTTPException:
-                    continue
-                
-        return sorted(popular_stars, key=lambda x: x["creation_date"], reverse=True)
-    except Exception as e:
-        logger.error(f"Error getting popular stars: {str(e)}")
-        return popular_stars
-
-@router.get("/batch/{star_ids}")
-async def get_stars_batch(star_ids: str):
-    """Get multiple stars in a single request."""
-    ids = star_ids.split(",")
-    stars = []
-    
-    for star_id in ids:
-        try:
-            star = await get_star(star_id.strip())
-            stars.append(star)
-        except HTTPException:
-            continue
-    
-    return stars
-
-@router.delete("/{star_id}") # TODO NEEDS TO BE FULLY IMPLEMENTED !!! 
-async def remove_star(star_id: str):  # Ensure star_id is str
-    """Remove a star by ID and push an SSE event."""
-    try:
-        # Try to find the star across all partition keys
-        star = None
-        all_entities = list(tables["Stars"].list_entities())
-        
-        for entity in all_entities:
-            if entity.get("RowKey") == star_id:
-                star = entity
-                break
-                
-        if not star:
-            raise HTTPException(status_code=404, detail=f"Star with ID {star_id} not found")
-            
-        tables["Stars"].delete_entity(star["PartitionKey"], star["RowKey"])
-
-        # Use the new publisher module
-        try:
-            await publish_star_event("delete", { # TODO ??!?!?!!??!
-                "id": star_id,
-                "x": star.get("X"),
-                "y": star.get("Y"),
-                "message": star.get("Message")
-            })
-        except Exception as e:
-            logger.warning(f"Failed to publish event for removed star: {str(e)}")
-
-        return {"id": star_id, "status": "deleted"}
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error removing star: {str(e)}")
-        raise HTTPException(status_code=500, detail="Error removing star")
-
-# def calculate_current_brightness(base_brightness: float, last_liked: float) -> float:
-#     """Calculate the current brightness of a star based on time since last liked"""
-#     time_since_liked = datetime.now(dt.timezone.utc).timestamp() - last_liked
-#     decay_factor = max(0.01, 1.0 - 0.01 * time_since_liked)
-#     return max(20.0, base_brightness * math.exp(-decay_factor * time_since_liked))
+# stars.py (backend)
+from fastapi import APIRouter, HTTPException, Depends, Query, Header
+import logging
+import json
+import asyncio
+import math
+import uuid
+from typing import Optional
+
+from src.config.settings import settings
+from src.models.star import Star, calculate_brightness_batch, star_time
+from src.db.redis_cache import is_cache_initialized, get_redis_client
+from src.dependencies.providers import get_database, get_redis, get_table_storage
+from fastapi_cache import FastAPICache
+from datetime import datetime
+import datetime as dt
+from src.api.sse_publisher import publish_star_event
+from src.api.serialization import dumps, json_response, star_to_dict, stars_to_json, etag_matches, not_modified_response
+from src.api.compression import COMPRESSORS, CompressedBodyCache, negotiate_encoding
+from src.utils.rate_limit import create_limiter, vote_limiter, rate_limit
+from src.utils.deadline import DeadlineExceeded, deadline
+from src.db.versioning import (
+    LOCAL_ETAG_SECONDS, get_version, bump_version, get_changes_since, star_change, StarVersion, ChangesTooOld
+)
+
+import time
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Most recent compact brightness response, keyed by time bucket
+_brightness_cache = {"bucket": None, "body": None}
+
+# Full star list body and its compressed forms for the current version.
+# Without Redis other replicas' writes do not bump the local version, so
+# those bodies are only trusted as long as its ETags.
+_full_map_cache = CompressedBodyCache(ttl=LOCAL_ETAG_SECONDS)
+
+# Stars drop out of the active window as time passes, so the active list's
+# ETag also changes with this time bucket (seconds)
+ACTIVE_ETAG_BUCKET = 60
+
+def _full_map_etag(version: StarVersion, encoding: str) -> str:
+    """Each content coding of the full map is its own representation with its own ETag"""
+    return version.etag() if encoding == "identity" else version.etag(f"-{encoding}")
+
+@router.get("/", dependencies=[Depends(deadline(settings.API.LIST_DEADLINE))])
+async def get_stars(
+    brightness: bool = Query(False, description="Include server-computed current brightness"),
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
+):
+    """Return all stars, optionally with their current brightness."""
+    # Brightness changes with time alone, so only the plain list is versioned
+    # and served from the precompressed cache
+    if not brightness:
+        version = await get_version()
+        # Any coding of the current version is still valid for the client
+        # holding it, e.g. identity served because the body was small
+        for encoding in ("identity", *COMPRESSORS):
+            etag = _full_map_etag(version, encoding)
+            if etag_matches(if_none_match, etag):
+                return not_modified_response(etag, vary="Accept-Encoding")
+        encoding, body = await _full_map_cache.get(
+            str(version), _load_full_map, negotiate_encoding(accept_encoding), volatile=not version.shared
+        )
+        etag = _full_map_etag(version, encoding)
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return json_response(body, headers=headers)
+
+    logger.info("Fetching stars from Azure Table Storage")
+    
+    stars = [star_to_dict(star) for star in await list_stars()]
+    logger.info("Found %d total entities in the Stars table", len(stars))
+
+    values = calculate_brightness_batch([star["last_liked"] for star in stars])
+    for star, value in zip(stars, values):
+        star["brightness"] = round(value, 2)
+    
+    return json_response(stars)
+
+async def list_stars() -> list:
+    """Every star, read off the event loop within the request deadline"""
+    return await get_database().list_stars()
+
+async def _load_full_map() -> bytes:
+    """Serialize the whole Stars table for the full-map cache"""
+    logger.info("Fetching stars from Azure Table Storage")
+    entities = await list_stars()
+    logger.info("Found %d total entities in the Stars table", len(entities))
+    return stars_to_json(entities)
+
+@router.get("/active", include_in_schema=True, dependencies=[Depends(deadline(settings.API.LIST_DEADLINE))])
+async def get_active_stars(if_none_match: Optional[str] = Header(None)):
+    """Get all stars that have been liked recently."""
+    version = await get_version()
+    etag = version.etag(f"-a{int(star_time() // ACTIVE_ETAG_BUCKET)}")
+    if etag_matches(if_none_match, etag):
+        return not_modified_response(etag)
+
+    logger.info("Fetching active stars")
+    
+    try:
+        # Get the current time and calculate cutoff
+        current_time = star_time()
+        cutoff_time = current_time - settings.REDIS.POPULARITY_WINDOW
+        logger.debug("Current time: %s, Cutoff time: %s", current_time, cutoff_time)
+        
+        try:
+            recent_stars = await get_database().active_stars(cutoff_time)
+            logger.info("Retrieved %d recently liked stars", len(recent_stars))
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error retrieving stars from table: {str(e)}")
+            # Return empty list instead of error
+            return []
+        
+        active_stars = []
+        for star in recent_stars:
+            try:
+                active_stars.append(star_to_dict(star))
+            except Exception as star_error:
+                logger.warning(f"Error processing star {star.get('RowKey')}: {str(star_error)}")
+                continue
+        
+        logger.info("Found %d active stars", len(active_stars))
+        body = dumps(active_stars)
+        
+        # Try to cache the result if Redis is available
+        if is_cache_initialized():
+            try:
+                await FastAPICache.get_backend().set(
+                    "active_stars",
+                    body,
+                    expire=300
+                )
+                logger.info("Cached active stars in Redis")
+            except Exception as e:
+                logger.warning(f"Failed to cache active stars: {str(e)}")
+        
+        # Return empty list if no active stars found
+        return json_response(body, headers={"ETag": etag, "Cache-Control": "no-cache"})
+        
+    except HTTPException:
+        # Deadline and throttling errors must reach the client as 504/503
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in get_active_stars: {str(e)}")
+        # Return empty list instead of error for robustness
+        return []
+
+@router.get("/changes")
+async def get_star_changes(since: str = Query(..., description="Version from a previous ETag or changes response")):
+    """
+    Creates, updates and deletes since a version, one entry per star.
+
+    Replies 410 with "resync" set when the journal no longer reaches back to
+    `since`; the client should then fetch GET /stars again.
+    """
+    try:
+        since_version = StarVersion.parse(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid version: {since}")
+
+    try:
+        return json_response(await get_changes_since(since_version))
+    except ChangesTooOld as e:
+        return json_response({
+            "detail": "Changes since this version are no longer available, full resync required",
+            "resync": True,
+            "version": str(e.version)
+        }, status_code=410)
+
+@router.get("/brightness", dependencies=[Depends(deadline(settings.API.LIST_DEADLINE))])
+async def get_star_brightness():
+    """
+    Current brightness of every star in a compact form.
+
+    Returns parallel "ids" and "b" arrays. The response is computed once per
+    BRIGHTNESS_BUCKET_SECONDS time bucket and shared by every client polling it.
+    """
+    bucket_seconds = settings.BRIGHTNESS.BUCKET_SECONDS
+    bucket = int(star_time() // bucket_seconds)
+    if _brightness_cache["bucket"] == bucket:
+        return json_response(_brightness_cache["body"])
+
+    entities = await list_stars()
+    values = calculate_brightness_batch(
+        [entity.get("LastLiked") for entity in entities],
+        now=bucket * bucket_seconds
+    )
+    body = dumps({
+        "t": bucket * bucket_seconds,
+        "model": settings.BRIGHTNESS.MODEL,
+        "ids": [entity["RowKey"] for entity in entities],
+        "b": [round(value, 1) for value in values]
+    })
+    _brightness_cache["bucket"] = bucket
+    _brightness_cache["body"] = body
+    return json_response(body)
+
+async def _get_star_impl(star_id: str):  # Ensure star_id is str
+    """Implementation of get_star without the cache decorator."""
+    try:
+        # Check if Redis is initialized and available
+        redis = None
+        recent_likes = None
+        try:
+            if is_cache_initialized("counters"):
+                redis = get_redis_client("counters")
+                popularity_key = f"star_popularity:{star_id}"
+                recent_likes = await redis.get(popularity_key)
+        except Exception as redis_error:
+            logger.warning(f"Redis error when getting star {star_id}: {str(redis_error)}")
+            # Continue without Redis
+        
+        logger.info("Looking up star with id: %s", star_id)
+        
+        star = await get_database().get_star(star_id)
+        if not star:
+            logger.warning(f"Star with id {star_id} not found in any partition")
+            raise HTTPException(status_code=404, detail="Star not found")
+        
+        response = star_to_dict(star)
+        response["is_popular"] = recent_likes is not None and int(recent_likes) >= settings.REDIS.POPULARITY_THRESHOLD
+
+        # If star is popular and Redis is available, update cache with longer TTL
+        if response["is_popular"] and redis is not None:
+            try:
+                await FastAPICache.get_backend().set(
+                    f"star:{star_id}",
+                    dumps(response),
+                    expire=settings.REDIS.POPULAR_CACHE_TTL
+                )
+            except Exception as cache_error:
+                logger.warning(f"Could not cache popular star {star_id}: {str(cache_error)}")
+            
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving star {star_id}: {str(e)}")
+        raise HTTPException(status_code=404, detail="Star not found")
+
+@router.get("/popular", dependencies=[Depends(deadline(settings.API.LIST_DEADLINE))])
+async def get_popular_stars():
+    """Get currently popular stars."""
+    # Declared before /{star_id}, which would otherwise match /popular
+    popular_stars = []
+    
+    # Check if Redis is available
+    if not is_cache_initialized("counters"):
+        logger.warning("Redis cache not initialized, cannot get popular stars")
+        return popular_stars
+        
+    try:
+        redis = get_redis_client("counters")
+        
+        # Get all popularity counters
+        keys = await redis.keys("star_popularity:*")
+        
+        for key in keys:
+            star_id = key.split(":")[1]
+            likes = int(await redis.get(key) or 0)
+            
+            if likes >= settings.REDIS.POPULARITY_THRESHOLD:
+                try:
+                    star = await _get_star_impl(star_id)
+                    popular_stars.append(star)
+                except DeadlineExceeded:
+                    raise
+                except HTTPException:
+                    continue
+                
+        return json_response(sorted(popular_stars, key=lambda x: x["creation_date"] or 0, reverse=True))
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting popular stars: {str(e)}")
+        return json_response(popular_stars)
+
+@router.get("/viewport", dependencies=[Depends(deadline(settings.API.LIST_DEADLINE))])
+async def get_stars_in_viewport(
+    x_min: float = Query(..., allow_inf_nan=False, description="Left edge of the visible area"),
+    y_min: float = Query(..., allow_inf_nan=False, description="Bottom edge of the visible area"),
+    x_max: float = Query(..., allow_inf_nan=False, description="Right edge of the visible area"),
+    y_max: float = Query(..., allow_inf_nan=False, description="Top edge of the visible area")
+):
+    """Stars inside a rectangle of the map, edges included."""
+    if x_min > x_max or y_min > y_max:
+        raise HTTPException(status_code=400, detail="x_min and y_min must not exceed x_max and y_max")
+    stars = await get_database().stars_in_viewport(x_min, y_min, x_max, y_max)
+    return json_response([star_to_dict(star) for star in stars])
+
+@router.get("/user/{user_id}", dependencies=[Depends(deadline(settings.API.LIST_DEADLINE))])
+async def get_user_stars(user_id: str):
+    """Stars created by one user."""
+    stars = await get_database().stars_by_user(user_id)
+    return json_response([star_to_dict(star) for star in stars])
+
+@router.get("/{star_id}", dependencies=[Depends(deadline(settings.API.READ_DEADLINE))])
+async def get_star(star_id: str):  # Ensure star_id is str
+    """Get a specific star with automatic caching if available."""
+    if star_id == "active":
+        logger.warning("get_star was called with 'active' as the star_id, which might indicate a routing issue")
+        return json_response([])
+    return json_response(await _get_star_impl(star_id))
+
+@router.post("/{star_id}/like", dependencies=[Depends(deadline(settings.API.WRITE_DEADLINE)), Depends(rate_limit(vote_limiter, "vote"))])
+async def like_star(
+    star_id: str,  # Ensure star_id is str
+):
+    """Like a star and update popularity metrics."""
+    try:
+        logger.info("Liking star with id: %s", star_id)
+        
+        star = await get_database().get_star(star_id)
+        if not star:
+            logger.warning(f"Star with id {star_id} not found in any partition")
+            raise HTTPException(status_code=404, detail="Star not found")
+            
+        current_time = star_time()
+        
+        # Update the star's brightness and last_liked time
+        try:
+            star["LastLiked"] =min(star["LastLiked"] + 3600 , current_time)
+        except Exception as e:
+            logger.error(f"Error updating star {star_id}: {str(e)}")
+            raise HTTPException(status_code=500, detail="Error updating star")
+
+        # Try to update popularity counter in Redis if available
+        try:
+            if is_cache_initialized("counters"):
+                redis = get_redis_client("counters")
+                popularity_key = f"star_popularity:{star_id}"
+                
+                # Increment likes counter with expiry
+                await redis.incr(popularity_key)
+                await redis.expire(popularity_key, settings.REDIS.POPULARITY_WINDOW)
+                
+                # Try to invalidate the star's cache to force refresh
+                try:
+                    await FastAPICache.get_backend().delete(f"star:{star_id}")
+                except Exception as cache_error:
+                    logger.warning(f"Failed to invalidate cache for star {star_id}: {str(cache_error)}")
+        except Exception as redis_error:
+            logger.warning(f"Redis error during like operation for star {star_id}: {str(redis_error)}")
+            # Continue without Redis functionality
+
+        await get_database().update_star(star)
+        await bump_version([star_change("update", {"id": star_id, "last_liked": star["LastLiked"]})])
+        
+        # Use the new publisher module
+        try:
+            await publish_star_event("update", {
+                "id": star_id,
+                "last_liked": star["LastLiked"]
+            })
+        except Exception as e:
+            logger.warning(f"Failed to publish event for star {star_id}: {str(e)}")
+        
+        return {
+            "id": star_id,
+            "last_liked": star["LastLiked"]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error liking star {star_id}: {str(e)}")
+        raise HTTPException(status_code=404, detail="Star not found")
+
+@router.post("/{star_id}/dislike", dependencies=[Depends(deadline(settings.API.WRITE_DEADLINE)), Depends(rate_limit(vote_limiter, "vote"))])
+async def dislike_star(
+    star_id: str,  # Ensure star_id is str
+):
+    """Like a star and update popularity metrics."""
+    try:
+        logger.info("Liking star with id: %s", star_id)
+        
+        star = await get_database().get_star(star_id)
+        if not star:
+            logger.warning(f"Star with id {star_id} not found in any partition")
+            raise HTTPException(status_code=404, detail="Star not found")
+            
+        current_time = star_time()
+        
+        # Update the star's brightness and last_liked time
+        try:
+            star["LastLiked"] = (star["LastLiked"] - 3600)
+        except Exception as e:
+            logger.error(f"Error updating star {star_id}: {str(e)}")
+            raise HTTPException(status_code=500, detail="Error updating star")
+
+        # Try to update popularity counter in Redis if available
+        try:
+            if is_cache_initialized("counters"):
+                redis = get_redis_client("counters")
+                popularity_key = f"star_popularity:{star_id}"
+                
+                # Increment likes counter with expiry
+                await redis.incr(popularity_key)
+                await redis.expire(popularity_key, settings.REDIS.POPULARITY_WINDOW)
+                
+                # Try to invalidate the star's cache to force refresh
+                try:
+                    await FastAPICache.get_backend().delete(f"star:{star_id}")
+                except Exception as cache_error:
+                    logger.warning(f"Failed to invalidate cache for star {star_id}: {str(cache_error)}")
+        except Exception as redis_error:
+            logger.warning(f"Redis error during like operation for star {star_id}: {str(redis_error)}")
+            # Continue without Redis functionality
+
+        await get_database().update_star(star)
+        await bump_version([star_change("update", {"id": star_id, "last_liked": star["LastLiked"]})])
+        
+        # Use the new publisher module
+        try:
+            await publish_star_event("update", {
+                "id": star_id,
+                "last_liked": star["LastLiked"]
+            })
+        except Exception as e:
+            logger.warning(f"Failed to publish event for star {star_id}: {str(e)}")
+        
+        return {
+            "id": star_id,
+            "last_liked": star["LastLiked"]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error liking star {star_id}: {str(e)}")
+        raise HTTPException(status_code=404, detail="Star not found")
+
+@router.post("/", dependencies=[Depends(deadline(settings.API.WRITE_DEADLINE)), Depends(rate_limit(create_limiter, "create"))])
+async def add_star(star: Star):
+    """Create a new star"""
+    try:
+        current_time = star_time()
+        star_id = str(uuid.uuid4())  # Generate ID on the backend
+        star_entity = {
+            "PartitionKey": f"STAR_{datetime.now(dt.timezone.utc).strftime('%Y%m')}",
+            "RowKey": star_id,  # Use the backend-generated ID
+            "X": star.x,
+            "Y": star.y,
+            "Message": star.message,
+            "LastLiked": current_time,
+            "creationDate": current_time,
+            "UserId": star.user_id,
+            "Username": star.username
+        }
+        await get_database().create_star(star_entity)
+        await bump_version([star_change("create", star_to_dict(star_entity))])
+
+        # Publish the create event
+        try:
+            await publish_star_event("create", {
+                "id": star_id,
+                "x": star.x,
+                "y": star.y,
+                "message": None,
+                "last_liked": current_time,
+                "creation_date": current_time,
+                "user_id": star.user_id,
+                "username": None
+            })
+        except Exception as e:
+            logger.warning(f"Failed to publish event for new star: {str(e)}")
+            
+        return json_response(star_to_dict(star_entity))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error creating star: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error creating star")
+
+@router.get("/batch/{star_ids}", dependencies=[Depends(deadline(settings.API.LIST_DEADLINE))])
+async def get_stars_batch(star_ids: str):
+    """Get multiple stars in a single request."""
+    ids = star_ids.split(",")
+    stars = []
+    
+    for star_id in ids:
+        try:
+            star = await _get_star_impl(star_id.strip())
+            stars.append(star)
+        except DeadlineExceeded:
+            raise
+        except HTTPException:
+            continue
+    
+    return json_response(stars)
+
+@router.delete("/{star_id}", dependencies=[Depends(deadline(settings.API.WRITE_DEADLINE))]) # TODO NEEDS TO BE FULLY IMPLEMENTED !!! 
+async def remove_star(star_id: str):  # Ensure star_id is str
+    """Remove a star by ID and push an SSE event."""
+    try:
+        star = await get_database().get_star(star_id)
+        if not star:
+            raise HTTPException(status_code=404, detail=f"Star with ID {star_id} not found")
+            
+        await get_database().delete_star(star)
+        await bump_version([star_change("delete", {"id": star_id})])
+
+        # Use the new publisher module
+        try:
+            await publish_star_event("delete", { # TODO ??!?!?!!??!
+                "id": star_id,
+                "x": star.get("X"),
+                "y": star.get("Y"),
+                "message": star.get("Message")
+            })
+        except Exception as e:
+            logger.warning(f"Failed to publish event for removed star: {str(e)}")
+
+        return {"id": star_id, "status": "deleted"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error removing star: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error removing star")
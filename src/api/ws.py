@@ -0,0 +1,136 @@
+"""
+WebSocket endpoint for star events.
+Fed by the same connection hub as the SSE stream, with a negotiable wire
+encoding, and accepts batched likes back over the same socket.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+
+from src.api.event_codec import WEBSOCKET_ENCODINGS, decode_like_batch, encode_json
+from src.api.sse_hub import HubConnection, hub
+from src.api.stars import like_star
+from src.config.settings import settings
+from src.utils.deadline import clear_deadline, restore_deadline, set_deadline
+from src.utils.rate_limit import check_rate_limit, vote_limiter
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Clients negotiate an encoding with the "starmap.<encoding>" subprotocol,
+# or with ?encoding=<encoding> when they cannot set subprotocols
+SUBPROTOCOL_PREFIX = "starmap."
+# A batch is charged in full, so it may not exceed what the vote bucket holds
+MAX_LIKE_BATCH = min(100, vote_limiter.capacity)
+
+def _negotiate_encoding(websocket: WebSocket) -> Tuple[str, Optional[str]]:
+    """Return the requested encoding and the subprotocol to accept, if any"""
+    for subprotocol in websocket.scope.get("subprotocols") or []:
+        if subprotocol.startswith(SUBPROTOCOL_PREFIX):
+            encoding = subprotocol[len(SUBPROTOCOL_PREFIX):]
+            if encoding in WEBSOCKET_ENCODINGS:
+                return encoding, subprotocol
+    return websocket.query_params.get("encoding", "json"), None
+
+async def _send_frames(websocket: WebSocket, conn: HubConnection):
+    """Forward frames from the hub; text and binary frames keep their type"""
+    try:
+        async for frame in conn.frames():
+            if isinstance(frame, bytes):
+                await websocket.send_bytes(frame)
+            else:
+                await websocket.send_text(frame)
+    except Exception as e:
+        logger.debug("WebSocket %s send failed: %s", conn.id, e)
+        return
+
+    # The hub closed the connection (too slow, or shutting down)
+    try:
+        await websocket.close(code=1013)
+    except Exception:
+        pass
+
+async def _like_within_deadline(star_id: str) -> None:
+    """Like one star with the budget POST /stars/{id}/like gets"""
+    # Batches on one socket share a task, so start each like without the last one's deadline
+    token = clear_deadline()
+    try:
+        set_deadline(settings.API.WRITE_DEADLINE)
+        await like_star(star_id)
+    finally:
+        restore_deadline(token)
+
+async def _handle_like_batch(websocket: WebSocket, conn: HubConnection, encoding: str, message) -> None:
+    """Apply a batch of likes and queue an acknowledgement for the client"""
+    try:
+        star_ids = decode_like_batch(encoding, message)
+        if len(star_ids) > MAX_LIKE_BATCH:
+            raise ValueError(f"At most {MAX_LIKE_BATCH} likes per batch")
+    except Exception as e:
+        conn.offer((time.monotonic(), encode_json({"type": "error", "detail": str(e)})))
+        return
+
+    # Likes over the socket draw from the same bucket as POST /stars/{id}/like
+    retry_after = await check_rate_limit(vote_limiter, "vote", websocket, cost=max(1, len(star_ids)))
+    if retry_after > 0:
+        conn.offer((time.monotonic(), encode_json({
+            "type": "error", "detail": "Too many requests", "retry_after": math.ceil(retry_after)
+        })))
+        return
+
+    liked, failed = [], []
+    for star_id in star_ids:
+        try:
+            await _like_within_deadline(star_id)
+            liked.append(star_id)
+        except HTTPException:
+            failed.append(star_id)
+        except Exception as e:
+            logger.warning("WebSocket %s like for star %s failed: %s", conn.id, star_id, e)
+            failed.append(star_id)
+
+    # Acks go through the connection queue so a single task writes to the socket
+    conn.offer((time.monotonic(), encode_json({"type": "ack", "liked": liked, "failed": failed})))
+
+@router.websocket("/ws")
+async def stream_stars_ws(websocket: WebSocket):
+    encoding, subprotocol = _negotiate_encoding(websocket)
+    if encoding not in WEBSOCKET_ENCODINGS:
+        await websocket.close(code=1003, reason=f"Unsupported encoding: {encoding}")
+        return
+
+    await websocket.accept(subprotocol=subprotocol)
+
+    # WebSocket pings are handled by the server, so no hub keep-alives
+    conn = hub.register(encoding=encoding, keepalive=False)
+    sender = asyncio.create_task(_send_frames(websocket, conn))
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            payload = message.get("text")
+            if payload is None:
+                payload = message.get("bytes")
+            try:
+                await _handle_like_batch(websocket, conn, encoding, payload)
+            except Exception:
+                # One bad batch must not end the stream
+                logger.exception("WebSocket %s like batch failed", conn.id)
+                conn.offer((time.monotonic(), encode_json({"type": "error", "detail": "Like batch failed"})))
+    except (WebSocketDisconnect, RuntimeError):
+        # RuntimeError: receive() after the sender already closed the socket
+        pass
+    finally:
+        hub.unregister(conn)
+        conn.close()
+        sender.cancel()
+        try:
+            await sender
+        except asyncio.CancelledError:
+            pass
@@ -1 +1 @@
-# Config package
+# Config package
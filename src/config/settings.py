@@ -1,185 +1,293 @@
-# Keep the existing settings classes with their validators
-# LoggingSettings, AzureStorageSettings, RedisSettings, APISettings, AppSettings
-
-import os
-import socket
-import logging
-from pydantic import BaseModel, Field, field_validator
-from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional, List
-
-##############################################################################
-# Settings Classes
-##############################################################################
-
-class LoggingSettings(BaseSettings):
-    LEVEL: str = Field("INFO", description="Logging level")
-    FORMAT: str = Field(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        description="Log format string"
-    )
-    
-    model_config = SettingsConfigDict(env_prefix="LOG_")
-
-class AzureStorageSettings(BaseSettings):
-    CONNECTION_STRING: Optional[str] = Field(
-        # Default to local Azurite connection string in development
-        "DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;QueueEndpoint=http://127.0.0.1:10001/devstoreaccount1;TableEndpoint=http://127.0.0.1:10002/devstoreaccount1;" 
-        if os.getenv('ENVIRONMENT', 'development') == 'development' else None,
-        description="Azure Storage connection string"
-    )
-    ACCOUNT_URL: Optional[str] = Field(
-        None, 
-        description="Azure Storage account URL for managed identity"
-    )
-    USE_MANAGED_IDENTITY: bool = Field(
-        False, 
-        description="Whether to use Azure Managed Identity"
-    )
-    
-    @field_validator("ACCOUNT_URL")
-    def validate_account_url(cls, v, info):
-        values = info.data
-        if values.get("USE_MANAGED_IDENTITY") and not v:
-            raise ValueError("AZURE_STORAGE_ACCOUNT_URL must be provided when USE_MANAGED_IDENTITY is enabled")
-        return v
-        
-    model_config = SettingsConfigDict(env_prefix="AZURE_STORAGE_")
-
-class RedisSettings(BaseSettings):
-    # Make HOST optional with a default empty value for development
-    HOST: Optional[str] = Field(
-        "localhost" if os.getenv('ENVIRONMENT', 'development') == 'development' else None, 
-        description="Redis host"
-    )
-    PORT: int = Field(6379, description="Redis port")
-    PASSWORD: Optional[str] = Field(None, description="Redis password")
-    SSL: bool = Field(False, description="Whether to use SSL for Redis connection")
-    CACHE_TTL: int = Field(300, description="Default cache TTL in seconds")
-    POPULAR_CACHE_TTL: int = Field(3600, description="Cache TTL for popular items")
-    POPULARITY_THRESHOLD: int = Field(50, description="Threshold for considering an item popular")
-    POPULARITY_WINDOW: int = Field(3600, description="Time window for popularity calculation in seconds")
-    
-    model_config = SettingsConfigDict(env_prefix="REDIS_")
-
-class APISettings(BaseSettings):
-    CORS_ORIGINS: List[str] = Field( # TODO CHANGE THIS!!!
-        [
-            "*"
-        ],
-        description="List of allowed CORS origins"
-    )
-    RATE_LIMIT_TIMES: int = Field(5, description="Number of requests allowed in the time window")
-    RATE_LIMIT_SECONDS: int = Field(60, description="Time window for rate limiting in seconds")
-    
-    @field_validator('CORS_ORIGINS')
-    def validate_cors_origins(cls, v, values):
-        env = os.getenv('ENVIRONMENT', 'development')
-        if env == 'production' and '*' in v:
-            raise ValueError("Wildcard CORS origin '*' is not allowed in production")
-        return v
-    
-    model_config = SettingsConfigDict(env_prefix="API_")
-
-class AppSettings(BaseSettings):
-    ENVIRONMENT: str = Field("development", description="Application environment")
-    PORT: int = Field(8080, description="Application port")
-    DEBUG: bool = Field(False, description="Debug mode")
-    PROJECT_NAME: str = Field("Star Map API", description="Project name")
-    VERSION: str = Field("1.1.0", description="API version")
-
-    # Sub-settings
-    AZURE: AzureStorageSettings = Field(default_factory=AzureStorageSettings)
-    REDIS: RedisSettings = Field(default_factory=RedisSettings)
-    LOGGING: LoggingSettings = Field(default_factory=LoggingSettings)
-    API: APISettings = Field(default_factory=APISettings)
-
-    # Host information for diagnostics
-    HOST_NAME: str = Field(default_factory=socket.gethostname)
-
-    @field_validator("ENVIRONMENT")
-    def validate_environment(cls, v):
-        allowed_environments = ["development", "staging", "production", "test"]
-        if v not in allowed_environments:
-            raise ValueError(f"Environment must be one of {allowed_environments}")
-        return v
-
-    def verify_required_settings(self):
-        """Verify that all required settings are present and valid at startup"""
-        critical_errors = []
-        warnings = []
-
-        # Check Azure Storage settings
-        if not self.AZURE.USE_MANAGED_IDENTITY and not self.AZURE.CONNECTION_STRING:
-            critical_errors.append(
-                "Either AZURE_STORAGE_CONNECTION_STRING must be provided or AZURE_STORAGE_USE_MANAGED_IDENTITY must be enabled"
-            )
-
-        # Check Redis settings - warn but don't fail if Redis is not configured
-        if not self.REDIS.HOST:
-            warnings.append("REDIS_HOST not configured. Caching and rate limiting will be disabled.")
-
-        # Check API settings
-        if self.ENVIRONMENT == "production" and "*" in self.API.CORS_ORIGINS:
-            warnings.append("CORS is configured to allow all origins (*) in production environment")
-
-        # Log warnings
-        for warning in warnings:
-            logger.warning(f"Configuration warning: {warning}")
-
-        # Exit on critical errors
-        if critical_errors:
-            for error in critical_errors:
-                logger.error(f"Configuration error: {error}")
-            logger.error("Application startup failed due to configuration errors")
-            import sys
-            sys.exit(1)
-
-
-# Initialize settings once - MOVED TO THE END OF THE FILE
-settings = AppSettings()
-
-# Configure logging based on settings
-logging.basicConfig(
-    level=getattr(logging, settings.LOGGING.LEVEL),
-    format=settings.LOGGING.FORMAT
-)
-logger = logging.getLogger(__name__)
-
-# Log important configuration details
-logger.info(f"Starting application in {settings.ENVIRONMENT} environment")
-logger.info(f"Host: {settings.HOST_NAME}, Port: {settings.PORT}")
-
-
-# !!! Commented this out and moved it into the class as it was giving import errors.
-# # Verify critical settings
-# def verify_required_settings():
-#     """Verify that all required settings are present and valid at startup"""
-#     critical_errors = []
-#     warnings = []
-    
-#     # Check Azure Storage settings
-#     if not settings.AZURE.USE_MANAGED_IDENTITY and not settings.AZURE.CONNECTION_STRING:
-#         critical_errors.append(
-#             "Either AZURE_STORAGE_CONNECTION_STRING must be provided or AZURE_STORAGE_USE_MANAGED_IDENTITY must be enabled"
-#         )
-        
-#     # Check Redis settings - warn but don't fail if Redis is not configured
-#     if not settings.REDIS.HOST:
-#         warnings.append("REDIS_HOST not configured. Caching and rate limiting will be disabled.")
-        
-#     # Check API settings
-#     if settings.ENVIRONMENT == "production" and "*" in settings.API.CORS_ORIGINS:
-#         warnings.append("CORS is configured to allow all origins (*) in production environment")
-            
-#     # Log warnings
-#     for warning in warnings:
-#         logger.warning(f"Configuration warning: {warning}")
-        
-#     # Exit on critical errors
-#     if critical_errors:
-#         for error in critical_errors:
-#             logger.error(f"Configuration error: {error}")
-#         logger.error("Application startup failed due to configuration errors")
-#         import sys
-#         sys.exit(1)
+# Keep the existing settings classes with their validators
+# LoggingSettings, AzureStorageSettings, RedisSettings, APISettings, SSESettings, BrightnessSettings, GCSettings, AppSettings
+
+import os
+import socket
+import logging
+from pydantic import BaseModel, Field, field_validator
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import Optional, List
+
+##############################################################################
+# Settings Classes
+##############################################################################
+
+class LoggingSettings(BaseSettings):
+    LEVEL: str = Field("INFO", description="Logging level")
+    FORMAT: str = Field(
+        "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        description="Log format string"
+    )
+    JSON: bool = Field(False, description="Write one JSON object per log record instead of FORMAT")
+    SAMPLE_PER_SECOND: int = Field(20, ge=0, description="INFO and DEBUG records let through per message per second; 0 disables sampling")
+    QUEUE_SIZE: int = Field(10000, ge=1, description="Log records waiting for the writer thread before new ones are dropped")
+    
+    model_config = SettingsConfigDict(env_prefix="LOG_")
+
+class AzureStorageSettings(BaseSettings):
+    CONNECTION_STRING: Optional[str] = Field(
+        # Default to local Azurite connection string in development
+        "DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;QueueEndpoint=http://127.0.0.1:10001/devstoreaccount1;TableEndpoint=http://127.0.0.1:10002/devstoreaccount1;" 
+        if os.getenv('ENVIRONMENT', 'development') == 'development' else None,
+        description="Azure Storage connection string"
+    )
+    ACCOUNT_URL: Optional[str] = Field(
+        None, 
+        description="Azure Storage account URL for managed identity"
+    )
+    USE_MANAGED_IDENTITY: bool = Field(
+        False, 
+        description="Whether to use Azure Managed Identity"
+    )
+    RETRY_TOTAL: int = Field(3, ge=0, description="Retries per storage call, within the request deadline")
+    RETRY_BACKOFF_FACTOR: float = Field(0.5, description="Base of the exponential backoff between storage retries in seconds")
+    RETRY_BACKOFF_MAX: float = Field(8.0, description="Longest wait between storage retries in seconds")
+    STARTUP_TIMEOUT: float = Field(60.0, description="Seconds startup waits for table initialization")
+    HEDGE_ENABLED: bool = Field(False, description="Hedge star point reads that are slower than usual")
+    HEDGE_PERCENTILE: float = Field(95.0, gt=0, lt=100, description="Latency percentile after which a second read is sent")
+    HEDGE_MAX_EXTRA_LOAD: float = Field(0.05, ge=0, le=1, description="Upper bound on hedged reads as a fraction of all point reads")
+    
+    @field_validator("ACCOUNT_URL")
+    def validate_account_url(cls, v, info):
+        values = info.data
+        if values.get("USE_MANAGED_IDENTITY") and not v:
+            raise ValueError("AZURE_STORAGE_ACCOUNT_URL must be provided when USE_MANAGED_IDENTITY is enabled")
+        return v
+        
+    model_config = SettingsConfigDict(env_prefix="AZURE_STORAGE_")
+
+class RedisSettings(BaseSettings):
+    # Make HOST optional with a default empty value for development
+    HOST: Optional[str] = Field(
+        "localhost" if os.getenv('ENVIRONMENT', 'development') == 'development' else None, 
+        description="Redis host"
+    )
+    PORT: int = Field(6379, description="Redis port")
+    PASSWORD: Optional[str] = Field(None, description="Redis password")
+    SSL: bool = Field(False, description="Whether to use SSL for Redis connection")
+    CACHE_TTL: int = Field(300, description="Default cache TTL in seconds")
+    POPULAR_CACHE_TTL: int = Field(3600, description="Cache TTL for popular items")
+    POPULARITY_THRESHOLD: int = Field(50, description="Threshold for considering an item popular")
+    POPULARITY_WINDOW: int = Field(3600, description="Time window for popularity calculation in seconds")
+    POOL_CACHE_SIZE: int = Field(10, ge=1, description="Connections for cache reads and writes")
+    POOL_LIMITER_SIZE: int = Field(4, ge=1, description="Connections for rate limiting")
+    POOL_COUNTERS_SIZE: int = Field(6, ge=1, description="Connections for popularity counters, versions and locks")
+    POOL_PUBSUB_SIZE: int = Field(2, ge=1, description="Connections reserved for pub/sub")
+    POOL_TIMEOUT: float = Field(0.5, description="Seconds to wait for a free pooled connection before failing")
+    COMMAND_TIMEOUT: float = Field(1.0, description="Seconds before a Redis command is abandoned and counted as failed")
+    BREAKER_FAILURE_THRESHOLD: int = Field(5, ge=1, description="Consecutive failed or slow Redis calls that open the circuit breaker")
+    BREAKER_SLOW_CALL_SECONDS: float = Field(0.25, description="Redis calls slower than this count as failures")
+    BREAKER_RESET_SECONDS: float = Field(10.0, description="Seconds the breaker stays open before probing Redis again")
+    
+    model_config = SettingsConfigDict(env_prefix="REDIS_")
+
+class APISettings(BaseSettings):
+    CORS_ORIGINS: List[str] = Field( # TODO CHANGE THIS!!!
+        [
+            "*"
+        ],
+        description="List of allowed CORS origins"
+    )
+    RATE_LIMIT_TIMES: int = Field(5, description="Stars a client may create in the time window")
+    RATE_LIMIT_SECONDS: int = Field(60, description="Time window for rate limiting in seconds")
+    READ_DEADLINE: float = Field(5.0, description="Seconds a single star lookup may take before failing with 504")
+    WRITE_DEADLINE: float = Field(10.0, description="Seconds a create, like, dislike or delete may take before failing with 504")
+    LIST_DEADLINE: float = Field(30.0, description="Seconds a star list request may take before failing with 504")
+    SERVER_TIMING: bool = Field(True, description="Report storage, Redis and serialization time in a Server-Timing header")
+    TRACE_SAMPLE_RATE: float = Field(0.0, ge=0.0, le=1.0, description="Fraction of requests whose spans are logged")
+    RATE_LIMIT_VOTE_TIMES: int = Field(30, description="Likes and dislikes allowed per client in the time window")
+    CHANGES_RETENTION: int = Field(10000, ge=1, description="Star changes kept for GET /stars/changes before clients must resync")
+    
+    @field_validator('CORS_ORIGINS')
+    def validate_cors_origins(cls, v, values):
+        env = os.getenv('ENVIRONMENT', 'development')
+        if env == 'production' and '*' in v:
+            raise ValueError("Wildcard CORS origin '*' is not allowed in production")
+        return v
+    
+    model_config = SettingsConfigDict(env_prefix="API_")
+
+class SSESettings(BaseSettings):
+    HEARTBEAT_INTERVAL: float = Field(15.0, description="Seconds of idleness before a keep-alive is sent to a client")
+    QUEUE_SIZE: int = Field(256, description="Maximum queued events per connection before it is dropped as too slow")
+
+    model_config = SettingsConfigDict(env_prefix="SSE_")
+
+class BrightnessSettings(BaseSettings):
+    MODEL: str = Field("exponential", description="Decay model: exponential, linear or legacy")
+    MAX: float = Field(100.0, description="Brightness of a star that was just liked")
+    MIN: float = Field(20.0, description="Brightness floor for stars that have fully decayed")
+    HALF_LIFE: float = Field(3600.0, gt=0, description="Seconds for a star to lose half of its brightness above the floor")
+    BUCKET_SECONDS: int = Field(5, gt=0, description="Brightness responses are computed once per bucket of this many seconds")
+
+    @field_validator("MODEL")
+    def validate_model(cls, v):
+        allowed_models = ["exponential", "linear", "legacy"]
+        if v not in allowed_models:
+            raise ValueError(f"Brightness model must be one of {allowed_models}")
+        return v
+
+    model_config = SettingsConfigDict(env_prefix="BRIGHTNESS_")
+
+class LoopMonitorSettings(BaseSettings):
+    ENABLED: bool = Field(True, description="Whether the event-loop lag monitor and blocking-call watchdog run")
+    INTERVAL: float = Field(0.1, gt=0, description="Seconds between loop heartbeats")
+    BLOCK_THRESHOLD: float = Field(0.1, gt=0, description="Lag in seconds after which the blocking call's stack is captured")
+
+    model_config = SettingsConfigDict(env_prefix="LOOP_MONITOR_")
+
+class GCSettings(BaseSettings):
+    ENABLED: bool = Field(True, description="Whether the star garbage collector runs")
+    INTERVAL: int = Field(300, description="Seconds between garbage collection passes")
+    MAX_AGE: int = Field(86400, description="Stars not liked for this many seconds are deleted")
+    BATCH_SIZE: int = Field(100, description="Deletes per table transaction (Azure allows at most 100)")
+    MAX_DELETES_PER_SECOND: float = Field(50.0, description="Upper bound on delete throughput so GC never competes with user traffic")
+
+    @field_validator("BATCH_SIZE")
+    def validate_batch_size(cls, v):
+        if not 1 <= v <= 100:
+            raise ValueError("GC_BATCH_SIZE must be between 1 and 100")
+        return v
+
+    model_config = SettingsConfigDict(env_prefix="GC_")
+
+class SqliteSettings(BaseSettings):
+    PATH: str = Field("data/stars.sqlite3", description="SQLite database file used when STORAGE_BACKEND is sqlite")
+    SYNCHRONOUS: str = Field("NORMAL", description="PRAGMA synchronous: NORMAL loses at most the last commits on power loss, FULL none")
+    BUSY_TIMEOUT: float = Field(5.0, gt=0, description="Seconds a write waits for the database lock")
+    CACHE_SIZE_MB: int = Field(32, ge=1, description="Page cache per connection in MiB")
+
+    @field_validator("SYNCHRONOUS")
+    def validate_synchronous(cls, v):
+        allowed_modes = ["OFF", "NORMAL", "FULL", "EXTRA"]
+        if v.upper() not in allowed_modes:
+            raise ValueError(f"SQLite synchronous mode must be one of {allowed_modes}")
+        return v.upper()
+
+    model_config = SettingsConfigDict(env_prefix="SQLITE_")
+
+class MemoryStoreSettings(BaseSettings):
+    DIRECTORY: str = Field("data", description="Snapshot and journal directory used when STORAGE_BACKEND is memory")
+    FSYNC: bool = Field(True, description="Acknowledge writes only once the journal is fsynced")
+    SNAPSHOT_INTERVAL: float = Field(300.0, gt=0, description="Seconds between snapshots while stars change")
+    SNAPSHOT_AFTER_RECORDS: int = Field(100000, ge=1, description="Journal records that trigger an early snapshot")
+    COLUMNAR: bool = Field(False, description="Answer active star, viewport and GC scans from NumPy column arrays")
+
+    model_config = SettingsConfigDict(env_prefix="MEMORY_")
+
+class AppSettings(BaseSettings):
+    ENVIRONMENT: str = Field("development", description="Application environment")
+    PORT: int = Field(8080, description="Application port")
+    DEBUG: bool = Field(False, description="Debug mode")
+    PROJECT_NAME: str = Field("Star Map API", description="Project name")
+    VERSION: str = Field("1.1.0", description="API version")
+    STORAGE_BACKEND: str = Field("azure", description="Where stars are stored: azure, sqlite or memory")
+
+    # Sub-settings
+    AZURE: AzureStorageSettings = Field(default_factory=AzureStorageSettings)
+    REDIS: RedisSettings = Field(default_factory=RedisSettings)
+    LOGGING: LoggingSettings = Field(default_factory=LoggingSettings)
+    API: APISettings = Field(default_factory=APISettings)
+    SSE: SSESettings = Field(default_factory=SSESettings)
+    BRIGHTNESS: BrightnessSettings = Field(default_factory=BrightnessSettings)
+    GC: GCSettings = Field(default_factory=GCSettings)
+    LOOP_MONITOR: LoopMonitorSettings = Field(default_factory=LoopMonitorSettings)
+    SQLITE: SqliteSettings = Field(default_factory=SqliteSettings)
+    MEMORY: MemoryStoreSettings = Field(default_factory=MemoryStoreSettings)
+
+    # Host information for diagnostics
+    HOST_NAME: str = Field(default_factory=socket.gethostname)
+
+    @field_validator("ENVIRONMENT")
+    def validate_environment(cls, v):
+        allowed_environments = ["development", "staging", "production", "test"]
+        if v not in allowed_environments:
+            raise ValueError(f"Environment must be one of {allowed_environments}")
+        return v
+
+    @field_validator("STORAGE_BACKEND")
+    def validate_storage_backend(cls, v):
+        allowed_backends = ["azure", "sqlite", "memory"]
+        if v not in allowed_backends:
+            raise ValueError(f"Storage backend must be one of {allowed_backends}")
+        return v
+
+    def verify_required_settings(self):
+        """Verify that all required settings are present and valid at startup"""
+        critical_errors = []
+        warnings = []
+
+        # Check Azure Storage settings
+        if self.STORAGE_BACKEND == "azure" and not self.AZURE.USE_MANAGED_IDENTITY and not self.AZURE.CONNECTION_STRING:
+            critical_errors.append(
+                "Either AZURE_STORAGE_CONNECTION_STRING must be provided or AZURE_STORAGE_USE_MANAGED_IDENTITY must be enabled"
+            )
+
+        # Check Redis settings - warn but don't fail if Redis is not configured
+        if not self.REDIS.HOST:
+            warnings.append("REDIS_HOST not configured. Caching and rate limiting will be disabled.")
+
+        # Check API settings
+        if self.ENVIRONMENT == "production" and "*" in self.API.CORS_ORIGINS:
+            warnings.append("CORS is configured to allow all origins (*) in production environment")
+
+        # Log warnings
+        for warning in warnings:
+            logger.warning(f"Configuration warning: {warning}")
+
+        # Exit on critical errors
+        if critical_errors:
+            for error in critical_errors:
+                logger.error(f"Configuration error: {error}")
+            logger.error("Application startup failed due to configuration errors")
+            import sys
+            sys.exit(1)
+
+
+# Initialize settings once - MOVED TO THE END OF THE FILE
+settings = AppSettings()
+
+# Configure logging based on settings
+logging.basicConfig(
+    level=getattr(logging, settings.LOGGING.LEVEL),
+    format=settings.LOGGING.FORMAT
+)
+logger = logging.getLogger(__name__)
+
+# Log important configuration details
+logger.info(f"Starting application in {settings.ENVIRONMENT} environment")
+logger.info(f"Host: {settings.HOST_NAME}, Port: {settings.PORT}")
+
+
+# !!! Commented this out and moved it into the class as it was giving import errors.
+# # Verify critical settings
+# def verify_required_settings():
+#     """Verify that all required settings are present and valid at startup"""
+#     critical_errors = []
+#     warnings = []
+    
+#     # Check Azure Storage settings
+#     if not settings.AZURE.USE_MANAGED_IDENTITY and not settings.AZURE.CONNECTION_STRING:
+#         critical_errors.append(
+#             "Either AZURE_STORAGE_CONNECTION_STRING must be provided or AZURE_STORAGE_USE_MANAGED_IDENTITY must be enabled"
+#         )
+        
+#     # Check Redis settings - warn but don't fail if Redis is not configured
+#     if not settings.REDIS.HOST:
+#         warnings.append("REDIS_HOST not configured. Caching and rate limiting will be disabled.")
+        
+#     # Check API settings
+#     if settings.ENVIRONMENT == "production" and "*" in settings.API.CORS_ORIGINS:
+#         warnings.append("CORS is configured to allow all origins (*) in production environment")
+            
+#     # Log warnings
+#     for warning in warnings:
+#         logger.warning(f"Configuration warning: {warning}")
+        
+#     # Exit on critical errors
+#     if critical_errors:
+#         for error in critical_errors:
+#             logger.error(f"Configuration error: {error}")
+#         logger.error("Application startup failed due to configuration errors")
+#         import sys
+#         sys.exit(1)
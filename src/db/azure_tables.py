@@ -1,131 +1,454 @@
-import time
-import logging
-from azure.data.tables import TableServiceClient
-from azure.core.pipeline.policies import RetryPolicy, RetryMode
-from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError, AzureError, ServiceRequestError, HttpResponseError
-
-from src.config.settings import settings
-
-logger = logging.getLogger(__name__)
-
-# Global table clients
-tables = {}
-
-# Configure retry policy for resilience
-retry_policy = RetryPolicy(
-    retry_mode=RetryMode.Exponential,
-    backoff_factor=2,
-    backoff_max=60,
-    total_retries=5
-)
-
-def init_tables():
-    """Initialize Azure Table Storage connections and tables"""
-    global tables
-    
-    # Skip if environment is test - handled elsewhere
-    if settings.ENVIRONMENT == "test":
-        logger.info("Running in TEST mode - initializing mock tables")
-        
-        # Create dummy table objects (won't actually connect to Azure)
-        class MockTableClient:
-            def __init__(self, table_name):
-                self.name = table_name
-                self._data = {}
-            
-            def create_entity(self, entity):
-                self._data[entity.get("RowKey")] = entity
-                return entity
-                
-            def get_entity(self, partition_key, row_key):
-                if row_key not in self._data:
-                    raise ResourceNotFoundError(f"Entity with row key {row_key} not found")
-                return self._data.get(row_key, {})
-                
-            def list_entities(self, **kwargs):
-                return list(self._data.values())
-            
-            def delete_entity(self, partition_key, row_key):
-                if row_key in self._data:
-                    del self._data[row_key]
-                    
-            def update_entity(self, entity, **kwargs):
-                self._data[entity.get("RowKey")] = entity
-        
-        # Set up mock tables
-        for table_name in ["Users", "Stars", "UserStars"]:
-            tables[table_name] = MockTableClient(table_name)
-            logger.info(f"Created mock table: {table_name}")
-        
-        return tables
-    
-    # Use managed identity if available, otherwise connection string
-    connection_string = settings.AZURE.CONNECTION_STRING
-    managed_identity_enabled = settings.AZURE.USE_MANAGED_IDENTITY
-    
-    logger.info(f"Initializing Azure Table Storage in {settings.ENVIRONMENT} environment")
-    logger.info(f"Authentication method: {'Managed Identity' if managed_identity_enabled else 'Connection String'}")
-
-    try:
-        # Create the table service client
-        if managed_identity_enabled:
-            try:
-                from azure.identity import DefaultAzureCredential, ManagedIdentityCredential
-                
-                # Try DefaultAzureCredential first which works in more scenarios
-                try:
-                    credential = DefaultAzureCredential()
-                    account_url = settings.AZURE.ACCOUNT_URL
-                    table_service_client = TableServiceClient(
-                        endpoint=account_url,
-                        credential=credential,
-                        retry_policy=retry_policy
-                    )
-                    logger.info("Using DefaultAzureCredential for Azure Table Storage authentication")
-                except Exception as e:
-                    logger.warning(f"DefaultAzureCredential failed: {str(e)}, trying ManagedIdentityCredential")
-                    credential = ManagedIdentityCredential()
-                    account_url = settings.AZURE.ACCOUNT_URL
-                    table_service_client = TableServiceClient(
-                        endpoint=account_url,
-                        credential=credential,
-                        retry_policy=retry_policy
-                    )
-                    logger.info("Using ManagedIdentityCredential for Azure Table Storage authentication")
-            except ImportError as e:
-                logger.error(f"azure.identity not installed but managed identity is enabled: {str(e)}")
-                raise
-        else:
-            table_service_client = TableServiceClient.from_connection_string(
-                connection_string,
-                retry_policy=retry_policy
-            )
-            logger.info("Using connection string for Azure Table Storage authentication")
-
-        # Initialize tables with retry logic
-        for table_name in ["Users", "Stars", "UserStars"]:
-            max_attempts = 5
-            for attempt in range(max_attempts):
-                try:
-                    table_service_client.create_table_if_not_exists(table_name)
-                    tables[table_name] = table_service_client.get_table_client(table_name)
-                    logger.info(f"Successfully initialized table: {table_name}")
-                    break
-                except (AzureError, ServiceRequestError, HttpResponseError) as e:
-                    if attempt == max_attempts - 1:
-                        logger.error(f"Failed to initialize table {table_name} after {max_attempts} attempts: {str(e)}")
-                        raise
-                    logger.warning(f"Failed to initialize table {table_name}, attempt {attempt+1}/{max_attempts}: {str(e)}")
-                    time.sleep(2 ** attempt)  # Exponential backoff
-    except Exception as e:
-        logger.error(f"Failed to initialize Azure Table Storage: {str(e)}")
-        if settings.ENVIRONMENT == "production":
-            # In production, this is a critical failure
-            raise
-        else:
-            # In development or staging, we can log and continue with empty tables
-            logger.warning("Continuing with mock tables for development/staging")
-            for table_name in ["Users", "Stars", "UserStars"]:
-                tables[table_name] = None
-                
-    return tables
+import asyncio
+import time
+import logging
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional
+from azure.data.tables import TableServiceClient
+from azure.core import MatchConditions
+from azure.core.pipeline.policies import RetryMode
+from azure.core.exceptions import (
+    ResourceExistsError, ResourceModifiedError, ResourceNotFoundError, AzureError, ServiceRequestError, HttpResponseError,
+    ServiceRequestTimeoutError, ServiceResponseTimeoutError
+)
+
+from src.config.settings import settings
+from src.db.hedging import HedgePolicy
+from src.db.table_standin import LocalTableClient
+from src.utils.deadline import DeadlineExceeded, ServiceUnavailable, remaining, within_deadline
+from src.utils.metrics import storage_duration, storage_errors, storage_entities
+from src.utils.tracing import record_span
+
+logger = logging.getLogger(__name__)
+
+# Global table clients
+tables = {}
+
+# Star point reads, hedged when AZURE_STORAGE_HEDGE_ENABLED is set
+point_reads = HedgePolicy(
+    enabled=settings.AZURE.HEDGE_ENABLED,
+    percentile=settings.AZURE.HEDGE_PERCENTILE,
+    max_extra_load=settings.AZURE.HEDGE_MAX_EXTRA_LOAD
+)
+
+# Stars are partitioned by creation month, which an id alone does not
+# reveal. Partitions seen by this replica let repeat lookups be point reads.
+MAX_KNOWN_PARTITIONS = 100000
+_star_partitions: "OrderedDict[str, str]" = OrderedDict()
+
+# Retry configuration for the table clients. The tables SDK builds its own
+# retry policy from these keyword arguments and ignores a retry_policy
+# object. Per-call options from storage_call_options() shorten the retries
+# further to fit the request deadline.
+retry_options = {
+    "retry_mode": RetryMode.Exponential,
+    "retry_backoff_factor": settings.AZURE.RETRY_BACKOFF_FACTOR,
+    "retry_backoff_max": settings.AZURE.RETRY_BACKOFF_MAX,
+    "retry_total": settings.AZURE.RETRY_TOTAL,
+}
+
+# Below this many seconds left, a storage call gets a single attempt
+MIN_RETRY_BUDGET = 1.0
+
+# Status codes Azure uses when throttling or temporarily unavailable
+THROTTLED_STATUS_CODES = {429, 503}
+
+def _retries_within(budget: float) -> int:
+    """Retries whose backoff fits in half of `budget`, leaving the rest for the attempts"""
+    azure = settings.AZURE
+    retries, waited = 0, 0.0
+    while retries < azure.RETRY_TOTAL:
+        # The SDK retries the first failure at once, then backs off exponentially
+        backoff = 0.0 if retries == 0 else min(azure.RETRY_BACKOFF_MAX, azure.RETRY_BACKOFF_FACTOR * 2 ** retries)
+        if waited + backoff > budget / 2:
+            break
+        waited += backoff
+        retries += 1
+    return retries
+
+def storage_call_options() -> Dict[str, Any]:
+    """
+    SDK keyword arguments that keep a call and its retries within the request deadline.
+
+    The SDK sends `timeout` to the service as a whole number of seconds for
+    it to spend on the request; it does not bound the client. The client is
+    bounded by fewer retries and by per-attempt connection and read
+    timeouts that share what is left of the budget.
+    """
+    # The SDK's retry policy reads the backoff cap per call, not from its constructor
+    options: Dict[str, Any] = {"retry_backoff_max": settings.AZURE.RETRY_BACKOFF_MAX}
+    left = remaining()
+    if left is not None:
+        if left <= 0:
+            raise DeadlineExceeded()
+        retries = _retries_within(left) if left >= MIN_RETRY_BUDGET else 0
+        attempt = left / (retries + 1)
+        options["retry_total"] = retries
+        options["retry_backoff_max"] = min(settings.AZURE.RETRY_BACKOFF_MAX, left / 2)
+        options["connection_timeout"] = attempt
+        options["read_timeout"] = attempt
+        if left >= 1:
+            # The service rounds down, and ?timeout=0 would be rejected
+            options["timeout"] = int(left)
+    return options
+
+async def _storage_call(awaitable) -> Any:
+    """
+    Await a storage call within the request deadline.
+
+    Raises DeadlineExceeded (504) when the budget runs out and
+    ServiceUnavailable (503) when Azure is still throttling after retries.
+    """
+    try:
+        return await within_deadline(awaitable)
+    except (ServiceRequestTimeoutError, ServiceResponseTimeoutError):
+        raise DeadlineExceeded() from None
+    except HttpResponseError as e:
+        if e.status_code in THROTTLED_STATUS_CODES:
+            raise ServiceUnavailable("Storage is throttling requests") from e
+        raise
+
+async def run_storage(fn: Callable, *args, **kwargs) -> Any:
+    """Run a blocking table call in a worker thread within the request deadline"""
+    options = storage_call_options()
+    options.update(kwargs)
+    return await _storage_call(asyncio.to_thread(fn, *args, **options))
+
+class InstrumentedPages:
+    """
+    Paged list or query result that records each page fetch.
+
+    Every page is one request to Azure, so a page fetch is timed as one call
+    and its entities are added to the entities-read counter.
+    """
+
+    def __init__(self, paged, table_name: str, operation: str):
+        self._paged = paged
+        self._labels = (table_name, operation)
+
+    def by_page(self, *args, **kwargs):
+        if hasattr(self._paged, "by_page"):
+            pages = self._paged.by_page(*args, **kwargs)
+        else:
+            # A plain list, as returned by test doubles
+            pages = iter([self._paged])
+        while True:
+            start = time.perf_counter()
+            try:
+                page = list(next(pages))
+            except StopIteration:
+                # No continuation token left, so no request was made
+                return
+            except Exception:
+                storage_errors.inc(*self._labels)
+                self._record(start)
+                raise
+            self._record(start)
+            storage_entities.inc(*self._labels, amount=len(page))
+            yield page
+
+    def _record(self, start: float) -> None:
+        elapsed = time.perf_counter() - start
+        storage_duration.observe(elapsed, *self._labels)
+        record_span("table", start, elapsed)
+
+    def __iter__(self):
+        for page in self.by_page():
+            yield from page
+
+    def __getattr__(self, name):
+        return getattr(self._paged, name)
+
+class InstrumentedTableClient:
+    """Table client proxy recording call counts, latency and entities read per operation"""
+
+    TIMED_OPERATIONS = frozenset({
+        "get_entity", "create_entity", "update_entity", "upsert_entity", "delete_entity", "submit_transaction"
+    })
+    PAGED_OPERATIONS = frozenset({"list_entities", "query_entities"})
+
+    def __init__(self, client, table_name: str):
+        self._client = client
+        self._table_name = table_name
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name in self.TIMED_OPERATIONS:
+            wrapped = self._timed(name, attr)
+        elif name in self.PAGED_OPERATIONS:
+            wrapped = self._paged(name, attr)
+        else:
+            return attr
+        # Cache the wrapper so later lookups skip __getattr__
+        setattr(self, name, wrapped)
+        return wrapped
+
+    def _timed(self, operation: str, fn: Callable) -> Callable:
+        labels = (self._table_name, operation)
+
+        def call(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except ResourceNotFoundError:
+                # A miss is an answer, not a storage failure
+                raise
+            except Exception:
+                storage_errors.inc(*labels)
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                storage_duration.observe(elapsed, *labels)
+                record_span("table", start, elapsed)
+        return call
+
+    def _paged(self, operation: str, fn: Callable) -> Callable:
+        def call(*args, **kwargs):
+            return InstrumentedPages(fn(*args, **kwargs), self._table_name, operation)
+        return call
+
+def init_tables():
+    """Initialize Azure Table Storage connections and tables"""
+    global tables
+    
+    # Skip if environment is test - handled elsewhere
+    if settings.ENVIRONMENT == "test":
+        logger.info("Running in TEST mode - initializing local tables")
+        
+        # Set up in-process tables (won't actually connect to Azure)
+        for table_name in ["Users", "Stars", "UserStars"]:
+            tables[table_name] = InstrumentedTableClient(LocalTableClient(table_name), table_name)
+            logger.info(f"Created local table: {table_name}")
+        
+        return tables
+    
+    # Use managed identity if available, otherwise connection string
+    connection_string = settings.AZURE.CONNECTION_STRING
+    managed_identity_enabled = settings.AZURE.USE_MANAGED_IDENTITY
+    
+    logger.info(f"Initializing Azure Table Storage in {settings.ENVIRONMENT} environment")
+    logger.info(f"Authentication method: {'Managed Identity' if managed_identity_enabled else 'Connection String'}")
+
+    try:
+        # Create the table service client
+        if managed_identity_enabled:
+            try:
+                from azure.identity import DefaultAzureCredential, ManagedIdentityCredential
+                
+                # Try DefaultAzureCredential first which works in more scenarios
+                try:
+                    credential = DefaultAzureCredential()
+                    account_url = settings.AZURE.ACCOUNT_URL
+                    table_service_client = TableServiceClient(
+                        endpoint=account_url,
+                        credential=credential,
+                        **retry_options
+                    )
+                    logger.info("Using DefaultAzureCredential for Azure Table Storage authentication")
+                except Exception as e:
+                    logger.warning(f"DefaultAzureCredential failed: {str(e)}, trying ManagedIdentityCredential")
+                    credential = ManagedIdentityCredential()
+                    account_url = settings.AZURE.ACCOUNT_URL
+                    table_service_client = TableServiceClient(
+                        endpoint=account_url,
+                        credential=credential,
+                        **retry_options
+                    )
+                    logger.info("Using ManagedIdentityCredential for Azure Table Storage authentication")
+            except ImportError as e:
+                logger.error(f"azure.identity not installed but managed identity is enabled: {str(e)}")
+                raise
+        else:
+            table_service_client = TableServiceClient.from_connection_string(
+                connection_string,
+                **retry_options
+            )
+            logger.info("Using connection string for Azure Table Storage authentication")
+
+        # Initialize tables with retry logic
+        for table_name in ["Users", "Stars", "UserStars"]:
+            max_attempts = 5
+            for attempt in range(max_attempts):
+                try:
+                    table_service_client.create_table_if_not_exists(table_name)
+                    tables[table_name] = InstrumentedTableClient(
+                        table_service_client.get_table_client(table_name), table_name
+                    )
+                    logger.info(f"Successfully initialized table: {table_name}")
+                    break
+                except (AzureError, ServiceRequestError, HttpResponseError) as e:
+                    if attempt == max_attempts - 1:
+                        logger.error(f"Failed to initialize table {table_name} after {max_attempts} attempts: {str(e)}")
+                        raise
+                    logger.warning(f"Failed to initialize table {table_name}, attempt {attempt+1}/{max_attempts}: {str(e)}")
+                    time.sleep(2 ** attempt)  # Exponential backoff
+    except Exception as e:
+        logger.error(f"Failed to initialize Azure Table Storage: {str(e)}")
+        if settings.ENVIRONMENT == "production":
+            # In production, this is a critical failure
+            raise
+        else:
+            # In development or staging, we can log and continue with empty tables
+            logger.warning("Continuing with mock tables for development/staging")
+            for table_name in ["Users", "Stars", "UserStars"]:
+                tables[table_name] = None
+                
+    return tables
+
+def remember_star_partition(star_id: str, partition_key: str) -> None:
+    """Record where a star lives so the next lookup can be a point read"""
+    _star_partitions[star_id] = partition_key
+    _star_partitions.move_to_end(star_id)
+    if len(_star_partitions) > MAX_KNOWN_PARTITIONS:
+        _star_partitions.popitem(last=False)
+
+def forget_star_partition(star_id: str) -> None:
+    _star_partitions.pop(star_id, None)
+
+async def get_star_entity(table, star_id: str) -> Optional[Any]:
+    """
+    Look up a star by id without scanning the table client side.
+
+    Uses a (possibly hedged) point read when the partition is known, and
+    otherwise a server-side RowKey filter that records the partition.
+    Returns None when the star does not exist.
+    """
+    partition_key = _star_partitions.get(star_id)
+    if partition_key is not None:
+        try:
+            return await _storage_call(
+                point_reads.call(table.get_entity, partition_key, star_id, **storage_call_options())
+            )
+        except ResourceNotFoundError:
+            forget_star_partition(star_id)
+            return None
+
+    entities = await run_storage(
+        lambda **options: list(table.query_entities("RowKey eq @id", parameters={"id": star_id}, **options))
+    )
+    if not entities:
+        return None
+    entity = entities[0]
+    remember_star_partition(star_id, entity["PartitionKey"])
+    return entity
+
+def _delete_partition_batch(table, batch: List[Dict]) -> List[str]:
+    """
+    Delete one partition's batch of expired stars in a transaction; returns the deleted ids.
+
+    Each delete is conditional on the ETag read with the expired row, so a
+    star liked since then is kept. If any row changed or went away the
+    transaction fails as a whole, and the rows are deleted one by one.
+    """
+    def condition(entity: Any) -> Dict[str, Any]:
+        return {"etag": entity.metadata["etag"], "match_condition": MatchConditions.IfNotModified}
+
+    try:
+        table.submit_transaction([("delete", entity, condition(entity)) for entity in batch])
+        return [entity["RowKey"] for entity in batch]
+    except AzureError as e:
+        logger.info("GC transaction failed, deleting %d stars individually: %s", len(batch), e)
+    deleted = []
+    for entity in batch:
+        try:
+            table.delete_entity(entity["PartitionKey"], entity["RowKey"], **condition(entity))
+        except ResourceModifiedError:
+            # Liked since the page was read
+            continue
+        except ResourceNotFoundError:
+            # Deleted by its owner in the meantime
+            continue
+        deleted.append(entity["RowKey"])
+    return deleted
+
+class TableStorageProvider:
+    """
+    DatabaseProvider over the Stars table.
+
+    Uses the client given, or else the one init_tables set up, looked up on
+    every call so tests can swap it.
+    """
+
+    def __init__(self, table=None):
+        self._table = table
+
+    @property
+    def table(self):
+        return self._table if self._table is not None else tables.get("Stars")
+
+    async def get_star(self, star_id: str) -> Optional[Any]:
+        return await get_star_entity(self.table, star_id)
+
+    async def list_stars(self) -> List[Any]:
+        table = self.table
+        return await run_storage(lambda **options: list(table.list_entities(**options)))
+
+    async def active_stars(self, cutoff: float) -> List[Any]:
+        # Tables have no secondary indexes, so a LastLiked filter would scan
+        # every partition on the service side all the same
+        return [star for star in await self.list_stars() if "LastLiked" in star and star["LastLiked"] >= cutoff]
+
+    async def stars_by_user(self, user_id: str) -> List[Any]:
+        table = self.table
+        return await run_storage(
+            lambda **options: list(table.query_entities("UserId eq @user", parameters={"user": user_id}, **options))
+        )
+
+    async def stars_in_viewport(self, x_min: float, y_min: float, x_max: float, y_max: float) -> List[Any]:
+        return [
+            star for star in await self.list_stars()
+            if x_min <= star["X"] <= x_max and y_min <= star["Y"] <= y_max
+        ]
+
+    async def create_star(self, entity: Mapping[str, Any]) -> None:
+        await run_storage(self.table.create_entity, entity)
+        remember_star_partition(entity["RowKey"], entity["PartitionKey"])
+
+    async def update_star(self, entity: Mapping[str, Any]) -> None:
+        await run_storage(self.table.update_entity, entity)
+
+    async def delete_star(self, entity: Mapping[str, Any]) -> None:
+        await run_storage(self.table.delete_entity, entity["PartitionKey"], entity["RowKey"])
+        forget_star_partition(entity["RowKey"])
+
+    async def delete_expired(
+        self, cutoff: float, batch_size: int, pace: Callable[[int], Awaitable[None]]
+    ) -> List[str]:
+        """
+        Page through expired rows only, selecting just the keys (the ETag
+        comes with them), and delete each page in per-partition
+        transactions of up to batch_size rows.
+        """
+        table = self.table
+        deleted: List[str] = []
+        if table is None:
+            # Initialization failed outside production; there is nothing to collect
+            return deleted
+        pages = table.query_entities(
+            "LastLiked lt @expiration",
+            parameters={"expiration": cutoff},
+            select=["PartitionKey", "RowKey"],
+            results_per_page=batch_size
+        ).by_page()
+
+        while True:
+            # Fetch the next page off the event loop; None means no more pages
+            page = await asyncio.to_thread(lambda: next(pages, None))
+            if page is None:
+                break
+            partitions: Dict[str, List[Dict]] = defaultdict(list)
+            for entity in page:
+                partitions[entity["PartitionKey"]].append(entity)
+
+            for batch in partitions.values():
+                for start in range(0, len(batch), batch_size):
+                    chunk = batch[start:start + batch_size]
+                    await pace(len(chunk))
+                    removed = await asyncio.to_thread(_delete_partition_batch, table, chunk)
+                    deleted.extend(removed)
+                    for star_id in removed:
+                        forget_star_partition(star_id)
+        return deleted
+
+    async def check(self) -> None:
+        # Just requesting an entity is a more reliable test than list_entities
+        await run_storage(tables["Users"].get_entity, partition_key="system", row_key="health-check")
@@ -0,0 +1,145 @@
+"""
+Hedged reads for Azure Table Storage.
+A point read that has not returned by the observed latency percentile is
+sent a second time, and whichever copy answers first is used. Only
+idempotent reads may be hedged. A budget caps the extra requests at a
+fraction of all reads, so a slow storage account is not hit twice as hard.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+def _discard_outcome(task: asyncio.Future) -> None:
+    """Retrieve a finished task's exception so it is not reported as unhandled"""
+    if not task.cancelled():
+        task.exception()
+
+class LatencyWindow:
+    """Durations of the most recent calls, with a cached percentile"""
+
+    def __init__(self, size: int = 1000, refresh_every: int = 50):
+        self._samples: deque = deque(maxlen=size)
+        self._refresh_every = refresh_every
+        self._since_refresh = 0
+        self._cached: Dict[float, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self._since_refresh += 1
+        if self._since_refresh >= self._refresh_every:
+            self._since_refresh = 0
+            self._cached.clear()
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        if p not in self._cached:
+            ordered = sorted(self._samples)
+            index = min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))
+            self._cached[p] = ordered[index]
+        return self._cached[p]
+
+class HedgePolicy:
+    """
+    Runs blocking SDK reads in worker threads and hedges slow ones.
+
+    Args:
+        enabled: Without hedging, calls still run off the event loop
+        percentile: Latency percentile after which a hedge is sent
+        max_extra_load: Hedges allowed per read, e.g. 0.05 for 5% more requests
+        min_samples: Reads observed before hedging starts
+        min_delay: Lower bound on the hedge delay in seconds
+    """
+
+    # Unused hedge budget that may accumulate, in requests
+    BUDGET_BURST = 10.0
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        percentile: float = 95.0,
+        max_extra_load: float = 0.05,
+        min_samples: int = 50,
+        min_delay: float = 0.002
+    ):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.max_extra_load = max_extra_load
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.latency = LatencyWindow()
+        self._budget = 0.0
+        self.reads = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.budget_exhausted = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None while too few reads were seen"""
+        if len(self.latency) < self.min_samples:
+            return None
+        return max(self.min_delay, self.latency.percentile(self.percentile))
+
+    async def _timed(self, fn: Callable, args: tuple, kwargs: dict) -> Any:
+        start = time.perf_counter()
+        try:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+        finally:
+            # Each copy's own duration, so hedging does not shrink the
+            # distribution it is tuned from
+            self.latency.add(time.perf_counter() - start)
+
+    async def call(self, fn: Callable, *args, **kwargs) -> Any:
+        """Call an idempotent read, hedging it when it is slower than usual"""
+        if not self.enabled:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+
+        self.reads += 1
+        self._budget = min(self._budget + self.max_extra_load, self.BUDGET_BURST)
+        delay = self.hedge_delay()
+        primary = asyncio.ensure_future(self._timed(fn, args, kwargs))
+        if delay is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+        if self._budget < 1:
+            self.budget_exhausted += 1
+            return await primary
+
+        self._budget -= 1
+        self.hedged += 1
+        hedge = asyncio.ensure_future(self._timed(fn, args, kwargs))
+        done, pending = await asyncio.wait({primary, hedge}, return_when=asyncio.FIRST_COMPLETED)
+        winner = hedge if hedge in done and primary not in done else primary
+        if winner is hedge:
+            self.hedge_wins += 1
+        for task in pending:
+            # The losing thread cannot be stopped; just drop its outcome
+            task.add_done_callback(_discard_outcome)
+        # The first answer is final, including "not found"
+        return winner.result()
+
+    def stats(self) -> Dict[str, Any]:
+        delay = self.hedge_delay()
+        p50 = self.latency.percentile(50)
+        return {
+            "enabled": self.enabled,
+            "reads": self.reads,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "budget_exhausted": self.budget_exhausted,
+            "hedge_rate": round(self.hedged / self.reads, 4) if self.reads else 0.0,
+            "hedge_delay_ms": round(delay * 1000, 3) if delay is not None else None,
+            "latency_p50_ms": round(p50 * 1000, 3) if p50 is not None else None,
+        }
@@ -0,0 +1,584 @@
+"""
+In-memory authoritative star storage with a local journal and snapshots.
+
+Selected with STORAGE_BACKEND=memory. Every star lives in memory, so reads
+never leave the process. Each change is applied in memory and appended to
+an append-only journal. A writer thread writes everything that accumulated
+while its previous fsync ran and then fsyncs once for the whole group, and a
+write returns when the fsync covering it is done. A snapshot thread
+periodically writes every star to a compact snapshot and removes the
+journal segments it covers, which bounds disk use and recovery time.
+Opening the store loads the newest snapshot and replays the journal after it.
+
+Files in the data directory:
+    snapshot-<seq>.snap  a JSON header line, then one JSON array per star
+    journal-<seq>.log    records from sequence number <seq> on, one per
+                         line as "<crc32 hex> <json>"
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import Future, InvalidStateError
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Mapping, Optional, Set, Tuple, Union
+
+from src.db.star_columns import StarColumns
+from src.models.star_record import StarRecord
+from src.utils.metrics import journal_commit_duration, journal_commit_records, snapshot_duration
+
+try:
+    import orjson
+except ImportError:  # Optional dependency, fall back to stdlib json
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+
+# Side of the square grid cells that index star positions, in map units;
+# a zoomed-in viewport touches a few dozen cells
+GRID_CELL = 0.05
+
+# Marks a segment switch in the journal's queue
+_ROLL = object()
+
+if orjson is not None:
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+else:
+    def _dumps(value: Any) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode()
+    _loads = json.loads
+
+def _row(record: StarRecord) -> list:
+    return [
+        record.partition, record.id, record.x, record.y, record.message,
+        record.last_liked, record.creation_date, record.user_id, record.username
+    ]
+
+def _from_row(row: list) -> StarRecord:
+    return StarRecord(row[1], row[0], *row[2:])
+
+def _cell(x: float, y: float) -> Tuple[int, int]:
+    return math.floor(x / GRID_CELL), math.floor(y / GRID_CELL)
+
+def _resolve(future: Future, error: Optional[BaseException] = None) -> None:
+    try:
+        if error is None:
+            future.set_result(None)
+        else:
+            future.set_exception(error)
+    except InvalidStateError:
+        # The waiter was cancelled
+        pass
+
+def _parse_line(line: bytes) -> Optional[Dict[str, Any]]:
+    """A journal record, or None for a torn or corrupt line"""
+    if not line.endswith(b"\n"):
+        return None
+    checksum, _, payload = line[:-1].partition(b" ")
+    try:
+        if int(checksum, 16) != zlib.crc32(payload):
+            return None
+        return _loads(payload)
+    except ValueError:
+        return None
+
+def _numbered_files(directory: str, prefix: str, suffix: str) -> List[Tuple[int, str]]:
+    """(sequence number, path) of the files named <prefix><seq><suffix>, in order"""
+    files = []
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and name.endswith(suffix):
+            number = name[len(prefix):-len(suffix)]
+            if number.isdigit():
+                files.append((int(number), os.path.join(directory, name)))
+    return sorted(files)
+
+def _sync_directory(directory: str) -> None:
+    """Make renames and new files in `directory` survive a power loss"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        # Not possible on every platform (e.g. Windows)
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class Journal:
+    """
+    Append-only journal segments written by one thread with group commit.
+
+    Args:
+        directory: Where the journal-<seq>.log segments live
+        fsync: Whether each group is fsynced; without it groups are only
+            handed to the OS, which survives a process crash but not a
+            power loss
+    """
+
+    def __init__(self, directory: str, fsync: bool = True):
+        self.directory = directory
+        self.fsync = fsync
+        # Set when a write failed; the journal accepts nothing after that
+        self.error: Optional[BaseException] = None
+        self._condition = threading.Condition()
+        self._pending: List[tuple] = []
+        self._closed = False
+        self._file = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, first_seq: int) -> None:
+        self._open_segment(first_seq)
+        self._thread = threading.Thread(target=self._run, name="star-journal", daemon=True)
+        self._thread.start()
+
+    def append(self, line: bytes) -> Future:
+        """Queue a record; the future completes once it is on disk"""
+        future: Future = Future()
+        with self._condition:
+            if self.error is not None:
+                raise RuntimeError(f"Star journal failed: {self.error}")
+            if self._closed:
+                raise RuntimeError("Star journal is closed")
+            self._pending.append((line, future))
+            self._condition.notify()
+        return future
+
+    def roll(self, first_seq: int) -> Future:
+        """Start a new segment for records from `first_seq` on, after those already queued"""
+        future: Future = Future()
+        with self._condition:
+            self._pending.append((_ROLL, first_seq, future))
+            self._condition.notify()
+        return future
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _open_segment(self, first_seq: int) -> None:
+        if self._file is not None:
+            self._file.close()
+        path = os.path.join(self.directory, f"journal-{first_seq:016d}.log")
+        self._file = open(path, "ab")
+        _sync_directory(self.directory)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                group, self._pending = self._pending, []
+            self._commit(group)
+
+    def _commit(self, group: List[tuple]) -> None:
+        start = time.perf_counter()
+        waiting: List[Future] = []
+        lines: List[bytes] = []
+        try:
+            if self.error is not None:
+                raise self.error
+            for item in group:
+                if item[0] is _ROLL:
+                    # Everything before the roll belongs to the old segment
+                    self._flush(lines)
+                    lines = []
+                    self._open_segment(item[1])
+                    waiting.append(item[2])
+                else:
+                    lines.append(item[0])
+                    waiting.append(item[1])
+            self._flush(lines)
+        except BaseException as e:
+            logger.error("Writing the star journal failed, refusing further writes: %s", e)
+            self.error = e
+            for future in waiting:
+                _resolve(future, e)
+            for item in group[len(waiting):]:
+                _resolve(item[-1], e)
+            return
+        for future in waiting:
+            _resolve(future)
+        journal_commit_duration.observe(time.perf_counter() - start)
+        journal_commit_records.observe(len(group))
+
+    def _flush(self, lines: List[bytes]) -> None:
+        if not lines:
+            return
+        self._file.write(b"".join(lines))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+class MemoryProvider:
+    """
+    DatabaseProvider keeping every star in memory, made durable by a journal.
+
+    Mutations run on the event loop. The lock orders them against snapshot
+    capture, which runs on the snapshot thread. Stars are stored as
+    immutable StarRecords and replaced on update, so a snapshot only needs
+    a shallow copy of the index.
+
+    Args:
+        directory: Data directory for snapshots and journal segments
+        fsync: Acknowledge writes only after the fsync covering them; when
+            off, writes return as soon as they are queued
+        snapshot_interval: Seconds between snapshots, if anything changed
+        snapshot_after_records: Journal records that trigger an early snapshot
+        columnar: Keep x, y and timestamps in NumPy arrays too, so active
+            star, viewport and GC scans are single vectorized passes
+            (needs numpy)
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        fsync: bool = True,
+        snapshot_interval: float = 300.0,
+        snapshot_after_records: int = 100000,
+        columnar: bool = False
+    ):
+        self.directory = directory
+        self.fsync = fsync
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_after_records = snapshot_after_records
+        self._stars: Dict[Union[int, str], StarRecord] = {}
+        self._by_user: Dict[str, Set[Union[int, str]]] = {}
+        self._grid: Dict[Tuple[int, int], Dict[Union[int, str], StarRecord]] = {}
+        self._columns: Optional[StarColumns] = StarColumns() if columnar else None
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._seq = 0
+        self._records_since_snapshot = 0
+        self._journal = Journal(directory, fsync)
+        self._snapshot_wake = threading.Event()
+        self._stopping = False
+        self._snapshot_thread: Optional[threading.Thread] = None
+
+    # Lifecycle
+
+    def open(self) -> "MemoryProvider":
+        """Recover the stars from disk and start the journal and snapshot threads"""
+        os.makedirs(self.directory, exist_ok=True)
+        self._recover()
+        self._journal.start(self._seq + 1)
+        self._snapshot_thread = threading.Thread(target=self._snapshot_loop, name="star-snapshots", daemon=True)
+        self._snapshot_thread.start()
+        return self
+
+    def close(self) -> None:
+        """Stop the threads, writing a final snapshot so the next start replays nothing"""
+        self._stopping = True
+        self._snapshot_wake.set()
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+        if self._records_since_snapshot:
+            try:
+                self.snapshot()
+            except Exception as e:
+                logger.error("Final star snapshot failed: %s", e)
+        self._journal.close()
+
+    def import_stars(self, entities: Iterable[Mapping[str, Any]]) -> int:
+        """Load stars, e.g. when moving off Table Storage, and snapshot them; returns the count"""
+        count = 0
+        with self._lock:
+            for entity in entities:
+                self._put(StarRecord.from_entity(entity))
+                count += 1
+        self.snapshot()
+        return count
+
+    def __len__(self) -> int:
+        return len(self._stars)
+
+    # Recovery
+
+    def _recover(self) -> None:
+        start = time.perf_counter()
+        for seq, path in reversed(_numbered_files(self.directory, "snapshot-", ".snap")):
+            try:
+                self._load_snapshot(path)
+                self._seq = seq
+                break
+            except (OSError, ValueError, KeyError, IndexError, TypeError) as e:
+                logger.error("Skipping unreadable snapshot %s: %s", path, e)
+                self._stars.clear()
+                self._by_user.clear()
+                self._grid.clear()
+                if self._columns is not None:
+                    self._columns = StarColumns()
+
+        segments = _numbered_files(self.directory, "journal-", ".log")
+        replayed = 0
+        for index, (_, path) in enumerate(segments):
+            replayed += self._replay(path, last=index == len(segments) - 1)
+        self._records_since_snapshot = replayed
+        logger.info(
+            "Recovered %d stars at sequence %d, replaying %d journal records, in %.2fs",
+            len(self._stars), self._seq, replayed, time.perf_counter() - start
+        )
+
+    def _load_snapshot(self, path: str) -> None:
+        with open(path, "rb") as f:
+            header = _loads(f.readline())
+            if header.get("format") != SNAPSHOT_FORMAT:
+                raise ValueError(f"Unknown snapshot format {header.get('format')}")
+            count = 0
+            for line in f:
+                self._put(_from_row(_loads(line)))
+                count += 1
+        if count != header["count"]:
+            raise ValueError(f"Snapshot holds {count} stars, its header says {header['count']}")
+
+    def _replay(self, path: str, last: bool) -> int:
+        """Apply the records of one segment that are newer than the state; returns how many"""
+        offset = 0
+        replayed = 0
+        bad_line: Optional[bytes] = None
+        with open(path, "rb") as f:
+            for line in f:
+                entry = _parse_line(line)
+                if entry is None:
+                    bad_line = line
+                    break
+                offset += len(line)
+                seq = entry["q"]
+                if seq <= self._seq:
+                    continue
+                if seq != self._seq + 1:
+                    raise RuntimeError(f"Star journal is missing records {self._seq + 1} to {seq - 1}")
+                self._apply(entry)
+                self._seq = seq
+                replayed += 1
+        if bad_line is not None:
+            # Only the final line of the newest segment can be a write cut
+            # short by a crash, which was never acknowledged. A bad record
+            # with anything after it is corruption, and the records after
+            # it were acknowledged, so they must not be thrown away.
+            if not last or offset + len(bad_line) != os.path.getsize(path):
+                raise RuntimeError(f"Corrupt star journal record in {path} at byte {offset}")
+            logger.warning("Discarding %d bytes of torn journal tail in %s", len(bad_line), path)
+            os.truncate(path, offset)
+        return replayed
+
+    # State
+
+    def _apply(self, entry: Dict[str, Any]) -> None:
+        if entry["o"] == "put":
+            self._put(_from_row(entry["s"]))
+        else:
+            for star_id in entry["ids"]:
+                self._remove(star_id)
+
+    def _put(self, record: StarRecord) -> None:
+        previous = self._stars.get(record.key)
+        if previous is not None:
+            self._unindex(previous)
+        self._stars[record.key] = record
+        if record.user_id is not None:
+            self._by_user.setdefault(record.user_id, set()).add(record.key)
+        self._grid.setdefault(_cell(record.x, record.y), {})[record.key] = record
+        if self._columns is not None:
+            self._columns.append(record.key, record.x, record.y, record.last_liked, record.creation_date)
+
+    def _remove(self, star_id: str) -> None:
+        record = self._stars.pop(StarRecord.pack_id(star_id), None)
+        if record is not None:
+            self._unindex(record)
+            if self._columns is not None:
+                self._columns.delete(record.key)
+
+    def _unindex(self, record: StarRecord) -> None:
+        self._unindex_user(record)
+        cell = _cell(record.x, record.y)
+        records = self._grid.get(cell)
+        if records is not None:
+            records.pop(record.key, None)
+            if not records:
+                del self._grid[cell]
+
+    def _unindex_user(self, record: StarRecord) -> None:
+        keys = self._by_user.get(record.user_id)
+        if keys is not None:
+            keys.discard(record.key)
+            if not keys:
+                del self._by_user[record.user_id]
+
+    async def _write(self, entry: Dict[str, Any]) -> None:
+        """Apply a change in memory, journal it and wait until it is durable"""
+        with self._lock:
+            seq = self._seq + 1
+            entry["q"] = seq
+            payload = _dumps(entry)
+            future = self._journal.append(b"%08x %s\n" % (zlib.crc32(payload), payload))
+            self._seq = seq
+            self._apply(entry)
+            self._records_since_snapshot += 1
+        if self._records_since_snapshot >= self.snapshot_after_records:
+            self._snapshot_wake.set()
+        if self.fsync:
+            await asyncio.wrap_future(future)
+
+    # Snapshots
+
+    def _snapshot_loop(self) -> None:
+        while not self._stopping:
+            self._snapshot_wake.wait(self.snapshot_interval)
+            self._snapshot_wake.clear()
+            if self._stopping:
+                return
+            if self._records_since_snapshot:
+                try:
+                    self.snapshot()
+                except Exception:
+                    logger.exception("Star snapshot failed")
+
+    def snapshot(self) -> int:
+        """Write every star to a new snapshot and drop the journal it covers; returns its sequence number"""
+        with self._snapshot_lock:
+            if self._journal.error is not None:
+                # Memory may hold changes the journal never took
+                raise RuntimeError(f"Star journal failed: {self._journal.error}")
+            start = time.perf_counter()
+            with self._lock:
+                records = list(self._stars.values())
+                seq = self._seq
+                self._records_since_snapshot = 0
+                rolled = self._journal.roll(seq + 1)
+
+            path = os.path.join(self.directory, f"snapshot-{seq:016d}.snap")
+            temporary = path + ".tmp"
+            with open(temporary, "wb") as f:
+                f.write(_dumps({"format": SNAPSHOT_FORMAT, "seq": seq, "count": len(records)}) + b"\n")
+                f.writelines(_dumps(_row(record)) + b"\n" for record in records)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, path)
+            _sync_directory(self.directory)
+
+            # Older snapshots, and segments holding only records up to seq,
+            # are covered by this snapshot once the journal has moved on
+            rolled.result()
+            for old_seq, old_path in _numbered_files(self.directory, "snapshot-", ".snap"):
+                if old_seq < seq:
+                    os.remove(old_path)
+            for first_seq, old_path in _numbered_files(self.directory, "journal-", ".log"):
+                if first_seq <= seq:
+                    os.remove(old_path)
+
+            elapsed = time.perf_counter() - start
+            snapshot_duration.observe(elapsed)
+            logger.info("Wrote snapshot of %d stars at sequence %d in %.2fs", len(records), seq, elapsed)
+            return seq
+
+    # DatabaseProvider
+
+    async def get_star(self, star_id: str) -> Optional[Dict[str, Any]]:
+        record = self._stars.get(StarRecord.pack_id(star_id))
+        return record.to_entity() if record is not None else None
+
+    async def _filter(
+        self, keep: Callable[[StarRecord], bool], records: Optional[List[StarRecord]] = None
+    ) -> List[Dict[str, Any]]:
+        # Records are never changed in place, so copied references can be
+        # read off the event loop while writes go on
+        if records is None:
+            records = list(self._stars.values())
+        return await asyncio.to_thread(lambda: [record.to_entity() for record in records if keep(record)])
+
+    async def list_stars(self) -> List[Dict[str, Any]]:
+        return await self._filter(lambda record: True)
+
+    def _column_records(self, keys: Iterable[Union[int, str]]) -> List[StarRecord]:
+        # Column queries run on the event loop, where every write is applied,
+        # so the keys they return are all present
+        return [self._stars[key] for key in keys]
+
+    async def active_stars(self, cutoff: float) -> List[Dict[str, Any]]:
+        if self._columns is not None:
+            return await self._filter(lambda record: True, self._column_records(self._columns.active_since(cutoff)))
+        return await self._filter(lambda record: record.last_liked is not None and record.last_liked >= cutoff)
+
+    async def stars_by_user(self, user_id: str) -> List[Dict[str, Any]]:
+        return [self._stars[key].to_entity() for key in self._by_user.get(user_id, ())]
+
+    async def stars_in_viewport(self, x_min: float, y_min: float, x_max: float, y_max: float) -> List[Dict[str, Any]]:
+        if self._columns is not None:
+            keys = self._columns.in_bbox(x_min, y_min, x_max, y_max)
+            return await self._filter(lambda record: True, self._column_records(keys))
+        (cx_min, cy_min), (cx_max, cy_max) = _cell(x_min, y_min), _cell(x_max, y_max)
+        records: List[StarRecord] = []
+        if (cx_max - cx_min + 1) * (cy_max - cy_min + 1) <= len(self._grid):
+            for cx in range(cx_min, cx_max + 1):
+                for cy in range(cy_min, cy_max + 1):
+                    cell = self._grid.get((cx, cy))
+                    if cell:
+                        records.extend(cell.values())
+        else:
+            # More cells in the rectangle than occupied ones
+            for (cx, cy), cell in self._grid.items():
+                if cx_min <= cx <= cx_max and cy_min <= cy <= cy_max:
+                    records.extend(cell.values())
+        return await self._filter(lambda record: x_min <= record.x <= x_max and y_min <= record.y <= y_max, records)
+
+    async def create_star(self, entity: Mapping[str, Any]) -> None:
+        record = StarRecord.from_entity(entity)
+        if record.key in self._stars:
+            raise ValueError(f"Star {entity['RowKey']} already exists")
+        await self._write({"o": "put", "s": _row(record)})
+
+    async def update_star(self, entity: Mapping[str, Any]) -> None:
+        current = self._stars.get(StarRecord.pack_id(entity["RowKey"]))
+        if current is None:
+            raise KeyError(f"Star {entity['RowKey']} does not exist")
+        get = entity.get
+        record = StarRecord(
+            entity["RowKey"], current.partition, current.x, current.y, entity["Message"],
+            get("LastLiked"), get("creationDate"), get("UserId"), get("Username")
+        )
+        await self._write({"o": "put", "s": _row(record)})
+
+    async def delete_star(self, entity: Mapping[str, Any]) -> None:
+        if StarRecord.pack_id(entity["RowKey"]) in self._stars:
+            await self._write({"o": "del", "ids": [entity["RowKey"]]})
+
+    async def delete_expired(
+        self, cutoff: float, batch_size: int, pace: Callable[[int], Awaitable[None]]
+    ) -> List[str]:
+        def expired(record: Optional[StarRecord]) -> bool:
+            return record is not None and record.last_liked is not None and record.last_liked < cutoff
+
+        if self._columns is not None:
+            keys = self._columns.expired_before(cutoff)
+        else:
+            records = list(self._stars.values())
+            keys = await asyncio.to_thread(lambda: [record.key for record in records if expired(record)])
+        deleted: List[str] = []
+        for start in range(0, len(keys), batch_size):
+            await pace(min(batch_size, len(keys) - start))
+            # Check the current records: stars deleted or liked since the
+            # scan stay. Nothing awaits between this check and the delete.
+            batch = [self._stars[key].id for key in keys[start:start + batch_size] if expired(self._stars.get(key))]
+            if batch:
+                await self._write({"o": "del", "ids": batch})
+                deleted.extend(batch)
+        return deleted
+
+    async def check(self) -> None:
+        if self._journal.error is not None:
+            raise RuntimeError(f"Star journal failed: {self._journal.error}")
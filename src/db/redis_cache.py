@@ -1,129 +1,396 @@
-import logging
-import asyncio
-from redis import asyncio as aioredis
-from redis.exceptions import RedisError, ConnectionError, TimeoutError
-from fastapi_cache import FastAPICache
-from fastapi_cache.backends.redis import RedisBackend
-from fastapi_limiter import FastAPILimiter
-
-from src.config.settings import settings
-
-logger = logging.getLogger(__name__)
-
-# Cache status
-redis_initialized = False
-
-async def init_redis():
-    """Initialize Redis connection and setup caching/rate limiting"""
-    global redis_initialized
-    
-    redis_host = settings.REDIS.HOST
-    
-    # If Redis host is not configured, skip initialization
-    if not redis_host:
-        logger.info("Redis host not configured, skipping cache initialization")
-        redis_initialized = False
-        return None
-
-    redis_password = settings.REDIS.PASSWORD
-    redis_ssl = settings.REDIS.SSL
-    redis_port = settings.REDIS.PORT
-    
-    # Construct Redis URL with proper SSL handling
-    redis_scheme = "rediss" if redis_ssl else "redis"
-    redis_url = f"{redis_scheme}://{redis_host}:{redis_port}"
-    
-    logger.info(f"Initializing Redis cache connection to {redis_host}:{redis_port} (SSL: {redis_ssl})")
-    
-    # Configure connection pool
-    try:
-        # Set shorter timeouts in production to prevent hanging
-        connect_timeout = 5.0 if settings.ENVIRONMENT == "production" else 10.0
-        
-        redis = aioredis.from_url(
-            redis_url,
-            password=redis_password,
-            encoding="utf8",
-            decode_responses=True,
-            max_connections=10,  # Configure pool size based on container resources
-            retry_on_timeout=True,
-            socket_connect_timeout=connect_timeout,
-            socket_keepalive=True,  # Keep connection alive
-            health_check_interval=30  # Check connection every 30 seconds
-        )
-        
-        # Test connection with timeout (important for Azure Container Apps)
-        try:
-            # Use asyncio.wait_for to add a timeout to the ping operation
-            await asyncio.wait_for(redis.ping(), timeout=connect_timeout)
-            logger.info("Successfully connected to Redis cache")
-        except asyncio.TimeoutError:
-            logger.warning(f"Redis ping timed out after {connect_timeout} seconds")
-            if settings.ENVIRONMENT == "production":
-                # In production, this is important enough to throw an error
-                raise TimeoutError(f"Redis connection test timed out after {connect_timeout}s")
-            return None
-        
-        # Initialize FastAPI Cache
-        FastAPICache.init(
-            backend=RedisBackend(redis),
-            prefix="starmap-cache"
-        )
-        logger.info("FastAPI Cache initialized")
-        
-        # Initialize rate limiter if not in test environment
-        if settings.ENVIRONMENT != "test":
-            try:
-                await FastAPILimiter.init(redis)
-                logger.info("Rate limiter initialized")
-            except Exception as e:
-                logger.warning(f"Failed to initialize rate limiter: {str(e)}")
-                # Continue without rate limiting
-        
-        redis_initialized = True
-        return redis
-    except (RedisError, ConnectionError, TimeoutError) as e:
-        logger.warning(f"Failed to connect to Redis: {str(e)}")
-        logger.warning("Application will function without caching and rate limiting")
-        redis_initialized = False
-        return None
-    except Exception as e:
-        logger.warning(f"Unexpected error initializing Redis: {str(e)}")
-        redis_initialized = False
-        return None
-
-def is_cache_initialized():
-    """Check if the cache is properly initialized"""
-    try:
-        return FastAPICache._backend is not None
-    except Exception:
-        return False
-
-async def get_redis_info():
-    """Get Redis server info for diagnostics"""
-    if not is_cache_initialized():
-        return {"status": "not_initialized"}
-    
-    try:
-        # Get the Redis client from FastAPICache
-        redis = FastAPICache._backend.redis
-        
-        # Add timeout to prevent hanging on slow Redis
-        info = await asyncio.wait_for(redis.info(), timeout=5.0)
-        clients = await asyncio.wait_for(redis.client_list(), timeout=5.0)
-        
-        return {
-            "status": "connected",
-            "version": info.get("redis_version"),
-            "memory": {
-                "used_memory_human": info.get("used_memory_human"),
-                "maxmemory_human": info.get("maxmemory_human"),
-            },
-            "clients": len(clients),
-            "uptime_days": info.get("uptime_in_days")
-        }
-    except Exception as e:
-        return {
-            "status": "error",
-            "message": str(e)
-        }
+import logging
+import asyncio
+import time
+from typing import Any, Callable, Dict
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError, ConnectionError, TimeoutError, ResponseError
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.redis import RedisBackend
+from fastapi_limiter import FastAPILimiter
+
+from src.config.settings import settings
+from src.utils.deadline import DeadlineExceeded, remaining
+from src.utils.metrics import redis_duration, redis_errors, redis_pool_acquire
+from src.utils.tracing import record_span
+
+logger = logging.getLogger(__name__)
+
+# Cache status
+redis_initialized = False
+
+# Each role gets its own pool so that, for example, a burst of likes
+# updating counters cannot starve cache reads of connections
+REDIS_ROLES = ("cache", "limiter", "counters", "pubsub")
+
+_clients: Dict[str, aioredis.Redis] = {}
+
+class PoolExhaustedError(ConnectionError):
+    """No pooled connection freed up within the pool timeout; Redis itself may be fine"""
+
+class InstrumentedConnectionPool(aioredis.BlockingConnectionPool):
+    """
+    Blocking pool that records how long callers wait for a connection.
+
+    Callers wait up to `timeout` seconds when every connection is in use,
+    then get a ConnectionError instead of opening more connections.
+    """
+
+    def __init__(self, *args, role: str = "cache", **kwargs):
+        self.role = role
+        self.waiters = 0
+        self.acquired = 0
+        self.errors = 0
+        self.acquire_seconds_total = 0.0
+        self.acquire_seconds_max = 0.0
+        super().__init__(*args, **kwargs)
+
+    async def get_connection(self, command_name, *keys, **options):
+        start = time.perf_counter()
+        waiting = self.pool.empty()
+        if waiting:
+            self.waiters += 1
+        try:
+            connection = await super().get_connection(command_name, *keys, **options)
+        except ConnectionError as e:
+            # No connection freed up within the timeout, or connecting failed
+            self.errors += 1
+            if isinstance(e.__context__, (asyncio.TimeoutError, asyncio.QueueEmpty)):
+                raise PoolExhaustedError(f"No {self.role} connection available within {self.timeout}s") from e
+            raise
+        finally:
+            if waiting:
+                self.waiters -= 1
+        elapsed = time.perf_counter() - start
+        self.acquired += 1
+        self.acquire_seconds_total += elapsed
+        self.acquire_seconds_max = max(self.acquire_seconds_max, elapsed)
+        redis_pool_acquire.observe(elapsed, self.role)
+        return connection
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.max_connections,
+            "created": len(self._connections),
+            # Idle connections and unopened slots both sit in the queue
+            "in_use": self.max_connections - self.pool.qsize(),
+            "waiters": self.waiters,
+            "acquired": self.acquired,
+            "errors": self.errors,
+            "acquire_ms_avg": round(self.acquire_seconds_total / self.acquired * 1000, 3) if self.acquired else 0.0,
+            "acquire_ms_max": round(self.acquire_seconds_max * 1000, 3),
+        }
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of calling Redis while the circuit breaker is open"""
+
+class CircuitBreaker:
+    """
+    Stops calling Redis after repeated failures or slow calls.
+
+    Closed: calls go through; `failure_threshold` consecutive failures,
+    where a call slower than `slow_call_seconds` also counts as one, open
+    the breaker. Open: calls fail at once with CircuitOpenError. After
+    `reset_seconds` the breaker is half-open and lets a single probe call
+    through; its success closes the breaker and its failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        slow_call_seconds: float,
+        reset_seconds: float,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.trips = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and self.clock() - self._opened_at >= self.reset_seconds:
+            self._state = self.HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def allows_requests(self) -> bool:
+        return self.state != self.OPEN
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may go to Redis now"""
+        state = self.state
+        if state == self.OPEN or (state == self.HALF_OPEN and self._probing):
+            self.rejected += 1
+            raise CircuitOpenError("Redis circuit breaker is open")
+        if state == self.HALF_OPEN:
+            self._probing = True
+
+    def record(self, elapsed: float, failed: bool) -> None:
+        """Record the outcome of a call let through by before_call"""
+        if failed or elapsed > self.slow_call_seconds:
+            self._on_failure()
+        else:
+            self._on_success()
+
+    def abandon(self) -> None:
+        """The caller was cancelled before the call finished; free the probe slot"""
+        self._probing = False
+
+    def _on_success(self) -> None:
+        # Calls started before the breaker opened do not close it
+        if self._state == self.OPEN:
+            return
+        if self._state == self.HALF_OPEN:
+            logger.info("Redis circuit breaker closed, Redis calls resumed")
+        self._state = self.CLOSED
+        self._failures = 0
+        self._probing = False
+
+    def _on_failure(self) -> None:
+        self._failures += 1
+        if self._state == self.HALF_OPEN or (
+            self._state == self.CLOSED and self._failures >= self.failure_threshold
+        ):
+            self.trips += 1
+            logger.warning(f"Redis circuit breaker opened for {self.reset_seconds}s after {self._failures} failed or slow calls")
+            self._state = self.OPEN
+            self._opened_at = self.clock()
+            self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+# One breaker per role, so failures seen through one pool (for example a
+# saturated counters pool) do not switch off the others
+breakers = {
+    role: CircuitBreaker(
+        settings.REDIS.BREAKER_FAILURE_THRESHOLD,
+        settings.REDIS.BREAKER_SLOW_CALL_SECONDS,
+        settings.REDIS.BREAKER_RESET_SECONDS
+    )
+    for role in REDIS_ROLES
+}
+
+class GuardedRedis(aioredis.Redis):
+    """Redis client whose commands go through its role's circuit breaker with a timeout"""
+
+    async def execute_command(self, *args, **options):
+        breaker = breakers[getattr(self.connection_pool, "role", "cache")]
+        timeout = settings.REDIS.COMMAND_TIMEOUT
+        left = remaining()
+        deadline_bound = left is not None and left < timeout
+        if deadline_bound:
+            if left <= 0:
+                raise DeadlineExceeded()
+            timeout = left
+        breaker.before_call()
+        start = time.perf_counter()
+        failed = None
+        try:
+            result = await asyncio.wait_for(super().execute_command(*args, **options), timeout=timeout)
+            failed = False
+            return result
+        except ResponseError:
+            # Redis answered; the command itself was wrong
+            failed = False
+            raise
+        except PoolExhaustedError:
+            # This replica is short of connections, which says nothing about Redis
+            raise
+        except asyncio.TimeoutError:
+            if deadline_bound:
+                # The request ran out of time, which says nothing about Redis
+                raise DeadlineExceeded() from None
+            failed = True
+            raise
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            command = str(args[0]).upper() if args else "UNKNOWN"
+            redis_duration.observe(elapsed, command)
+            record_span("redis", start, elapsed)
+            if failed is None:
+                breaker.abandon()
+            else:
+                breaker.record(elapsed, failed)
+                if failed:
+                    redis_errors.inc(command)
+
+def _pool_size(role: str) -> int:
+    return getattr(settings.REDIS, f"POOL_{role.upper()}_SIZE")
+
+def get_redis_client(role: str = "cache") -> aioredis.Redis:
+    """Return the Redis client for a role; raises RuntimeError when Redis is not initialized"""
+    if role not in REDIS_ROLES:
+        raise ValueError(f"Unknown Redis role: {role}")
+    client = _clients.get(role)
+    if client is None:
+        raise RuntimeError("Redis is not initialized")
+    return client
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Connection pool statistics per role"""
+    return {role: client.connection_pool.stats() for role, client in _clients.items()}
+
+async def init_redis():
+    """Initialize Redis connection and setup caching/rate limiting"""
+    global redis_initialized
+    
+    redis_host = settings.REDIS.HOST
+    
+    # If Redis host is not configured, skip initialization
+    if not redis_host:
+        logger.info("Redis host not configured, skipping cache initialization")
+        redis_initialized = False
+        return None
+
+    redis_password = settings.REDIS.PASSWORD
+    redis_ssl = settings.REDIS.SSL
+    redis_port = settings.REDIS.PORT
+    
+    # Construct Redis URL with proper SSL handling
+    redis_scheme = "rediss" if redis_ssl else "redis"
+    redis_url = f"{redis_scheme}://{redis_host}:{redis_port}"
+    
+    logger.info(f"Initializing Redis cache connection to {redis_host}:{redis_port} (SSL: {redis_ssl})")
+    
+    # Configure one connection pool per role
+    try:
+        # Set shorter timeouts in production to prevent hanging
+        connect_timeout = 5.0 if settings.ENVIRONMENT == "production" else 10.0
+        
+        clients = {
+            role: GuardedRedis(connection_pool=InstrumentedConnectionPool.from_url(
+                redis_url,
+                role=role,
+                max_connections=_pool_size(role),  # Sized per role in REDIS_POOL_<ROLE>_SIZE
+                timeout=settings.REDIS.POOL_TIMEOUT,
+                password=redis_password,
+                encoding="utf8",
+                decode_responses=True,
+                retry_on_timeout=True,
+                socket_connect_timeout=connect_timeout,
+                socket_keepalive=True,  # Keep connection alive
+                health_check_interval=30  # Check connection every 30 seconds
+            ))
+            for role in REDIS_ROLES
+        }
+        redis = clients["cache"]
+        
+        # Test connection with timeout (important for Azure Container Apps)
+        try:
+            # Use asyncio.wait_for to add a timeout to the ping operation
+            await asyncio.wait_for(redis.ping(), timeout=connect_timeout)
+            logger.info("Successfully connected to Redis cache")
+        except asyncio.TimeoutError:
+            logger.warning(f"Redis ping timed out after {connect_timeout} seconds")
+            if settings.ENVIRONMENT == "production":
+                # In production, this is important enough to throw an error
+                raise TimeoutError(f"Redis connection test timed out after {connect_timeout}s")
+            return None
+        
+        _clients.update(clients)
+
+        # Initialize FastAPI Cache
+        FastAPICache.init(
+            backend=RedisBackend(redis),
+            prefix="starmap-cache"
+        )
+        logger.info("FastAPI Cache initialized")
+        
+        # Initialize rate limiter if not in test environment
+        if settings.ENVIRONMENT != "test":
+            try:
+                await FastAPILimiter.init(clients["limiter"])
+                logger.info("Rate limiter initialized")
+            except Exception as e:
+                logger.warning(f"Failed to initialize rate limiter: {str(e)}")
+                # Continue without rate limiting
+        
+        redis_initialized = True
+        return redis
+    except (RedisError, ConnectionError, TimeoutError) as e:
+        logger.warning(f"Failed to connect to Redis: {str(e)}")
+        logger.warning("Application will function without caching and rate limiting")
+        redis_initialized = False
+        return None
+    except Exception as e:
+        logger.warning(f"Unexpected error initializing Redis: {str(e)}")
+        redis_initialized = False
+        return None
+
+async def close_redis():
+    """Close every role's client and its connection pool"""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        try:
+            await client.close()
+            await client.connection_pool.disconnect()
+        except Exception as e:
+            logger.warning(f"Error closing Redis connections: {str(e)}")
+
+def is_cache_initialized(role: str = "cache"):
+    """Whether Redis should be used for a role: the cache is initialized and the role's breaker is not open"""
+    try:
+        return FastAPICache._backend is not None and breakers[role].allows_requests()
+    except Exception:
+        return False
+
+def get_breaker_stats() -> Dict[str, Dict[str, Any]]:
+    """Breaker statistics per role, with whether that role currently skips Redis"""
+    return {
+        role: dict(breaker.stats(), circuit_open=not breaker.allows_requests())
+        for role, breaker in breakers.items()
+    }
+
+async def get_redis_info():
+    """Get Redis server info for diagnostics"""
+    if not is_cache_initialized():
+        if _clients and not breakers["cache"].allows_requests():
+            return {"status": "circuit_open", "pools": get_pool_stats(), "breakers": get_breaker_stats()}
+        return {"status": "not_initialized"}
+    
+    try:
+        redis = get_redis_client("cache")
+        
+        # Add timeout to prevent hanging on slow Redis
+        info = await asyncio.wait_for(redis.info(), timeout=5.0)
+        clients = await asyncio.wait_for(redis.client_list(), timeout=5.0)
+        
+        return {
+            "status": "connected",
+            "version": info.get("redis_version"),
+            "memory": {
+                "used_memory_human": info.get("used_memory_human"),
+                "maxmemory_human": info.get("maxmemory_human"),
+            },
+            "clients": len(clients),
+            "uptime_days": info.get("uptime_in_days"),
+            "pools": get_pool_stats(),
+            "breakers": get_breaker_stats()
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": str(e),
+            "pools": get_pool_stats(),
+            "breaker": breaker.stats()
+        }
@@ -0,0 +1,294 @@
+"""
+SQLite star storage for single-node and edge deployments.
+
+Selected with STORAGE_BACKEND=sqlite. The database runs in WAL mode, so
+readers never wait for the writer: every worker thread reads through its own
+connection while writes share one connection behind a lock. Stars come back
+in the same shape as Stars table entities, so serialization and the routes
+do not care which backend answered. Viewport queries go through an R*Tree
+index that triggers keep in step with the stars table.
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Mapping, Optional
+
+from src.utils.deadline import within_deadline
+from src.utils.metrics import storage_duration, storage_errors, storage_entities
+from src.utils.tracing import record_span
+
+logger = logging.getLogger(__name__)
+
+# Label for storage metrics, shared with the Azure backend's Stars table
+TABLE = "Stars"
+
+# Statements compiled and kept per connection. sqlite3 prepares each SQL
+# string once and reuses it while it stays in this cache, so every query
+# below is a constant string with ? parameters.
+STATEMENT_CACHE_SIZE = 64
+
+# Stored in PRAGMA user_version; bump it when SCHEMA changes
+SCHEMA_VERSION = 1
+TABLE_COLUMNS = {
+    "key", "id", "partition", "x", "y", "message", "last_liked", "creation_date", "user_id", "username"
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stars (
+    key INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    partition TEXT NOT NULL,
+    x REAL NOT NULL,
+    y REAL NOT NULL,
+    message TEXT NOT NULL,
+    last_liked REAL,
+    creation_date REAL,
+    user_id TEXT,
+    username TEXT
+);
+CREATE INDEX IF NOT EXISTS stars_last_liked ON stars (last_liked);
+CREATE INDEX IF NOT EXISTS stars_user_id ON stars (user_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS star_positions USING rtree (key, min_x, max_x, min_y, max_y);
+CREATE TRIGGER IF NOT EXISTS stars_position_insert AFTER INSERT ON stars BEGIN
+    INSERT INTO star_positions VALUES (new.key, new.x, new.x, new.y, new.y);
+END;
+CREATE TRIGGER IF NOT EXISTS stars_position_update AFTER UPDATE OF x, y ON stars BEGIN
+    UPDATE star_positions SET min_x = new.x, max_x = new.x, min_y = new.y, max_y = new.y WHERE key = new.key;
+END;
+CREATE TRIGGER IF NOT EXISTS stars_position_delete AFTER DELETE ON stars BEGIN
+    DELETE FROM star_positions WHERE key = old.key;
+END;
+"""
+
+# Entity property for each selected column, in order
+ENTITY_FIELDS = (
+    "PartitionKey", "RowKey", "X", "Y", "Message", "LastLiked", "creationDate", "UserId", "Username"
+)
+COLUMNS = "partition, id, x, y, message, last_liked, creation_date, user_id, username"
+
+SELECT_ALL = f"SELECT {COLUMNS} FROM stars"
+SELECT_ONE = f"SELECT {COLUMNS} FROM stars WHERE id = ?"
+SELECT_ACTIVE = f"SELECT {COLUMNS} FROM stars WHERE last_liked >= ?"
+SELECT_BY_USER = f"SELECT {COLUMNS} FROM stars WHERE user_id = ?"
+# The R*Tree stores 32-bit floats rounded outwards, so it finds candidates
+# and the exact coordinates in the stars table decide
+SELECT_VIEWPORT = (
+    "SELECT " + ", ".join(f"s.{column.strip()}" for column in COLUMNS.split(",")) +
+    " FROM star_positions p JOIN stars s ON s.key = p.key"
+    " WHERE p.max_x >= ?1 AND p.min_x <= ?2 AND p.max_y >= ?3 AND p.min_y <= ?4"
+    " AND s.x BETWEEN ?1 AND ?2 AND s.y BETWEEN ?3 AND ?4"
+)
+INSERT = f"INSERT INTO stars ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+# Positions never change after creation; leaving x and y out of the SET
+# list keeps the R*Tree trigger from firing on every like
+UPDATE = "UPDATE stars SET message = ?, last_liked = ?, user_id = ?, username = ? WHERE id = ?"
+DELETE = "DELETE FROM stars WHERE id = ?"
+DELETE_EXPIRED = (
+    "DELETE FROM stars WHERE key IN (SELECT key FROM stars WHERE last_liked < ? LIMIT ?) RETURNING id"
+)
+
+def _to_entity(row: tuple) -> Dict[str, Any]:
+    return dict(zip(ENTITY_FIELDS, row))
+
+def _to_row(entity: Mapping[str, Any]) -> tuple:
+    get = entity.get
+    return (
+        entity["PartitionKey"], entity["RowKey"], entity["X"], entity["Y"], entity["Message"],
+        get("LastLiked"), get("creationDate"), get("UserId"), get("Username")
+    )
+
+class SqliteProvider:
+    """
+    DatabaseProvider storing stars in a local SQLite file.
+
+    Args:
+        path: Database file, created with its schema if missing
+        synchronous: PRAGMA synchronous; NORMAL is durable across process
+            crashes in WAL mode and only loses recent commits on power loss
+        busy_timeout: Seconds a connection waits for a lock held elsewhere
+        cache_size_mb: Page cache per connection
+    """
+
+    def __init__(self, path: str, synchronous: str = "NORMAL", busy_timeout: float = 5.0, cache_size_mb: int = 32):
+        self.path = path
+        self.synchronous = synchronous
+        self.busy_timeout = busy_timeout
+        self.cache_size_mb = cache_size_mb
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._writer: Optional[sqlite3.Connection] = None
+
+    # Connections
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit: each statement is its own transaction unless one is opened
+        connection = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        connection.execute(f"PRAGMA synchronous = {self.synchronous}")
+        connection.execute(f"PRAGMA cache_size = -{self.cache_size_mb * 1024}")
+        connection.execute("PRAGMA temp_store = MEMORY")
+        return connection
+
+    def open(self) -> "SqliteProvider":
+        """Create the database and schema if needed; call once before use"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        writer = self._connect()
+        try:
+            self._check_schema(writer)
+            mode = writer.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+            if mode.lower() != "wal":
+                logger.warning("SQLite database %s is in %s mode, not WAL; reads will wait for writes", self.path, mode)
+            writer.executescript(SCHEMA)
+            writer.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        except BaseException:
+            writer.close()
+            raise
+        self._writer = writer
+        logger.info("Opened SQLite star storage at %s", self.path)
+        return self
+
+    def _check_schema(self, connection: sqlite3.Connection) -> None:
+        """Refuse a database that some other program or schema version created"""
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            raise RuntimeError(
+                f"SQLite database {self.path} has star schema version {version}, this build expects {SCHEMA_VERSION}"
+            )
+        # Version 0 is a new file, or one with some other stars table
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(stars)")}
+        if columns and columns != TABLE_COLUMNS:
+            raise RuntimeError(
+                f"SQLite database {self.path} has a stars table with columns {sorted(columns)}, "
+                "not the star storage schema; set SQLITE_PATH to another file"
+            )
+
+    def close(self) -> None:
+        with self._readers_lock:
+            for connection in self._readers:
+                connection.close()
+            self._readers.clear()
+        # Connections of threads that are still alive must not be reused
+        self._local = threading.local()
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+    def import_stars(self, entities: Iterable[Mapping[str, Any]]) -> int:
+        """Load stars in one transaction, e.g. when moving off Table Storage; returns the count"""
+        rows = [_to_row(entity) for entity in entities]
+        with self._write_lock:
+            self._writer.execute("BEGIN")
+            try:
+                self._writer.executemany(INSERT, rows)
+            except BaseException:
+                self._writer.execute("ROLLBACK")
+                raise
+            self._writer.execute("COMMIT")
+        return len(rows)
+
+    def _reader(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._connect()
+            connection.execute("PRAGMA query_only = ON")
+            self._local.connection = connection
+            with self._readers_lock:
+                self._readers.append(connection)
+        return connection
+
+    # Calls
+
+    async def _run(self, operation: str, fn: Callable, *args) -> Any:
+        """Run a blocking database call in a worker thread within the request deadline"""
+        return await within_deadline(asyncio.to_thread(self._timed, operation, fn, *args))
+
+    @staticmethod
+    def _timed(operation: str, fn: Callable, *args) -> Any:
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        except Exception:
+            storage_errors.inc(TABLE, operation)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            storage_duration.observe(elapsed, TABLE, operation)
+            record_span("sqlite", start, elapsed)
+
+    def _select(self, operation: str, sql: str, *parameters) -> List[Dict[str, Any]]:
+        rows = self._reader().execute(sql, parameters).fetchall()
+        storage_entities.inc(TABLE, operation, amount=len(rows))
+        return [_to_entity(row) for row in rows]
+
+    def _write(self, sql: str, *parameters) -> int:
+        with self._write_lock:
+            return self._writer.execute(sql, parameters).rowcount
+
+    # DatabaseProvider
+
+    async def get_star(self, star_id: str) -> Optional[Dict[str, Any]]:
+        stars = await self._run("get_star", self._select, "get_star", SELECT_ONE, star_id)
+        return stars[0] if stars else None
+
+    async def list_stars(self) -> List[Dict[str, Any]]:
+        return await self._run("list_stars", self._select, "list_stars", SELECT_ALL)
+
+    async def active_stars(self, cutoff: float) -> List[Dict[str, Any]]:
+        return await self._run("active_stars", self._select, "active_stars", SELECT_ACTIVE, cutoff)
+
+    async def stars_by_user(self, user_id: str) -> List[Dict[str, Any]]:
+        return await self._run("stars_by_user", self._select, "stars_by_user", SELECT_BY_USER, user_id)
+
+    async def stars_in_viewport(self, x_min: float, y_min: float, x_max: float, y_max: float) -> List[Dict[str, Any]]:
+        return await self._run(
+            "stars_in_viewport", self._select, "stars_in_viewport", SELECT_VIEWPORT, x_min, x_max, y_min, y_max
+        )
+
+    async def create_star(self, entity: Mapping[str, Any]) -> None:
+        await self._run("create_star", self._write, INSERT, *_to_row(entity))
+
+    async def update_star(self, entity: Mapping[str, Any]) -> None:
+        get = entity.get
+        updated = await self._run(
+            "update_star", self._write, UPDATE,
+            entity["Message"], get("LastLiked"), get("UserId"), get("Username"), entity["RowKey"]
+        )
+        if not updated:
+            raise KeyError(f"Star {entity['RowKey']} does not exist")
+
+    async def delete_star(self, entity: Mapping[str, Any]) -> None:
+        await self._run("delete_star", self._write, DELETE, entity["RowKey"])
+
+    async def delete_expired(
+        self, cutoff: float, batch_size: int, pace: Callable[[int], Awaitable[None]]
+    ) -> List[str]:
+        deleted: List[str] = []
+        while True:
+            # Deleting in batches keeps each write transaction, and so the
+            # time other writers wait for the lock, short
+            await pace(batch_size)
+            ids = await self._run("delete_expired", self._delete_batch, cutoff, batch_size)
+            deleted.extend(ids)
+            if len(ids) < batch_size:
+                return deleted
+
+    def _delete_batch(self, cutoff: float, batch_size: int) -> List[str]:
+        with self._write_lock:
+            return [row[0] for row in self._writer.execute(DELETE_EXPIRED, (cutoff, batch_size)).fetchall()]
+
+    async def check(self) -> None:
+        await self._run("check", lambda: self._reader().execute("SELECT 1").fetchone())
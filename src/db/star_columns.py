@@ -0,0 +1,171 @@
+"""
+Columnar star store backed by NumPy arrays.
+Keeps x, y, last_liked and creation_date in parallel float arrays with a
+matching id array, so time-window, bounding-box and top-N queries are single
+vectorized passes instead of Python loops over entity dicts.
+
+The in-memory storage backend keeps one in step with its records when
+MEMORY_COLUMNAR is set, keyed by StarRecord.key. NumPy is an optional
+dependency; StarColumns raises ImportError without it.
+"""
+
+from typing import Any, Dict, Hashable, Iterable, List, Mapping, Optional
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency
+    np = None
+
+from src.models.star_record import StarRecord
+
+# Columns that can be filtered and ranked
+FLOAT_COLUMNS = ("x", "y", "last_liked", "creation_date")
+
+class StarColumns:
+    """
+    Parallel arrays of star attributes with O(1) append and delete.
+
+    Deleting swaps the last row into the freed slot, so row order is not
+    stable; query results are star ids, not row positions. Ids may be any
+    hashable key, such as the packed StarRecord.key.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        if np is None:
+            raise ImportError("numpy is required for the columnar star store")
+        capacity = max(capacity, 1)
+        self._size = 0
+        self._index: Dict[Hashable, int] = {}
+        self._ids = np.empty(capacity, dtype=object)
+        self._columns = {name: np.empty(capacity, dtype=np.float64) for name in FLOAT_COLUMNS}
+
+    @classmethod
+    def from_entities(cls, entities: Iterable[Mapping[str, Any]]) -> "StarColumns":
+        """Build a store from Stars table entities"""
+        entities = list(entities)
+        store = cls(capacity=len(entities))
+        for entity in entities:
+            store.append(
+                entity["RowKey"],
+                entity["X"],
+                entity["Y"],
+                entity.get("LastLiked"),
+                entity.get("creationDate")
+            )
+        return store
+
+    @classmethod
+    def from_records(cls, records: Iterable[StarRecord]) -> "StarColumns":
+        """Build a store from StarRecords"""
+        records = list(records)
+        store = cls(capacity=len(records))
+        for record in records:
+            store.append(record.id, record.x, record.y, record.last_liked, record.creation_date)
+        return store
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, star_id: Hashable) -> bool:
+        return star_id in self._index
+
+    def column(self, name: str) -> "np.ndarray":
+        """Read-only view of the live rows of a float column"""
+        view = self._columns[name][:self._size]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def ids(self) -> "np.ndarray":
+        return self._ids[:self._size]
+
+    def _grow(self) -> None:
+        capacity = len(self._ids) * 2
+        ids = np.empty(capacity, dtype=object)
+        ids[:self._size] = self._ids[:self._size]
+        self._ids = ids
+        for name, values in self._columns.items():
+            grown = np.empty(capacity, dtype=np.float64)
+            grown[:self._size] = values[:self._size]
+            self._columns[name] = grown
+
+    def append(
+        self,
+        star_id: Hashable,
+        x: float,
+        y: float,
+        last_liked: Optional[float] = None,
+        creation_date: Optional[float] = None
+    ) -> None:
+        """Add a star, or overwrite it if the id is already present"""
+        row = self._index.get(star_id)
+        if row is None:
+            if self._size == len(self._ids):
+                self._grow()
+            row = self._size
+            self._size += 1
+            self._index[star_id] = row
+            self._ids[row] = star_id
+        columns = self._columns
+        columns["x"][row] = x
+        columns["y"][row] = y
+        # Missing timestamps become NaN, which never matches a comparison
+        columns["last_liked"][row] = np.nan if last_liked is None else last_liked
+        columns["creation_date"][row] = np.nan if creation_date is None else creation_date
+
+    def set_last_liked(self, star_id: Hashable, last_liked: float) -> bool:
+        """Update a star's last_liked time; returns False if it is unknown"""
+        row = self._index.get(star_id)
+        if row is None:
+            return False
+        self._columns["last_liked"][row] = last_liked
+        return True
+
+    def delete(self, star_id: Hashable) -> bool:
+        """Remove a star; returns False if it is unknown"""
+        row = self._index.pop(star_id, None)
+        if row is None:
+            return False
+        last = self._size - 1
+        if row != last:
+            moved_id = self._ids[last]
+            self._ids[row] = moved_id
+            self._index[moved_id] = row
+            for values in self._columns.values():
+                values[row] = values[last]
+        self._ids[last] = None
+        self._size = last
+        return True
+
+    def delete_many(self, star_ids: Iterable[Hashable]) -> int:
+        """Remove several stars; returns how many were present"""
+        return sum(1 for star_id in star_ids if self.delete(star_id))
+
+    def _select(self, mask: "np.ndarray") -> List[Hashable]:
+        return self._ids[:self._size][mask].tolist()
+
+    def active_since(self, cutoff: float) -> List[Hashable]:
+        """Ids of stars liked at or after cutoff"""
+        return self._select(self.column("last_liked") >= cutoff)
+
+    def expired_before(self, cutoff: float, column: str = "last_liked") -> List[Hashable]:
+        """Ids of stars whose column value is older than cutoff"""
+        return self._select(self.column(column) < cutoff)
+
+    def in_bbox(self, x_min: float, y_min: float, x_max: float, y_max: float) -> List[Hashable]:
+        """Ids of stars inside the inclusive bounding box"""
+        x = self.column("x")
+        y = self.column("y")
+        return self._select((x >= x_min) & (x <= x_max) & (y >= y_min) & (y <= y_max))
+
+    def top_n(self, n: int, column: str = "last_liked") -> List[Hashable]:
+        """Ids of the n stars with the largest column value, largest first"""
+        values = self.column(column)
+        if n <= 0 or not len(values):
+            return []
+        # NaN sorts as largest in NumPy, so rank missing values lowest
+        values = np.where(np.isnan(values), -np.inf, values)
+        n = min(n, len(values))
+        top = np.argpartition(values, len(values) - n)[len(values) - n:]
+        top = top[np.argsort(values[top])[::-1]]
+        return self._ids[top].tolist()
@@ -0,0 +1,550 @@
+"""
+Local stand-in for an Azure Table.
+Behaves like azure.data.tables.TableClient for the operations this service
+uses: point reads, inserts, MERGE and REPLACE updates and upserts with ETag
+conditions, deletes, paged list and query calls with continuation tokens, a
+subset of OData filters, select projections and single-partition
+transactions. Every round trip, each page of a listing included, can be
+given latency drawn from a distribution and a chance of failing with 503,
+so storage-layer changes can be measured and their failure paths tested
+without Azure or Azurite.
+
+Entities are kept in (PartitionKey, RowKey) order, as the service returns
+them. Property values are stored and returned as given, without the EDM
+type conversion the SDK applies.
+"""
+
+import bisect
+import datetime as dt
+import itertools
+import math
+import random
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple, Union
+
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    HttpResponseError, ResourceExistsError, ResourceModifiedError, ResourceNotFoundError,
+    ServiceResponseTimeoutError
+)
+from azure.data.tables import TableEntity, TableTransactionError, UpdateMode
+
+# Service limits
+MAX_PAGE_SIZE = 1000
+MAX_TRANSACTION_OPERATIONS = 100
+
+Key = Tuple[str, str]
+
+class Latency:
+    """
+    Log-normal latency given by its median and 99th percentile, in milliseconds.
+
+    Storage latency is skewed: most calls take about the median and a few
+    take many times longer, which a log-normal distribution reproduces.
+    """
+
+    def __init__(self, median_ms: float, p99_ms: Optional[float] = None):
+        self.median = median_ms / 1000
+        p99 = (p99_ms if p99_ms is not None else median_ms) / 1000
+        # 2.326 is the standard normal's 99th percentile
+        self.sigma = math.log(p99 / self.median) / 2.326 if p99 > self.median else 0.0
+
+    def sample(self, rng: random.Random) -> float:
+        if self.sigma == 0.0:
+            return self.median
+        return self.median * math.exp(rng.gauss(0.0, self.sigma))
+
+def _error(cls, status: int, code: str, message: str):
+    error = cls(message=f"{message}\nErrorCode:{code}")
+    error.status_code = status
+    error.error_code = code
+    return error
+
+class _Missing:
+    """A property the entity does not have; every comparison with it is false"""
+
+MISSING = _Missing()
+
+_NUMBERS = frozenset({int, float})
+
+# OData filter subset: comparisons joined by and/or/not with parentheses.
+# Operands are property names, @parameters and string, number, boolean,
+# datetime'...' and guid'...' literals.
+_TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<lparen>\() | (?P<rparen>\)) |
+        (?P<datetime>datetime'(?P<datetime_value>[^']*)') |
+        (?P<guid>guid'(?P<guid_value>[^']*)') |
+        (?P<string>'(?P<string_value>(?:[^']|'')*)') |
+        (?P<number>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)L? |
+        (?P<param>@\w+) |
+        (?P<word>\w+)
+    )""", re.VERBOSE)
+
+_COMPARISONS: Dict[str, Callable[[Any, Any], bool]] = {
+    "eq": lambda a, b: a == b,
+    "ne": lambda a, b: a != b,
+    "gt": lambda a, b: a > b,
+    "ge": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "le": lambda a, b: a <= b,
+}
+
+Operand = Callable[[Mapping[str, Any], Mapping[str, Any]], Any]
+Predicate = Callable[[Mapping[str, Any], Mapping[str, Any]], bool]
+
+def _tokenize(text: str) -> List[Tuple[str, Any]]:
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None or match.end() == position:
+            raise ValueError(f"Unsupported filter syntax at {text[position:]!r}")
+        position = match.end()
+        kind = match.lastgroup
+        if kind == "datetime":
+            value = dt.datetime.fromisoformat(match.group("datetime_value").replace("Z", "+00:00"))
+        elif kind == "guid":
+            value = match.group("guid_value")
+        elif kind == "string":
+            value = match.group("string_value").replace("''", "'")
+        elif kind == "number":
+            number = match.group("number")
+            value = float(number) if any(c in number for c in ".eE") else int(number)
+        else:
+            value = match.group(kind)
+        tokens.append((kind if kind not in ("datetime", "guid", "string", "number") else "literal", value))
+    return tokens
+
+class _FilterParser:
+    """Recursive-descent parser compiling a filter into a predicate"""
+
+    def __init__(self, text: str):
+        self.tokens = _tokenize(text)
+        self.position = 0
+        # Operands PartitionKey and RowKey must equal for the whole filter to match, if any
+        self.partition: Optional[Operand] = None
+        self.row: Optional[Operand] = None
+
+    def parse(self) -> Predicate:
+        predicate = self._or(top=True)
+        if self.position != len(self.tokens):
+            raise ValueError(f"Unexpected {self.tokens[self.position][1]!r} in filter")
+        return predicate
+
+    def _peek_word(self) -> Optional[str]:
+        if self.position < len(self.tokens) and self.tokens[self.position][0] == "word":
+            return self.tokens[self.position][1].lower()
+        return None
+
+    def _next(self) -> Tuple[str, Any]:
+        if self.position >= len(self.tokens):
+            raise ValueError("Filter ended unexpectedly")
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def _or(self, top: bool = False) -> Predicate:
+        terms = [self._and(top)]
+        while self._peek_word() == "or":
+            self.position += 1
+            terms.append(self._and())
+        if len(terms) == 1:
+            return terms[0]
+        if top:
+            # A key bound on one side of an or bounds nothing
+            self.partition = None
+            self.row = None
+        return lambda entity, params: any(term(entity, params) for term in terms)
+
+    def _and(self, top: bool = False) -> Predicate:
+        terms = [self._not(top)]
+        while self._peek_word() == "and":
+            self.position += 1
+            terms.append(self._not(top))
+        if len(terms) == 1:
+            return terms[0]
+        return lambda entity, params: all(term(entity, params) for term in terms)
+
+    def _not(self, top: bool = False) -> Predicate:
+        if self._peek_word() == "not":
+            self.position += 1
+            term = self._not()
+            return lambda entity, params: not term(entity, params)
+        return self._primary(top)
+
+    def _primary(self, top: bool) -> Predicate:
+        if self.position < len(self.tokens) and self.tokens[self.position][0] == "lparen":
+            self.position += 1
+            predicate = self._or()
+            if self._next()[0] != "rparen":
+                raise ValueError("Missing closing parenthesis in filter")
+            return predicate
+        left_token = self.tokens[self.position] if self.position < len(self.tokens) else None
+        left = self._operand()
+        op = self._next()
+        if op[0] != "word" or op[1].lower() not in _COMPARISONS:
+            raise ValueError(f"Unsupported comparison {op[1]!r} in filter")
+        right = self._operand()
+        if top and op[1].lower() == "eq" and left_token == ("word", "PartitionKey"):
+            self.partition = right
+        elif top and op[1].lower() == "eq" and left_token == ("word", "RowKey"):
+            self.row = right
+        compare = _COMPARISONS[op[1].lower()]
+
+        def predicate(entity, params):
+            a = left(entity, params)
+            b = right(entity, params)
+            if a is MISSING or b is MISSING:
+                return False
+            # The service only compares values of the same type
+            if type(a) is not type(b) and not (type(a) in _NUMBERS and type(b) in _NUMBERS):
+                return False
+            return compare(a, b)
+        return predicate
+
+    def _operand(self) -> Operand:
+        kind, value = self._next()
+        if kind == "literal":
+            return lambda entity, params: value
+        if kind == "param":
+            name = value[1:]
+
+            def parameter(entity, params):
+                try:
+                    return params[name]
+                except KeyError:
+                    raise ValueError(f"No value given for filter parameter @{name}") from None
+            return parameter
+        if kind == "word":
+            lowered = value.lower()
+            if lowered in ("true", "false"):
+                return lambda entity, params: lowered == "true"
+            return lambda entity, params: entity.get(value, MISSING)
+        raise ValueError(f"Unexpected {value!r} in filter")
+
+@lru_cache(maxsize=256)
+def compile_filter(query_filter: str) -> Tuple[Predicate, Optional[Operand], Optional[Operand]]:
+    """Compile a filter into a predicate and the PartitionKey and RowKey operands it pins, if any"""
+    parser = _FilterParser(query_filter)
+    predicate = parser.parse()
+    return predicate, parser.partition, parser.row
+
+class _PageIterator:
+    """Iterator over result pages with the service's continuation token"""
+
+    def __init__(self, fetch: Callable, continuation_token: Optional[Dict[str, str]]):
+        self._fetch = fetch
+        self.continuation_token = continuation_token
+        self._done = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Iterator[TableEntity]:
+        if self._done:
+            raise StopIteration
+        page, self.continuation_token = self._fetch(self.continuation_token)
+        self._done = self.continuation_token is None
+        return iter(page)
+
+class _Paged:
+    """Result of list_entities and query_entities; each page is one round trip"""
+
+    def __init__(self, fetch: Callable):
+        self._fetch = fetch
+
+    def by_page(self, continuation_token: Optional[Dict[str, str]] = None) -> _PageIterator:
+        return _PageIterator(self._fetch, continuation_token)
+
+    def __iter__(self) -> Iterator[TableEntity]:
+        for page in self.by_page():
+            yield from page
+
+class LocalTableClient:
+    """
+    In-process table with the TableClient interface.
+
+    Args:
+        table_name: Name reported in errors, as in the real client
+        latency: Latency of every round trip, or per operation name
+            ("get_entity", "query_entities", ...); operations not listed
+            take no time. A listing pays it once per page.
+        throttle_rate: Share of round trips failing with 503 ServerBusy,
+            as when the SDK's retries did not outlast the throttling
+        seed: Seed for latency and throttling draws, for repeatable runs
+    """
+
+    def __init__(
+        self,
+        table_name: str,
+        latency: Union[Latency, Mapping[str, Latency], None] = None,
+        throttle_rate: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        self.table_name = table_name
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._rows: Dict[Key, Tuple[Dict[str, Any], str, dt.datetime]] = {}
+        self._keys: List[Key] = []
+        # Partitions holding each RowKey, so lookups by id skip the scan.
+        # The service scans for those, but its cost is what latency models.
+        self._partitions_by_row: Dict[str, Set[str]] = {}
+        self._versions = itertools.count(1)
+        self.calls: Dict[str, int] = {}
+
+    # Round trips
+
+    def _round_trip(self, operation: str, timeout: Optional[int] = None, read_timeout: Optional[float] = None) -> None:
+        """
+        Pay one call's latency, then maybe throttle it.
+
+        As with the SDK, `timeout` is the whole seconds the service may
+        spend before answering 500 OperationTimedOut, and `read_timeout`
+        is how long the client waits for a response.
+        """
+        latency = self.latency.get(operation) if isinstance(self.latency, Mapping) else self.latency
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+            delay = latency.sample(self._rng) if latency is not None else 0.0
+            throttled = self.throttle_rate > 0 and self._rng.random() < self.throttle_rate
+        if read_timeout is not None and delay > read_timeout and (timeout is None or timeout > read_timeout):
+            time.sleep(read_timeout)
+            raise ServiceResponseTimeoutError(f"{operation} on {self.table_name} timed out after {read_timeout:.3f}s")
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise _error(HttpResponseError, 500, "OperationTimedOut",
+                         "Operation could not be completed within the specified time.")
+        if delay:
+            time.sleep(delay)
+        if throttled:
+            raise _error(HttpResponseError, 503, "ServerBusy", "The server is busy.")
+
+    # Rows
+
+    def _stamp(self) -> Tuple[str, dt.datetime]:
+        return f'W/"{next(self._versions)}"', dt.datetime.now(dt.timezone.utc)
+
+    def _entity(self, key: Key, select: Optional[Iterable[str]] = None) -> TableEntity:
+        properties, etag, timestamp = self._rows[key]
+        if select is not None:
+            entity = TableEntity({name: properties[name] for name in select if name in properties})
+        else:
+            entity = TableEntity(properties)
+        entity._metadata = {"etag": etag, "timestamp": timestamp}
+        return entity
+
+    @staticmethod
+    def _key(entity: Mapping[str, Any]) -> Key:
+        try:
+            return entity["PartitionKey"], entity["RowKey"]
+        except KeyError:
+            raise ValueError("PartitionKey and RowKey must be specified") from None
+
+    def _write(self, rows: Dict[Key, Any], key: Key, properties: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Store or, with None, remove a row in `rows` and return the response metadata"""
+        if properties is None:
+            rows[key] = None
+            return {}
+        etag, timestamp = self._stamp()
+        rows[key] = (properties, etag, timestamp)
+        return {"etag": etag, "date": timestamp}
+
+    def _current(self, staged: Dict[Key, Any], key: Key):
+        if key in staged:
+            return staged[key]
+        return self._rows.get(key)
+
+    def _check_etag(self, row, etag: Optional[str], match_condition: Optional[MatchConditions]) -> None:
+        if match_condition == MatchConditions.IfNotModified and row[1] != etag:
+            raise _error(ResourceModifiedError, 412, "UpdateConditionNotSatisfied",
+                         "The update condition specified in the request was not satisfied.")
+
+    def _apply(self, staged: Dict[Key, Any], operation: str, entity: Mapping[str, Any],
+               mode: UpdateMode = UpdateMode.MERGE, etag: Optional[str] = None,
+               match_condition: Optional[MatchConditions] = None) -> Dict[str, Any]:
+        """Apply one write to `staged`, reading through to the committed rows"""
+        key = self._key(entity)
+        row = self._current(staged, key)
+        if match_condition is not None and etag is None and isinstance(entity, TableEntity):
+            etag = entity.metadata.get("etag")
+        properties = {name: value for name, value in entity.items()}
+
+        if operation == "create":
+            if row is not None:
+                raise _error(ResourceExistsError, 409, "EntityAlreadyExists", "The specified entity already exists.")
+            return self._write(staged, key, properties)
+        if operation == "delete":
+            if row is None:
+                raise _error(ResourceNotFoundError, 404, "ResourceNotFound",
+                             "The specified resource does not exist.")
+            self._check_etag(row, etag, match_condition)
+            return self._write(staged, key, None)
+        if operation in ("update", "upsert"):
+            if row is None:
+                if operation == "update":
+                    raise _error(ResourceNotFoundError, 404, "ResourceNotFound",
+                                 "The specified resource does not exist.")
+            else:
+                self._check_etag(row, etag, match_condition)
+                if mode == UpdateMode.MERGE:
+                    properties = {**row[0], **properties}
+            return self._write(staged, key, properties)
+        raise ValueError(f"Unknown transaction operation: {operation}")
+
+    def _commit(self, staged: Dict[Key, Any]) -> None:
+        for key, row in staged.items():
+            exists = key in self._rows
+            if row is None:
+                if exists:
+                    del self._rows[key]
+                    del self._keys[bisect.bisect_left(self._keys, key)]
+                    partitions = self._partitions_by_row[key[1]]
+                    partitions.discard(key[0])
+                    if not partitions:
+                        del self._partitions_by_row[key[1]]
+            else:
+                self._rows[key] = row
+                if not exists:
+                    bisect.insort(self._keys, key)
+                    self._partitions_by_row.setdefault(key[1], set()).add(key[0])
+
+    def _write_one(self, operation: str, entity: Mapping[str, Any], timeout: Optional[int] = None,
+                   read_timeout: Optional[float] = None, **options) -> Dict[str, Any]:
+        self._round_trip(f"{operation}_entity", timeout, read_timeout)
+        with self._lock:
+            staged: Dict[Key, Any] = {}
+            metadata = self._apply(staged, operation, entity, **options)
+            self._commit(staged)
+        return metadata
+
+    # TableClient operations
+
+    def create_entity(self, entity: Mapping[str, Any], *, timeout: Optional[int] = None,
+                      **kwargs) -> Dict[str, Any]:
+        return self._write_one("create", entity, timeout, kwargs.get("read_timeout"))
+
+    def update_entity(self, entity: Mapping[str, Any], mode: UpdateMode = UpdateMode.MERGE, *,
+                      etag: Optional[str] = None, match_condition: Optional[MatchConditions] = None,
+                      timeout: Optional[int] = None, **kwargs) -> Dict[str, Any]:
+        return self._write_one("update", entity, timeout, kwargs.get("read_timeout"), mode=mode, etag=etag, match_condition=match_condition)
+
+    def upsert_entity(self, entity: Mapping[str, Any], mode: UpdateMode = UpdateMode.MERGE, *,
+                      etag: Optional[str] = None, match_condition: Optional[MatchConditions] = None,
+                      timeout: Optional[int] = None, **kwargs) -> Dict[str, Any]:
+        return self._write_one("upsert", entity, timeout, kwargs.get("read_timeout"), mode=mode, etag=etag, match_condition=match_condition)
+
+    def delete_entity(self, *args, etag: Optional[str] = None, match_condition: Optional[MatchConditions] = None,
+                      timeout: Optional[int] = None, **kwargs) -> None:
+        """Delete by entity or by partition and row key; deleting a missing entity is not an error"""
+        read_timeout = kwargs.pop("read_timeout", None)
+        entity = kwargs.pop("entity", None) or (args[0] if args and isinstance(args[0], Mapping) else None)
+        if entity is None:
+            partition_key = args[0] if len(args) > 0 else kwargs.pop("partition_key")
+            row_key = args[1] if len(args) > 1 else kwargs.pop("row_key")
+            entity = {"PartitionKey": partition_key, "RowKey": row_key}
+        try:
+            self._write_one("delete", entity, timeout, read_timeout, etag=etag, match_condition=match_condition)
+        except ResourceNotFoundError:
+            return
+
+    def get_entity(self, partition_key: str, row_key: str, *, select: Optional[Iterable[str]] = None,
+                   timeout: Optional[int] = None, **kwargs) -> TableEntity:
+        self._round_trip("get_entity", timeout, kwargs.get("read_timeout"))
+        with self._lock:
+            if (partition_key, row_key) not in self._rows:
+                raise _error(ResourceNotFoundError, 404, "ResourceNotFound",
+                             "The specified resource does not exist.")
+            return self._entity((partition_key, row_key), select)
+
+    def list_entities(self, *, select: Optional[Iterable[str]] = None, results_per_page: Optional[int] = None,
+                      timeout: Optional[int] = None, **kwargs) -> _Paged:
+        return self._pages("list_entities", None, {}, select, results_per_page, timeout, kwargs.get("read_timeout"))
+
+    def query_entities(self, query_filter: str, *, parameters: Optional[Mapping[str, Any]] = None,
+                       select: Optional[Iterable[str]] = None, results_per_page: Optional[int] = None,
+                       timeout: Optional[int] = None, **kwargs) -> _Paged:
+        # Invalid filters fail when the query is made, as with the service
+        compile_filter(query_filter)
+        return self._pages(
+            "query_entities", query_filter, parameters or {}, select, results_per_page, timeout, kwargs.get("read_timeout")
+        )
+
+    def submit_transaction(self, operations: Iterable[tuple], *, timeout: Optional[int] = None,
+                           **kwargs) -> List[Dict[str, Any]]:
+        """Apply up to 100 operations on one partition atomically"""
+        operations = list(operations)
+        if not operations:
+            return []
+        partitions = {self._key(operation[1])[0] for operation in operations}
+        if len(partitions) > 1:
+            raise ValueError("Partition Keys in the batch must all be the same.")
+        if len(operations) > MAX_TRANSACTION_OPERATIONS:
+            raise _error(TableTransactionError, 400, "InvalidInput",
+                         f"0:The batch request contains more than {MAX_TRANSACTION_OPERATIONS} operations.")
+        self._round_trip("submit_transaction", timeout, kwargs.get("read_timeout"))
+        with self._lock:
+            staged: Dict[Key, Any] = {}
+            results = []
+            for index, operation in enumerate(operations):
+                name, entity = operation[0], operation[1]
+                options = dict(operation[2]) if len(operation) > 2 else {}
+                if self._key(entity) in staged:
+                    raise _error(TableTransactionError, 400, "InvalidDuplicateRow",
+                                 f"{index}:The batch request contains multiple changes with same row key.")
+                try:
+                    results.append(self._apply(staged, name, entity, **options))
+                except HttpResponseError as e:
+                    # The whole batch is rejected; nothing is committed
+                    raise _error(TableTransactionError, e.status_code, e.error_code, f"{index}:{e.message}") from e
+            self._commit(staged)
+        return results
+
+    # Paging
+
+    def _pages(self, operation: str, query_filter: Optional[str], parameters: Mapping[str, Any],
+               select: Optional[Iterable[str]], results_per_page: Optional[int], timeout: Optional[int],
+               read_timeout: Optional[float]) -> _Paged:
+        page_size = min(results_per_page or MAX_PAGE_SIZE, MAX_PAGE_SIZE)
+        select = list(select) if select is not None else None
+        predicate, partition_operand, row_operand = compile_filter(query_filter) if query_filter else (None, None, None)
+        partition = partition_operand({}, parameters) if partition_operand is not None else None
+        if partition is MISSING:
+            partition = None
+        row = row_operand({}, parameters) if row_operand is not None else None
+
+        def fetch(token: Optional[Dict[str, str]]):
+            self._round_trip(operation, timeout, read_timeout)
+            with self._lock:
+                start = (token["PartitionKey"], token["RowKey"]) if token else ("", "")
+                if isinstance(row, str) and not isinstance(partition, str):
+                    keys = sorted((pk, row) for pk in self._partitions_by_row.get(row, ()) if (pk, row) >= start)
+                    return [self._entity(key, select) for key in keys
+                            if predicate(self._rows[key][0], parameters)], None
+                keys, rows = self._keys, self._rows
+                end = len(keys)
+                if isinstance(partition, str):
+                    start = max(start, (partition, ""))
+                    # Sorts after every key in the partition
+                    end = bisect.bisect_left(keys, (partition + "\0",))
+                index = bisect.bisect_left(keys, start)
+                page = []
+                while index < end and len(page) < page_size:
+                    key = keys[index]
+                    index += 1
+                    if predicate is None or predicate(rows[key][0], parameters):
+                        page.append(self._entity(key, select))
+                if index < end:
+                    return page, {"PartitionKey": keys[index][0], "RowKey": keys[index][1]}
+                return page, None
+
+        return _Paged(fetch)
+
+    def __len__(self) -> int:
+        return len(self._rows)
@@ -0,0 +1,236 @@
+"""
+Global mutation version and change journal for the Stars table.
+Every create, like, dislike and delete bumps the version. It is kept in Redis
+so all replicas agree; without Redis each replica falls back to a local
+counter whose epoch is unique to the process, so versions from different
+sources never compare equal.
+
+Mutations can record what they changed together with the bump. The journal
+keeps the most recent API_CHANGES_RETENTION changes, scored by version, and
+lets clients catch up with get_changes_since instead of refetching all stars.
+"""
+
+import json
+import logging
+import re
+import time
+import uuid
+from collections import deque
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from src.config.settings import settings
+from src.db.redis_cache import is_cache_initialized, get_redis_client
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "stars:version"
+JOURNAL_KEY = "stars:changes"
+
+# Epoch used by versions that come from the shared Redis counter
+REDIS_EPOCH = "g"
+
+# Writes handled by other replicas never move a local counter, so an ETag
+# built from one changes with this time bucket (seconds) as well
+LOCAL_ETAG_SECONDS = 5
+
+# Bumps the version and journals the changes atomically. Trimming removes
+# whole versions so a version in the journal always has all of its changes.
+RECORD_CHANGES_SCRIPT = """
+local version = redis.call('INCR', KEYS[1])
+for i = 2, #ARGV do
+    redis.call('ZADD', KEYS[2], version, string.format('%d:%06d:%s', version, i - 1, ARGV[i]))
+end
+local excess = redis.call('ZCARD', KEYS[2]) - tonumber(ARGV[1])
+if excess > 0 then
+    local cut = redis.call('ZRANGE', KEYS[2], excess - 1, excess - 1, 'WITHSCORES')[2]
+    redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', cut)
+end
+return version
+"""
+
+# "<epoch>.<number>", then a local ETag's "~<time bucket>" and a derived
+# response's "-<suffix>" such as /stars/active's "-a<bucket>"
+_VERSION_PATTERN = re.compile(r"([0-9A-Za-z]+)\.(\d+)(?:~\d+)?(?:-\w+)?")
+
+class StarVersion(NamedTuple):
+    """A mutation version: the counter it came from and its value"""
+    epoch: str
+    number: int
+
+    def __str__(self) -> str:
+        return f"{self.epoch}.{self.number}"
+
+    def etag(self, suffix: str = "") -> str:
+        """
+        Quoted ETag for a response derived from this version.
+
+        A local version's ETag also carries the current time bucket, so a
+        client revalidating against one replica picks up other replicas'
+        writes within LOCAL_ETAG_SECONDS. parse() accepts the ETag back.
+        """
+        tag = str(self)
+        if not self.shared:
+            tag += f"~{int(time.time() // LOCAL_ETAG_SECONDS)}"
+        return f'"{tag}{suffix}"'
+
+    @property
+    def shared(self) -> bool:
+        """Whether the version comes from the counter every replica sees"""
+        return self.epoch == REDIS_EPOCH
+
+    @classmethod
+    def parse(cls, value: str) -> "StarVersion":
+        """Read a version, or any ETag built from one, back"""
+        match = _VERSION_PATTERN.fullmatch(value.strip().strip('"'))
+        if match is None:
+            raise ValueError(f"Invalid version: {value}")
+        return cls(match.group(1), int(match.group(2)))
+
+class ChangesTooOld(Exception):
+    """The journal no longer covers every change after the requested version"""
+
+    def __init__(self, version: StarVersion):
+        super().__init__(f"Changes are not retained back to this version, current version is {version}")
+        self.version = version
+
+def star_change(op: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a journal entry for a create, update or delete; `data` must hold the star id"""
+    return {"op": op, **data}
+
+# Fallback counter for when Redis is unavailable
+_local_epoch = uuid.uuid4().hex[:8]
+_local_number = 0
+# Mutations recorded locally that the shared counter has not seen yet
+_missed_bumps = 0
+# Local journal of (version number, change), and the newest version that was
+# partly or fully evicted from it
+_local_journal: deque = deque(maxlen=settings.API.CHANGES_RETENTION)
+_local_floor = 0
+
+def _redis():
+    return get_redis_client("counters")
+
+async def _replay_missed_bumps(redis) -> None:
+    """Make the shared counter move past mutations made while Redis was down"""
+    global _missed_bumps
+    if _missed_bumps:
+        missed, _missed_bumps = _missed_bumps, 0
+        try:
+            await redis.incrby(VERSION_KEY, missed)
+        except Exception:
+            _missed_bumps += missed
+            raise
+
+async def get_version() -> StarVersion:
+    """Return the current mutation version"""
+    if is_cache_initialized("counters"):
+        try:
+            redis = _redis()
+            await _replay_missed_bumps(redis)
+            number = await redis.get(VERSION_KEY)
+            return StarVersion(REDIS_EPOCH, int(number or 0))
+        except Exception as e:
+            logger.warning(f"Failed to read star version from Redis: {str(e)}")
+    return StarVersion(_local_epoch, _local_number)
+
+def _record_local(changes: List[Dict[str, Any]]) -> StarVersion:
+    global _local_number, _missed_bumps, _local_floor
+    _missed_bumps += 1
+    _local_number += 1
+    for change in changes:
+        if len(_local_journal) == _local_journal.maxlen:
+            _local_floor = _local_journal[0][0]
+        _local_journal.append((_local_number, change))
+    return StarVersion(_local_epoch, _local_number)
+
+async def bump_version(changes: Optional[List[Dict[str, Any]]] = None) -> StarVersion:
+    """
+    Record a mutation and return the new version.
+
+    `changes` are journal entries built with star_change. A bump without
+    changes leaves a gap in the journal, so clients behind it must resync.
+    """
+    if is_cache_initialized("counters"):
+        try:
+            redis = _redis()
+            await _replay_missed_bumps(redis)
+            if not changes:
+                return StarVersion(REDIS_EPOCH, int(await redis.incr(VERSION_KEY)))
+            number = await redis.eval(
+                RECORD_CHANGES_SCRIPT, 2, VERSION_KEY, JOURNAL_KEY,
+                settings.API.CHANGES_RETENTION,
+                *(json.dumps(change, separators=(",", ":")) for change in changes)
+            )
+            return StarVersion(REDIS_EPOCH, int(number))
+        except Exception as e:
+            logger.warning(f"Failed to bump star version in Redis: {str(e)}")
+    return _record_local(changes or [])
+
+def coalesce_changes(entries: List[tuple]) -> List[Dict[str, Any]]:
+    """
+    Reduce ordered (version, change) pairs to one change per star.
+
+    Later updates are merged into an earlier create, and a delete replaces
+    whatever came before it.
+    """
+    latest: Dict[str, Dict[str, Any]] = {}
+    for _, change in entries:
+        star_id = change["id"]
+        previous = latest.pop(star_id, None)
+        if previous is not None and change["op"] == "update" and previous["op"] != "delete":
+            change = {**previous, **change, "op": previous["op"]}
+        # Re-inserting keeps the result ordered by each star's last change
+        latest[star_id] = change
+    return list(latest.values())
+
+def _check_contiguous(since: int, current: int, entries: List[tuple], version: StarVersion) -> None:
+    """Every version after `since` must have its changes in the journal"""
+    expected = since + 1
+    for number, _ in entries:
+        if number > expected:
+            raise ChangesTooOld(version)
+        expected = number + 1
+    if expected <= current:
+        raise ChangesTooOld(version)
+
+async def _redis_entries_since(redis, since: int) -> List[tuple]:
+    members = await redis.zrangebyscore(JOURNAL_KEY, f"({since}", "+inf")
+    entries = []
+    for member in members:
+        if isinstance(member, bytes):
+            member = member.decode()
+        number, _, rest = member.split(":", 2)
+        entries.append((int(number), json.loads(rest)))
+    return entries
+
+async def get_changes_since(since: StarVersion) -> Dict[str, Any]:
+    """
+    Return {"version", "changes"} with every change after `since`.
+
+    Raises ChangesTooOld when `since` comes from another epoch, is ahead of
+    the current version, or is older than the journal retains.
+    """
+    version = await get_version()
+    if since.epoch != version.epoch or since.number > version.number:
+        raise ChangesTooOld(version)
+    if since.number == version.number:
+        return {"version": str(version), "changes": []}
+
+    if version.epoch == REDIS_EPOCH:
+        try:
+            entries = await _redis_entries_since(_redis(), since.number)
+        except Exception as e:
+            logger.warning(f"Failed to read star changes from Redis: {str(e)}")
+            raise ChangesTooOld(version) from e
+    else:
+        if since.number < _local_floor:
+            raise ChangesTooOld(version)
+        entries = [entry for entry in _local_journal if entry[0] > since.number]
+
+    # Changes recorded after the version was read are returned as well
+    current = max(version.number, entries[-1][0] if entries else 0)
+    _check_contiguous(since.number, current, entries, version)
+    return {
+        "version": str(StarVersion(version.epoch, current)),
+        "changes": coalesce_changes(entries)
+    }
@@ -1 +1 @@
-# Dependencies package
+# Dependencies package
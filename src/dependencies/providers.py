@@ -1,28 +1,112 @@
-from typing import Optional, Protocol
-from fastapi import Depends
-from fastapi_cache import FastAPICache
-
-from src.config.settings import settings
-from src.db.redis_cache import is_cache_initialized
-
-# Database provider interface
-class DatabaseProvider(Protocol):
-    async def get_star(self, star_id: str):
-        ...
-    
-    async def create_star(self, star_data):
-        ...
-    
-    # Define other operations
-
-# Dependency injection
-def get_redis():
-    """Dependency to get Redis client if available"""
-    if is_cache_initialized():
-        return FastAPICache.get_backend().client
-    return None
-
-def get_table_storage():
-    """Dependency to get Table Storage client"""
-    from src.db.azure_tables import tables
-    return tables
+import logging
+from typing import Any, Awaitable, Callable, List, Mapping, Optional, Protocol
+from fastapi import Depends
+
+from src.config.settings import settings
+from src.db.azure_tables import TableStorageProvider, init_tables
+from src.db.memory_store import MemoryProvider
+from src.db.redis_cache import is_cache_initialized, get_redis_client
+from src.db.sqlite_provider import SqliteProvider
+
+logger = logging.getLogger(__name__)
+
+# Database provider interface
+class DatabaseProvider(Protocol):
+    """
+    Star storage used by the routes and the garbage collector.
+
+    Stars are passed as mappings shaped like Stars table entities
+    (PartitionKey, RowKey, X, Y, Message, LastLiked, creationDate, UserId,
+    Username) whatever the backend.
+    """
+
+    async def get_star(self, star_id: str) -> Optional[Mapping[str, Any]]:
+        """The star with this id, or None"""
+        ...
+
+    async def list_stars(self) -> List[Mapping[str, Any]]:
+        ...
+
+    async def active_stars(self, cutoff: float) -> List[Mapping[str, Any]]:
+        """Stars liked at or after `cutoff` (star time)"""
+        ...
+
+    async def stars_by_user(self, user_id: str) -> List[Mapping[str, Any]]:
+        ...
+
+    async def stars_in_viewport(self, x_min: float, y_min: float, x_max: float, y_max: float) -> List[Mapping[str, Any]]:
+        """Stars inside the rectangle, edges included"""
+        ...
+
+    async def create_star(self, star_data: Mapping[str, Any]) -> None:
+        ...
+
+    async def update_star(self, star_data: Mapping[str, Any]) -> None:
+        """Write a changed star back; its position cannot change"""
+        ...
+
+    async def delete_star(self, star_data: Mapping[str, Any]) -> None:
+        ...
+
+    async def delete_expired(
+        self, cutoff: float, batch_size: int, pace: Callable[[int], Awaitable[None]]
+    ) -> List[str]:
+        """
+        Delete stars last liked before `cutoff` and return their ids.
+
+        Awaits `pace` with the number of stars about to be deleted before
+        each batch of at most `batch_size`.
+        """
+        ...
+
+    async def check(self) -> None:
+        """Raise if the backend cannot serve requests"""
+        ...
+
+_database: DatabaseProvider = TableStorageProvider()
+
+def init_database() -> DatabaseProvider:
+    """Open the storage backend chosen by STORAGE_BACKEND"""
+    global _database
+    if settings.STORAGE_BACKEND == "sqlite":
+        sqlite = settings.SQLITE
+        _database = SqliteProvider(
+            sqlite.PATH,
+            synchronous=sqlite.SYNCHRONOUS,
+            busy_timeout=sqlite.BUSY_TIMEOUT,
+            cache_size_mb=sqlite.CACHE_SIZE_MB
+        ).open()
+    elif settings.STORAGE_BACKEND == "memory":
+        memory = settings.MEMORY
+        _database = MemoryProvider(
+            memory.DIRECTORY,
+            fsync=memory.FSYNC,
+            snapshot_interval=memory.SNAPSHOT_INTERVAL,
+            snapshot_after_records=memory.SNAPSHOT_AFTER_RECORDS,
+            columnar=memory.COLUMNAR
+        ).open()
+    else:
+        init_tables()
+        _database = TableStorageProvider()
+    return _database
+
+def close_database() -> None:
+    """Close backends that hold local files open"""
+    if isinstance(_database, (SqliteProvider, MemoryProvider)):
+        _database.close()
+
+# Dependency injection
+def get_database() -> DatabaseProvider:
+    """Dependency to get the configured star storage"""
+    return _database
+
+def get_redis():
+    """Dependency to get Redis client if available"""
+    if is_cache_initialized():
+        return get_redis_client("cache")
+    return None
+
+def get_table_storage():
+    """Dependency to get Table Storage client"""
+    from src.db.azure_tables import tables
+    return tables
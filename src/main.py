@@ -1,104 +1,131 @@
-import asyncio
-import contextlib
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-import logging
-import os
-import socket
-import platform
-
-from src.config.settings import settings
-from src.db.azure_tables import init_tables
-from src.db.redis_cache import init_redis
-# from src.tasks.gc_stars import delete_old_stars
-
-# Import API routers
-from src.api.stars import router as stars_router
-from src.api.health import router as health_router
-from src.api.sse import router as sse_stars_router
-from src.api.admin import router as admin_router
-from src.api.debug import router as debug_router
-
-# Setup logger
-logger = logging.getLogger(__name__)
-
-# Create FastAPI app
-app = FastAPI(
-    title=settings.PROJECT_NAME,
-    description="Backend service for Star Map application",
-    version=settings.VERSION,
-    debug=settings.DEBUG
-)
-
-# Setup CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.API.CORS_ORIGINS,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Register routes
-app.include_router(stars_router, prefix="/stars", tags=["stars"])
-# Register users here! If you want :3
-app.include_router(health_router, prefix="/health", tags=["health"])
-app.include_router(sse_stars_router, prefix="/events/stars", tags=["events"])
-app.include_router(admin_router, prefix="/admin", tags=["admin"])
-
-# Only include debug router in non-production environments
-if settings.ENVIRONMENT != "production":
-    app.include_router(debug_router, prefix="/debug", tags=["debug"])
-    logger.info("Debug endpoints enabled in non-production environment")
-
-# Modern lifespan approach instead of on_event
-@contextlib.asynccontextmanager
-async def lifespan(app: FastAPI):
-    # Startup actions
-    try:
-        logger.info(f"Starting up {settings.PROJECT_NAME} v{settings.VERSION}")
-        
-        # Initialize database and services
-        init_tables()
-        await init_redis()
-
-        # Verify required settings
-        settings.verify_required_settings()
-        
-        # Start background garbage collection task
-        # asyncio.create_task(delete_old_stars())
-
-        logger.info("Initialization complete")
-
-    except Exception as e:
-        logger.error(f"Error during startup: {str(e)}")
-
-    yield
-
-    # Shutdown actions
-    logger.info("Shutting down application...")
-
-
-# Apply the lifespan handler
-app.router.lifespan_context = lifespan
-
-# Root endpoint
-@app.get("/")
-async def root():
-    """Root endpoint with version info"""
-    return {
-        "name": settings.PROJECT_NAME,
-        "version": settings.VERSION,
-        "environment": settings.ENVIRONMENT,
-        "message": "Welcome to the Star Map API"
-    }
-
-if __name__ == "__main__":
-    import uvicorn
-    host = "0.0.0.0" if settings.ENVIRONMENT != "development" else "127.0.0.1"
-    uvicorn.run(
-        "src.main:app",
-        host=host,
-        port=settings.PORT,
-        reload=settings.DEBUG
-    )
+import asyncio
+import contextlib
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+import logging
+import os
+import socket
+import platform
+
+from src.config.settings import settings
+from src.utils.logging import setup_logging
+from src.dependencies.providers import init_database, close_database
+from src.db.redis_cache import init_redis, close_redis
+from src.api.sse_hub import hub as sse_hub
+from src.tasks.gc_stars import delete_old_stars
+from src.utils.loop_monitor import monitor as loop_monitor
+
+# Import API routers
+from src.api.stars import router as stars_router
+from src.api.health import router as health_router
+from src.api.sse import router as sse_stars_router
+from src.api.ws import router as ws_stars_router
+from src.api.admin import router as admin_router
+from src.api.debug import router as debug_router, profile_router
+from src.api.metrics import router as metrics_router
+from src.utils.middleware import register_middleware
+
+# Setup logger; records are written by a background thread from here on
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Create FastAPI app
+app = FastAPI(
+    title=settings.PROJECT_NAME,
+    description="Backend service for Star Map application",
+    version=settings.VERSION,
+    debug=settings.DEBUG
+)
+
+# Setup CORS
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=settings.API.CORS_ORIGINS,
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+register_middleware(app)
+
+# Register routes
+app.include_router(stars_router, prefix="/stars", tags=["stars"])
+# Register users here! If you want :3
+app.include_router(health_router, prefix="/health", tags=["health"])
+app.include_router(sse_stars_router, prefix="/events/stars", tags=["events"])
+app.include_router(ws_stars_router, prefix="/events/stars", tags=["events"])
+app.include_router(admin_router, prefix="/admin", tags=["admin"])
+app.include_router(metrics_router, tags=["metrics"])
+app.include_router(profile_router, prefix="/debug", tags=["debug"])
+
+# Only include debug router in non-production environments
+if settings.ENVIRONMENT != "production":
+    app.include_router(debug_router, prefix="/debug", tags=["debug"])
+    logger.info("Debug endpoints enabled in non-production environment")
+
+# Modern lifespan approach instead of on_event
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup actions
+    gc_task = None
+    try:
+        logger.info(f"Starting up {settings.PROJECT_NAME} v{settings.VERSION}")
+
+        # Watch for blocking calls from the start, including initialization
+        if settings.LOOP_MONITOR.ENABLED and settings.ENVIRONMENT != "test":
+            loop_monitor.start()
+        
+        # Initialize database and services. Table creation retries with
+        # backoff, so it runs in a thread rather than blocking the loop.
+        await asyncio.wait_for(asyncio.to_thread(init_database), timeout=settings.AZURE.STARTUP_TIMEOUT)
+        await init_redis()
+
+        # Verify required settings
+        settings.verify_required_settings()
+        
+        # Start background garbage collection task
+        if settings.GC.ENABLED and settings.ENVIRONMENT != "test":
+            gc_task = asyncio.create_task(delete_old_stars())
+            logger.info("Star garbage collection started")
+
+        logger.info("Initialization complete")
+
+    except Exception as e:
+        logger.error(f"Error during startup: {str(e)}")
+
+    yield
+
+    # Shutdown actions
+    logger.info("Shutting down application...")
+    if gc_task is not None:
+        gc_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await gc_task
+    await sse_hub.close()
+    await close_redis()
+    close_database()
+    await loop_monitor.stop()
+
+
+# Apply the lifespan handler
+app.router.lifespan_context = lifespan
+
+# Root endpoint
+@app.get("/")
+async def root():
+    """Root endpoint with version info"""
+    return {
+        "name": settings.PROJECT_NAME,
+        "version": settings.VERSION,
+        "environment": settings.ENVIRONMENT,
+        "message": "Welcome to the Star Map API"
+    }
+
+if __name__ == "__main__":
+    import uvicorn
+    host = "0.0.0.0" if settings.ENVIRONMENT != "development" else "127.0.0.1"
+    uvicorn.run(
+        "src.main:app",
+        host=host,
+        port=settings.PORT,
+        reload=settings.DEBUG
+    )
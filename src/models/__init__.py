@@ -1,5 +1,5 @@
-"""
-Data models for the Star Map API.
-"""
-
+"""
+Data models for the Star Map API.
+"""
+
 # Models package
\ No newline at end of file
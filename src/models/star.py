@@ -1,66 +1,118 @@
-# star.py (backend models)
-
-from pydantic import BaseModel, Field, field_validator
-from typing import Optional, Dict, List
-from datetime import datetime
-import datetime as dt
-import math
-import uuid
-
-class Star(BaseModel):
-    """Star model representing a star in the sky map"""
-    id: Optional[str] = None
-    x: float
-    y: float
-    message: str
-    last_liked: Optional[float] = None
-    creation_date: Optional[float] = None
-    user_id: Optional[str] = None
-    username: Optional[str] = None
-
-    @field_validator('x', 'y')
-    def validate_coordinates(cls, v):
-        # if not -1 <= v <= 1:
-        #     raise ValueError('Coordinates must be between -1 and 1')
-        return v
-
-    @field_validator('message')
-    def validate_message(cls, v):
-        if len(v) > 256:  # Twitter-style limit
-            raise ValueError('Message too long')
-        return v
-        
-    def to_entity(self):
-        """Convert the Star model to an Azure Table entity"""
-        current_time = datetime.now().timestamp()
-        return {
-            "PartitionKey": f"STAR_{datetime.now().strftime('%Y%m')}",
-            "RowKey": self.id or str(uuid.uuid4()),
-            "X": self.x,
-            "Y": self.y,
-            "Message": self.message,
-            "LastLiked": self.last_liked or current_time,
-            "creationDate": self.creation_date or current_time,
-            "UserId": self.user_id,
-            "Username": self.username
-        }
-    
-    @classmethod
-    def from_entity(cls, entity: Dict) -> "Star":
-        """Create star model from Azure table entity"""
-        return cls(
-            id=entity["RowKey"],
-            x=entity["X"],
-            y=entity["Y"],
-            message=entity["Message"],
-            last_liked=entity.get("LastLiked"),
-            creation_date=entity.get("creationDate"),
-            user_id=entity.get("UserId"),
-            username=entity.get("Username")
-        )
-
-# def calculate_current_brightness(base_brightness: float, last_liked: float) -> float:
-#     """Calculate the current brightness based on time decay"""
-#     time_since_liked = datetime.now(dt.timezone.utc).timestamp() - last_liked
-#     decay_factor = max(0.01, 1.0 - 0.01 * time_since_liked)
-#     return max(20.0, base_brightness * math.exp(-decay_factor * time_since_liked))
+# star.py (backend models)
+
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, Dict, List, Sequence
+from datetime import datetime
+import datetime as dt
+import math
+import time
+import uuid
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency, brightness falls back to a loop
+    np = None
+
+from src.config.settings import settings
+
+# LastLiked and creationDate are stored as seconds since 2025-01-01 UTC
+STAR_EPOCH = 1735689600
+
+def star_time() -> float:
+    """Current time on the clock used by LastLiked and creationDate"""
+    return time.time() - STAR_EPOCH
+
+class Star(BaseModel):
+    """Star model representing a star in the sky map"""
+    id: Optional[str] = None
+    x: float
+    y: float
+    message: str
+    last_liked: Optional[float] = None
+    creation_date: Optional[float] = None
+    user_id: Optional[str] = None
+    username: Optional[str] = None
+
+    @field_validator('x', 'y')
+    def validate_coordinates(cls, v):
+        # if not -1 <= v <= 1:
+        #     raise ValueError('Coordinates must be between -1 and 1')
+        return v
+
+    @field_validator('message')
+    def validate_message(cls, v):
+        if len(v) > 256:  # Twitter-style limit
+            raise ValueError('Message too long')
+        return v
+        
+    def to_entity(self):
+        """Convert the Star model to an Azure Table entity"""
+        current_time = datetime.now().timestamp()
+        return {
+            "PartitionKey": f"STAR_{datetime.now().strftime('%Y%m')}",
+            "RowKey": self.id or str(uuid.uuid4()),
+            "X": self.x,
+            "Y": self.y,
+            "Message": self.message,
+            "LastLiked": self.last_liked or current_time,
+            "creationDate": self.creation_date or current_time,
+            "UserId": self.user_id,
+            "Username": self.username
+        }
+    
+    @classmethod
+    def from_entity(cls, entity: Dict) -> "Star":
+        """Create star model from Azure table entity"""
+        return cls(
+            id=entity["RowKey"],
+            x=entity["X"],
+            y=entity["Y"],
+            message=entity["Message"],
+            last_liked=entity.get("LastLiked"),
+            creation_date=entity.get("creationDate"),
+            user_id=entity.get("UserId"),
+            username=entity.get("Username")
+        )
+
+def calculate_current_brightness(last_liked: Optional[float], now: Optional[float] = None) -> float:
+    """Calculate the current brightness of a star based on time since last liked"""
+    cfg = settings.BRIGHTNESS
+    if last_liked is None:
+        return cfg.MIN
+    now = star_time() if now is None else now
+    time_since_liked = max(0.0, now - last_liked)
+
+    if cfg.MODEL == "exponential":
+        return cfg.MIN + (cfg.MAX - cfg.MIN) * 2.0 ** (-time_since_liked / cfg.HALF_LIFE)
+    if cfg.MODEL == "linear":
+        faded = (cfg.MAX - cfg.MIN) * time_since_liked / (2 * cfg.HALF_LIFE)
+        return max(cfg.MIN, cfg.MAX - faded)
+    # legacy: the original client-side formula
+    decay_factor = max(0.01, 1.0 - 0.01 * time_since_liked)
+    return max(cfg.MIN, cfg.MAX * math.exp(-decay_factor * time_since_liked))
+
+def calculate_brightness_batch(last_liked: Sequence[Optional[float]], now: Optional[float] = None) -> List[float]:
+    """
+    Calculate the current brightness of many stars in one pass.
+
+    Uses NumPy when it is installed; stars without a LastLiked value get the
+    minimum brightness.
+    """
+    now = star_time() if now is None else now
+    if np is None:
+        return [calculate_current_brightness(value, now) for value in last_liked]
+
+    cfg = settings.BRIGHTNESS
+    # None becomes NaN, and NaN brightness is replaced by the floor below
+    time_since_liked = np.maximum(now - np.asarray(last_liked, dtype=np.float64), 0.0)
+
+    if cfg.MODEL == "exponential":
+        brightness = cfg.MIN + (cfg.MAX - cfg.MIN) * np.exp2(-time_since_liked / cfg.HALF_LIFE)
+    elif cfg.MODEL == "linear":
+        faded = (cfg.MAX - cfg.MIN) * time_since_liked / (2 * cfg.HALF_LIFE)
+        brightness = np.maximum(cfg.MIN, cfg.MAX - faded)
+    else:
+        decay_factor = np.maximum(0.01, 1.0 - 0.01 * time_since_liked)
+        brightness = np.maximum(cfg.MIN, cfg.MAX * np.exp(-decay_factor * time_since_liked))
+
+    return np.where(np.isnan(brightness), cfg.MIN, brightness).tolist()
@@ -0,0 +1,122 @@
+# star_record.py (backend models)
+
+import sys
+import uuid
+from typing import Any, Dict, Mapping, Optional, Union
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    """Intern repeated strings such as user ids so every star shares one copy"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+class StarRecord:
+    """
+    Compact in-memory representation of a star.
+
+    Table entities carry metadata, odata fields and their own copy of every
+    key string. A record keeps only the payload: the UUID row key as an int,
+    interned partition keys, user ids and usernames, and plain floats.
+    Row keys that are not UUIDs (e.g. debug stars) are kept as strings.
+
+    Records are read-only, so stores can share them between indexes and
+    snapshots; build a new record to change a star.
+    """
+
+    __slots__ = (
+        "key", "partition", "x", "y", "message",
+        "last_liked", "creation_date", "user_id", "username",
+    )
+
+    def __init__(
+        self,
+        star_id: str,
+        partition: str,
+        x: float,
+        y: float,
+        message: str,
+        last_liked: Optional[float] = None,
+        creation_date: Optional[float] = None,
+        user_id: Optional[str] = None,
+        username: Optional[str] = None
+    ):
+        init = object.__setattr__
+        init(self, "key", self.pack_id(star_id))
+        init(self, "partition", _intern(partition))
+        init(self, "x", x)
+        init(self, "y", y)
+        init(self, "message", message)
+        init(self, "last_liked", last_liked)
+        init(self, "creation_date", creation_date)
+        init(self, "user_id", _intern(user_id))
+        init(self, "username", _intern(username))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"StarRecord is read-only; cannot set {name}")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"StarRecord is read-only; cannot delete {name}")
+
+    @staticmethod
+    def pack_id(star_id: str) -> Union[int, str]:
+        """Store UUID ids as ints; anything else stays a string"""
+        try:
+            packed = uuid.UUID(star_id)
+        except (TypeError, ValueError, AttributeError):
+            return _intern(star_id)
+        # Only canonical ids round-trip exactly through the int form
+        return packed.int if str(packed) == star_id else _intern(star_id)
+
+    @property
+    def id(self) -> str:
+        key = self.key
+        return str(uuid.UUID(int=key)) if isinstance(key, int) else key
+
+    @classmethod
+    def from_entity(cls, entity: Mapping[str, Any]) -> "StarRecord":
+        """Create a record from a Stars table entity"""
+        get = entity.get
+        return cls(
+            entity["RowKey"],
+            entity["PartitionKey"],
+            entity["X"],
+            entity["Y"],
+            entity["Message"],
+            get("LastLiked"),
+            get("creationDate"),
+            get("UserId"),
+            get("Username")
+        )
+
+    def to_entity(self) -> Dict[str, Any]:
+        """Convert the record back to a Stars table entity"""
+        return {
+            "PartitionKey": self.partition,
+            "RowKey": self.id,
+            "X": self.x,
+            "Y": self.y,
+            "Message": self.message,
+            "LastLiked": self.last_liked,
+            "creationDate": self.creation_date,
+            "UserId": self.user_id,
+            "Username": self.username
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """API representation, identical to serialization.star_to_dict"""
+        return {
+            "id": self.id,
+            "x": self.x,
+            "y": self.y,
+            "message": self.message,
+            "last_liked": self.last_liked,
+            "creation_date": self.creation_date,
+            "user_id": self.user_id,
+            "username": self.username
+        }
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, StarRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"StarRecord(id={self.id!r}, x={self.x!r}, y={self.y!r}, last_liked={self.last_liked!r})"
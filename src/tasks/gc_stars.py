@@ -1,31 +1,97 @@
-# import asyncio
-# import time
-# import logging
-# from src.db.azure_tables import tables
+"""
+Background garbage collection of expired stars.
+The storage backend finds only rows whose LastLiked is past the expiry and
+deletes them in batches (per-partition transactions on Azure). Each deleted
+star is published as the same delete event a user's delete sends. Deletes
+are paced so GC never competes with user traffic for storage throughput.
+"""
 
-# logger = logging.getLogger(__name__)
+import asyncio
+import logging
+import time
+from typing import List, Optional
 
-# async def delete_old_stars():
-#     """Periodically deletes stars older than 24 hours."""
-#     while True:
-#         try:
-#             current_time = time.time() - 1735689600  # Adjusted current time
-#             expiration_time = current_time - 86400  # 24 hours ago
+from src.api.sse_publisher import publish_star_event
+from src.config.settings import settings
+from src.db.redis_cache import is_cache_initialized, get_redis_client
+from src.db.versioning import bump_version, star_change
+from src.dependencies.providers import get_database
+from src.models.star import star_time
 
-#             logger.info(f"Running garbage collection. Deleting stars before: {expiration_time}")
+logger = logging.getLogger(__name__)
 
-#             all_stars = list(tables["Stars"].list_entities())
+GC_LOCK_KEY = "gc_stars:lock"
 
-#             for star in all_stars:
-#                 last_like_time = star.get("LastLiked", 0)
-#                 if last_like_time < expiration_time:
-#                     try:
-#                         tables["Stars"].delete_entity(star["PartitionKey"], star["RowKey"])
-#                         logger.info(f"Deleted expired star: {star['RowKey']}")
-#                     except Exception as e:
-#                         logger.warning(f"Failed to delete star {star['RowKey']}: {str(e)}")
+class DeleteThrottle:
+    """Paces deletes to at most `rate` entities per second"""
 
-#         except Exception as e:
-#             logger.error(f"Error in garbage collection: {str(e)}")
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._next_allowed = time.monotonic()
 
-#         await asyncio.sleep(300)  # Run every hour
+    async def wait(self, count: int) -> None:
+        now = time.monotonic()
+        if self._next_allowed > now:
+            await asyncio.sleep(self._next_allowed - now)
+            now = self._next_allowed
+        self._next_allowed = now + count / self.rate
+
+async def _acquire_gc_lock() -> bool:
+    """Let one replica per interval run GC when Redis is available"""
+    if not is_cache_initialized("counters"):
+        return True
+    try:
+        redis = get_redis_client("counters")
+        return bool(await redis.set(GC_LOCK_KEY, settings.HOST_NAME, nx=True, ex=max(1, settings.GC.INTERVAL - 1)))
+    except Exception as e:
+        logger.warning(f"Could not take GC lock, running anyway: {str(e)}")
+        return True
+
+async def _invalidate_caches(star_ids: List[str]) -> None:
+    """Drop cached copies of deleted stars and the active stars list"""
+    if not star_ids or not is_cache_initialized():
+        return
+    try:
+        redis = get_redis_client("cache")
+        keys = ["active_stars"]
+        for star_id in star_ids:
+            keys.append(f"star:{star_id}")
+            keys.append(f"star_popularity:{star_id}")
+        await redis.delete(*keys)
+    except Exception as e:
+        logger.warning(f"Failed to invalidate caches after GC: {str(e)}")
+
+async def collect_expired_stars(store, now: Optional[float] = None) -> List[str]:
+    """
+    Run one garbage collection pass over a DatabaseProvider and return the
+    ids of deleted stars.
+
+    Deletes go in batches of up to GC_BATCH_SIZE, paced to
+    GC_MAX_DELETES_PER_SECOND.
+    """
+    gc_settings = settings.GC
+    expiration_time = (star_time() if now is None else now) - gc_settings.MAX_AGE
+    throttle = DeleteThrottle(gc_settings.MAX_DELETES_PER_SECOND)
+    deleted = await store.delete_expired(expiration_time, gc_settings.BATCH_SIZE, throttle.wait)
+
+    if deleted:
+        logger.info("Garbage collection deleted %d stars not liked since %s", len(deleted), expiration_time)
+        await bump_version([star_change("delete", {"id": star_id}) for star_id in deleted])
+        await _invalidate_caches(deleted)
+        # One batched event for the whole pass: an event per star would
+        # overfill connection queues and drop every client on a large pass
+        await publish_star_event("delete", {"ids": deleted})
+    return deleted
+
+async def delete_old_stars():
+    """Periodically deletes stars that have not been liked within GC_MAX_AGE."""
+    while True:
+        try:
+            if await _acquire_gc_lock():
+                await collect_expired_stars(get_database())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in garbage collection: {str(e)}")
+
+        await asyncio.sleep(settings.GC.INTERVAL)
@@ -1 +1 @@
-# Utils package
+# Utils package
@@ -0,0 +1,82 @@
+"""
+Request-scoped deadlines.
+A route dependency starts a time budget for the request. Storage and Redis
+calls read the remaining budget from a context variable, shorten their own
+timeouts and retries to fit it, and fail fast once it is spent, so a
+throttled backend cannot hold a worker for minutes.
+"""
+
+import asyncio
+import contextvars
+import time
+from typing import Awaitable, Optional, TypeVar
+
+from fastapi import HTTPException
+
+T = TypeVar("T")
+
+class DeadlineExceeded(HTTPException):
+    """The request ran out of time; answered as 504"""
+
+    def __init__(self, detail: str = "Request deadline exceeded"):
+        super().__init__(status_code=504, detail=detail)
+
+class ServiceUnavailable(HTTPException):
+    """A backend is throttling or down and retrying would not fit the budget; answered as 503"""
+
+    def __init__(self, detail: str = "Service temporarily unavailable", retry_after: int = 1):
+        super().__init__(status_code=503, detail=detail, headers={"Retry-After": str(retry_after)})
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+def clear_deadline() -> contextvars.Token:
+    """
+    Start a request without a deadline; pass the token to restore_deadline.
+
+    Requests served one after another in the same task, as in-process
+    clients do, would otherwise inherit the previous request's deadline.
+    """
+    return _deadline.set(None)
+
+def restore_deadline(token: contextvars.Token) -> None:
+    _deadline.reset(token)
+
+def set_deadline(seconds: float) -> None:
+    """Give the current request `seconds` from now; a tighter existing deadline is kept"""
+    expires = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is None or expires < current:
+        _deadline.set(expires)
+
+def remaining() -> Optional[float]:
+    """Seconds left for the current request, or None when no deadline is set"""
+    expires = _deadline.get()
+    if expires is None:
+        return None
+    return expires - time.monotonic()
+
+def check_deadline() -> None:
+    """Raise DeadlineExceeded if the current request is out of time"""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded()
+
+async def within_deadline(awaitable: Awaitable[T]) -> T:
+    """Await with the request's remaining budget as timeout"""
+    left = remaining()
+    if left is None:
+        return await awaitable
+    if left <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded()
+    try:
+        return await asyncio.wait_for(awaitable, timeout=left)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded() from None
+
+def deadline(seconds: float):
+    """Route dependency giving each request a time budget of `seconds`"""
+    async def dependency() -> None:
+        set_deadline(seconds)
+    return dependency
@@ -1,37 +1,193 @@
-import logging
-import sys
-from src.config.settings import settings
-
-def setup_logging():
-    """
-    Configure logging for the application based on settings
-    """
-    # Get log level from settings
-    log_level = getattr(logging, settings.LOGGING.LEVEL.upper(), logging.INFO)
-    
-    # Configure root logger
-    logging.basicConfig(
-        level=log_level,
-        format=settings.LOGGING.FORMAT,
-        handlers=[
-            logging.StreamHandler(sys.stdout),
-        ]
-    )
-    
-    # Set level for specific loggers to reduce noise
-    logging.getLogger("azure").setLevel(logging.WARNING)
-    logging.getLogger("urllib3").setLevel(logging.WARNING)
-    
-    # Create logger for our application
-    logger = logging.getLogger("starmap")
-    logger.setLevel(log_level)
-    
-    # Log startup information
-    logger.info(f"Logging initialized at level {settings.LOGGING.LEVEL}")
-    logger.info(f"Running in {settings.ENVIRONMENT} environment on {settings.HOST_NAME}")
-    
-    return logger
-    
-def get_logger(name):
-    """Get a logger with the given name, inheriting application configuration"""
-    return logging.getLogger(name)
+"""
+Logging pipeline.
+Handlers on the request path only put records on a queue. A listener thread
+formats them and writes them to stdout, as text or one JSON object per line,
+so a slow terminal or log collector never stalls the event loop. INFO and
+DEBUG messages are rate limited per message template: past the limit they
+are dropped before they are formatted or queued, and the next message that
+passes reports how many were suppressed.
+"""
+
+import atexit
+import datetime as dt
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from src.config.settings import settings
+
+try:
+    import orjson
+except ImportError:  # Optional dependency, fall back to stdlib json
+    orjson = None
+
+# Attributes every LogRecord has; anything else was passed with extra=
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including fields passed with extra="""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": dt.datetime.fromtimestamp(record.created, dt.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        if orjson is not None:
+            return orjson.dumps(entry, default=str).decode("utf-8")
+        return json.dumps(entry, default=str)
+
+class RateSampler(logging.Filter):
+    """
+    Lets through at most `per_second` INFO/DEBUG records per message template.
+
+    The key is the unformatted message and logger name, so
+    logger.info("Liking star %s", star_id) is one key however many stars
+    there are. Warnings and errors always pass.
+    """
+
+    def __init__(self, per_second: int, max_keys: int = 1000):
+        super().__init__()
+        self.per_second = per_second
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        # key -> [window start second, passed in window, suppressed since last pass]
+        self._windows: Dict[Tuple[str, Any], list] = {}
+        self.suppressed_total = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.per_second <= 0 or record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.msg)
+        second = int(time.monotonic())
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None:
+                if len(self._windows) >= self.max_keys:
+                    self._windows.clear()
+                window = self._windows[key] = [second, 0, 0]
+            elif window[0] != second:
+                window[0] = second
+                window[1] = 0
+            if window[1] >= self.per_second:
+                window[2] += 1
+                self.suppressed_total += 1
+                return False
+            window[1] += 1
+            if window[2]:
+                record.suppressed = window[2]
+                window[2] = 0
+        return True
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records when the writer falls behind instead of blocking"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments now, since they may change before the writer
+        # runs; the formatter itself runs on the writer thread
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class _SuppressedCountFormatter(logging.Formatter):
+    """Text formatter that notes how many similar messages were sampled away"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            text += f" ({suppressed} similar messages suppressed)"
+        return text
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional[NonBlockingQueueHandler] = None
+_sampler: Optional[RateSampler] = None
+
+def setup_logging():
+    """
+    Route all logging through a queue to a background writer thread.
+
+    Replaces the root handlers installed by basicConfig. Safe to call more
+    than once; later calls are ignored.
+    """
+    global _listener, _handler, _sampler
+    logger = logging.getLogger("starmap")
+    if _listener is not None:
+        return logger
+
+    # Get log level from settings
+    log_level = getattr(logging, settings.LOGGING.LEVEL.upper(), logging.INFO)
+
+    output = logging.StreamHandler(sys.stdout)
+    if settings.LOGGING.JSON:
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(_SuppressedCountFormatter(settings.LOGGING.FORMAT))
+
+    _sampler = RateSampler(settings.LOGGING.SAMPLE_PER_SECOND)
+    _handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.LOGGING.QUEUE_SIZE))
+    _handler.addFilter(_sampler)
+    _listener = logging.handlers.QueueListener(_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_handler)
+    root.setLevel(log_level)
+
+    # Set level for specific loggers to reduce noise
+    logging.getLogger("azure").setLevel(logging.WARNING)
+    logging.getLogger("urllib3").setLevel(logging.WARNING)
+
+    # Log startup information
+    logger.setLevel(log_level)
+    logger.info("Logging initialized at level %s", settings.LOGGING.LEVEL)
+    logger.info("Running in %s environment on %s", settings.ENVIRONMENT, settings.HOST_NAME)
+
+    return logger
+
+def shutdown_logging() -> None:
+    """Write out queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def logging_stats() -> Dict[str, int]:
+    return {
+        "queued": _handler.queue.qsize() if _handler is not None else 0,
+        "dropped": _handler.dropped if _handler is not None else 0,
+        "sampled_out": _sampler.suppressed_total if _sampler is not None else 0,
+    }
+
+def get_logger(name):
+    """Get a logger with the given name, inheriting application configuration"""
+    return logging.getLogger(name)
@@ -0,0 +1,187 @@
+"""
+Event-loop lag monitor and blocking-call watchdog.
+A task on the loop sleeps for a fixed interval and measures how late it wakes
+up; that delay is the lag every other coroutine saw. The task also stamps a
+heartbeat. A watchdog thread checks the heartbeat, and when it goes stale the
+loop is blocked right now: the watchdog captures the loop thread's stack to
+name the blocking call. Stalls are logged, counted in metrics and ranked per
+call site by total time blocked.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Dict, List, Optional
+
+from src.config.settings import settings
+from src.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+loop_lag = registry.histogram(
+    "event_loop_lag_seconds", "How late the loop monitor woke up",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+loop_stalls = registry.counter(
+    "event_loop_stalls_total", "Times the event loop was blocked past the threshold, by blocking call site", ("site",)
+)
+loop_stall_seconds = registry.counter(
+    "event_loop_stall_seconds_total", "Time the event loop was blocked, by blocking call site", ("site",)
+)
+
+# Modules whose frames name a stall; otherwise the innermost frame does
+APP_PACKAGES = ("src.",)
+
+class _Stall:
+    __slots__ = ("site", "stack", "beat")
+
+    def __init__(self, site: str, stack: str, beat: float):
+        self.site = site
+        self.stack = stack
+        self.beat = beat
+
+class LoopMonitor:
+    """
+    Measures event-loop lag and finds the calls that block it.
+
+    Args:
+        interval: Seconds between heartbeats
+        threshold: Lag in seconds that counts as the loop being blocked
+        max_sites: Distinct call sites kept in the ranking
+    """
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.1, max_sites: int = 100):
+        self.interval = interval
+        self.threshold = threshold
+        self.max_sites = max_sites
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._loop_thread: Optional[int] = None
+        self._beat = time.monotonic()
+        self._stall: Optional[_Stall] = None
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+        self.stalls = 0
+        self.sites: Dict[str, Dict[str, Any]] = {}
+
+    def start(self) -> None:
+        """Start the heartbeat task on the running loop and the watchdog thread"""
+        if self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1.0)
+            self._watchdog = None
+
+    async def _heartbeat(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            loop_lag.observe(lag)
+
+    def _watch(self) -> None:
+        # Poll often enough to catch the loop while it is still blocked
+        poll = min(self.interval, self.threshold) / 2
+        while not self._stop.wait(poll):
+            beat = self._beat
+            stall = self._stall
+            if stall is not None and beat != stall.beat:
+                self._finish(stall, beat)
+                stall = self._stall = None
+            if stall is None and time.monotonic() - beat > self.interval + self.threshold:
+                self._stall = self._capture(beat)
+
+    def _capture(self, beat: float) -> Optional[_Stall]:
+        frame = sys._current_frames().get(self._loop_thread)
+        if frame is None:
+            return None
+        site = _blocking_site(frame)
+        stack = "".join(traceback.format_stack(frame, limit=12))
+        logger.warning(
+            f"Event loop blocked for over {(time.monotonic() - beat - self.interval) * 1000:.0f} ms in {site}\n{stack}"
+        )
+        return _Stall(site, stack, beat)
+
+    def _finish(self, stall: _Stall, beat: float) -> None:
+        """Record a stall once the heartbeat resumed"""
+        duration = max(0.0, beat - stall.beat - self.interval)
+        self.stalls += 1
+        loop_stalls.inc(stall.site)
+        loop_stall_seconds.inc(stall.site, amount=duration)
+        entry = self.sites.get(stall.site)
+        if entry is None:
+            if len(self.sites) >= self.max_sites:
+                # Make room by dropping the site that blocked least
+                del self.sites[min(self.sites, key=lambda site: self.sites[site]["total_seconds"])]
+            entry = self.sites[stall.site] = {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0, "stack": stall.stack}
+        entry["count"] += 1
+        entry["total_seconds"] += duration
+        entry["max_seconds"] = max(entry["max_seconds"], duration)
+        entry["stack"] = stall.stack
+        logger.warning(f"Event loop was blocked for {duration * 1000:.0f} ms in {stall.site}")
+
+    def top_sites(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Blocking call sites ranked by total time blocked"""
+        ranked = sorted(self.sites.items(), key=lambda item: item[1]["total_seconds"], reverse=True)
+        return [
+            {
+                "site": site,
+                "count": entry["count"],
+                "total_ms": round(entry["total_seconds"] * 1000, 3),
+                "max_ms": round(entry["max_seconds"] * 1000, 3),
+                "stack": entry["stack"],
+            }
+            for site, entry in ranked[:limit]
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "last_lag_ms": round(self.last_lag * 1000, 3),
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "stalls": self.stalls,
+            "blocked": self._stall.site if self._stall is not None else None,
+            "top_sites": self.top_sites(),
+        }
+
+def _blocking_site(frame) -> str:
+    """The innermost application frame, or the innermost frame when there is none"""
+    chosen = frame
+    while frame is not None:
+        if frame.f_globals.get("__name__", "").startswith(APP_PACKAGES):
+            chosen = frame
+            break
+        frame = frame.f_back
+    module = chosen.f_globals.get("__name__", chosen.f_code.co_filename)
+    return f"{module}:{chosen.f_code.co_name}:{chosen.f_lineno}"
+
+monitor = LoopMonitor(
+    interval=settings.LOOP_MONITOR.INTERVAL,
+    threshold=settings.LOOP_MONITOR.BLOCK_THRESHOLD
+)
@@ -1,45 +1,80 @@
-import time
-import logging
-from fastapi import FastAPI, Request, Response
-from fastapi.responses import JSONResponse
-
-logger = logging.getLogger(__name__)
-
-async def request_timing_middleware(request: Request, call_next):
-    """Middleware to log request timing information"""
-    start_time = time.time()
-    
-    try:
-        response = await call_next(request)
-        
-        # Calculate request duration
-        duration = time.time() - start_time
-        response.headers["X-Process-Time"] = str(duration)
-        
-        # Log request details
-        logger.info(f"{request.method} {request.url.path} completed in {duration:.3f}s with status {response.status_code}")
-        
-        return response
-    except Exception as e:
-        logger.error(f"Error processing request: {str(e)}")
-        return JSONResponse(
-            status_code=500,
-            content={"detail": "Internal server error"}
-        )
-
-async def error_handling_middleware(request: Request, call_next):
-    """Global error handling middleware"""
-    try:
-        return await call_next(request)
-    except Exception as e:
-        logger.exception(f"Unhandled exception: {str(e)}")
-        return JSONResponse(
-            status_code=500,
-            content={"detail": "Internal server error"}
-        )
-
-def register_middleware(app: FastAPI):
-    """Register all middleware with the FastAPI application"""
-    # Add middleware in reverse order (last added = first executed)
-    app.middleware("http")(error_handling_middleware)
-    app.middleware("http")(request_timing_middleware)
+import time
+import logging
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
+
+from src.config.settings import settings
+from src.utils.metrics import http_duration, http_requests
+from src.utils.deadline import clear_deadline, restore_deadline
+from src.utils.tracing import start_trace, end_trace, should_export, export_trace
+
+logger = logging.getLogger(__name__)
+
+class RequestMiddleware:
+    """
+    Request timing, Server-Timing spans, metrics and the last-resort 500.
+
+    Written against ASGI directly rather than as @app.middleware("http")
+    functions: those run the app in a separate task and pass every body
+    chunk through a memory stream, which multiplied the cost of each SSE
+    frame and of each open stream.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        trace, token = start_trace()
+        deadline_token = clear_deadline()
+        status = 500
+        # Time until the response headers were sent, as reported in them
+        duration = None
+
+        async def send_with_timing(message):
+            nonlocal status, duration
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                duration = time.perf_counter() - start_time
+                headers = MutableHeaders(scope=message)
+                headers["X-Process-Time"] = str(duration)
+                if settings.API.SERVER_TIMING:
+                    headers["Server-Timing"] = trace.server_timing(duration)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        except Exception as e:
+            logger.exception(f"Unhandled exception: {str(e)}")
+            if duration is not None:
+                # Headers are already out; all that can be done is drop the connection
+                raise
+            response = JSONResponse(
+                status_code=500,
+                content={"detail": "Internal server error"}
+            )
+            await response(scope, receive, send_with_timing)
+        finally:
+            end_trace(token)
+            restore_deadline(deadline_token)
+            if duration is None:
+                duration = time.perf_counter() - start_time
+            method = scope["method"]
+            # Label by template, not raw path, so star ids do not create new series
+            template = getattr(scope.get("route"), "path", "unmatched")
+            http_duration.observe(duration, method, template)
+            http_requests.inc(method, template, str(status))
+            if should_export(settings.API.TRACE_SAMPLE_RATE):
+                export_trace(trace, method, scope["path"], status, duration)
+
+            # Log request details
+            logger.info("%s %s completed in %.3fs with status %s", method, scope["path"], duration, status)
+
+def register_middleware(app: FastAPI):
+    """Register all middleware with the FastAPI application"""
+    app.add_middleware(RequestMiddleware)
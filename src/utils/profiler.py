@@ -0,0 +1,168 @@
+"""
+On-demand sampling CPU profiler.
+A background thread snapshots every thread's stack at a fixed rate with
+sys._current_frames() and counts identical stacks. Nothing is instrumented,
+so the profiled code runs at full speed between samples. The sampler's own
+CPU time is measured, and it stretches its interval whenever a sample costs
+more than MAX_OVERHEAD of it. The overhead therefore stays bounded however
+many threads there are.
+"""
+
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Tuple
+
+# Highest share of one core the sampler may use
+MAX_OVERHEAD = 0.02
+
+# Deepest stack kept per sample; deeper frames are cut at the root side
+MAX_DEPTH = 128
+
+Stack = Tuple[str, ...]
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is requested while another is running"""
+
+# Frame names by code object, so each function is formatted once
+_names: Dict[Any, str] = {}
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    name = _names.get(code)
+    if name is None:
+        module = frame.f_globals.get("__name__", code.co_filename)
+        name = _names[code] = f"{module}:{code.co_name}:{code.co_firstlineno}"
+    return name
+
+def _stack(frame) -> Stack:
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        names.append(_names.get(frame.f_code) or _frame_name(frame))
+        frame = frame.f_back
+    names.reverse()
+    return tuple(names)
+
+class Profile:
+    """Stack counts collected by one profiling run"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.duration = 0.0
+        self.sampler_cpu = 0.0
+        self.stretched = 0
+
+    @property
+    def overhead(self) -> float:
+        """Sampler CPU time as a share of one core over the run"""
+        return self.sampler_cpu / self.duration if self.duration else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "samples": self.samples,
+            "duration_s": round(self.duration, 3),
+            "interval_ms": round(self.interval * 1000, 3),
+            "sampler_cpu_ms": round(self.sampler_cpu * 1000, 3),
+            "overhead_pct": round(self.overhead * 100, 3),
+            "stretched_intervals": self.stretched,
+        }
+
+    def collapsed(self) -> str:
+        """Stacks in the collapsed format read by flamegraph.pl and speedscope"""
+        lines = [f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common()]
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self, name: str = "profile") -> Dict[str, Any]:
+        """Sampled profile in the speedscope file format"""
+        frames: Dict[str, int] = {}
+        samples = []
+        weights = []
+        for stack, count in self.stacks.most_common():
+            samples.append([frames.setdefault(frame, len(frames)) for frame in stack])
+            weights.append(count * self.interval)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": [{"name": frame} for frame in frames]},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": self.duration,
+                "samples": samples,
+                "weights": weights,
+            }],
+            "name": name,
+            "exporter": "starmap-profiler",
+        }
+
+class SamplingProfiler:
+    """Samples all thread stacks; one profile may run at a time"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def run(self, seconds: float, interval: float, idle: bool = False) -> Profile:
+        """
+        Sample for `seconds`, blocking the calling thread.
+
+        Args:
+            seconds: How long to sample
+            interval: Seconds between samples before any stretching
+            idle: Keep stacks of threads parked in a wait, such as idle
+                executor workers
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy()
+        try:
+            return self._sample(seconds, interval, idle)
+        finally:
+            self._lock.release()
+
+    def _sample(self, seconds: float, interval: float, idle: bool) -> Profile:
+        profile = Profile(interval)
+        own_id = threading.get_ident()
+        start = time.perf_counter()
+        deadline = start + seconds
+        while True:
+            cpu_before = time.thread_time()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = _stack(frame)
+                if not idle and stack and _is_idle(stack[-1]):
+                    continue
+                profile.stacks[(names.get(thread_id, str(thread_id)),) + stack] += 1
+            profile.samples += 1
+            cost = time.thread_time() - cpu_before
+            profile.sampler_cpu += cost
+
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            delay = interval
+            if cost > interval * MAX_OVERHEAD:
+                # Keep the sampler under MAX_OVERHEAD of a core
+                delay = cost / MAX_OVERHEAD
+                profile.stretched += 1
+            time.sleep(min(delay, deadline - now))
+        profile.duration = time.perf_counter() - start
+        return profile
+
+# Frames where a thread waits without using CPU
+_IDLE_FRAMES = (
+    "threading:wait:", "queue:get:", "selectors:select:", "concurrent.futures.thread:_worker:",
+)
+
+def _is_idle(frame_name: str) -> bool:
+    return frame_name.startswith(_IDLE_FRAMES)
+
+profiler = SamplingProfiler()
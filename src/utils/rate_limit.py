@@ -0,0 +1,212 @@
+"""
+Two-level rate limiting for mutation endpoints.
+Each replica answers most checks in process. Clients that hit a replica
+repeatedly lease tokens in small chunks from a token bucket kept in Redis
+by a Lua script, so the limit holds across replicas, and a denial is
+remembered locally until the Redis bucket has refilled enough. When Redis
+is unavailable an in-process bucket enforces the limit on its own, per
+replica.
+"""
+
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from fastapi import HTTPException, Request
+from starlette.requests import HTTPConnection
+
+from src.config.settings import settings
+from src.db.redis_cache import is_cache_initialized, get_redis_client
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "ratelimit:"
+
+# Refills the bucket from the Redis server clock, then grants up to
+# ARGV[3] tokens if at least ARGV[4] are available. Returns the grant and,
+# as a string because Lua numbers come back truncated, the seconds until
+# ARGV[4] tokens will be available.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local minimum = tonumber(ARGV[4])
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local granted = 0
+if tokens >= minimum then
+    granted = math.min(requested, math.floor(tokens))
+end
+tokens = tokens - granted
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+local wait = 0
+if granted == 0 then
+    wait = (minimum - tokens) / rate
+end
+return {granted, tostring(wait)}
+"""
+
+class TokenBucket:
+    """Classic token bucket; take() returns 0 or the seconds to wait"""
+
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: float, rate: float, now: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now: float, cost: float = 1) -> float:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+class _ClientState:
+    """Per-key state: leased tokens, a remembered denial and the fallback bucket"""
+
+    __slots__ = ("leased", "lease_expires", "last_lease", "denied_until", "fallback")
+
+    def __init__(self, fallback: TokenBucket):
+        self.leased = 0
+        self.lease_expires = 0.0
+        self.last_lease = float("-inf")
+        self.denied_until = 0.0
+        self.fallback = fallback
+
+class RateLimiter:
+    """
+    Allows `times` hits per `seconds` for each key.
+
+    Args:
+        times: Bucket capacity, i.e. the burst a client may make
+        seconds: Time for an empty bucket to refill completely
+        lease_size: Tokens taken from Redis per round-trip by a client
+            that went to Redis less than lease_ttl ago; others take only
+            what the hit costs
+        lease_ttl: Seconds leased tokens stay usable locally; unused ones
+            are forfeited, so a replica never holds a client's share for long
+        max_keys: Keys tracked in memory, least recently used dropped first
+        clock: Monotonic clock, replaceable in tests
+    """
+
+    def __init__(
+        self,
+        times: int,
+        seconds: float,
+        lease_size: Optional[int] = None,
+        lease_ttl: float = 1.0,
+        max_keys: int = 10000,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.capacity = times
+        self.rate = times / seconds
+        self.lease_size = lease_size or max(1, times // 5)
+        self.lease_ttl = lease_ttl
+        self.max_keys = max_keys
+        self.clock = clock
+        self._clients: "OrderedDict[str, _ClientState]" = OrderedDict()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.degraded_hits = 0
+
+    def _state(self, key: str, now: float) -> _ClientState:
+        state = self._clients.get(key)
+        if state is None:
+            state = _ClientState(TokenBucket(self.capacity, self.rate, now))
+            self._clients[key] = state
+            if len(self._clients) > self.max_keys:
+                self._clients.popitem(last=False)
+        else:
+            self._clients.move_to_end(key)
+        return state
+
+    async def _lease(self, key: str, requested: int, cost: int) -> tuple:
+        redis = get_redis_client("limiter")
+        granted, wait = await redis.eval(
+            TOKEN_BUCKET_SCRIPT, 1, KEY_PREFIX + key,
+            self.capacity, self.rate, requested, cost
+        )
+        return int(granted), float(wait)
+
+    async def hit(self, key: str, cost: int = 1) -> float:
+        """Spend `cost` tokens for `key`; returns 0 if allowed, else seconds until retry"""
+        now = self.clock()
+        state = self._state(key, now)
+        if state.denied_until > now:
+            self.local_hits += 1
+            return state.denied_until - now
+        if state.leased >= cost and state.lease_expires > now:
+            self.local_hits += 1
+            state.leased -= cost
+            return 0.0
+
+        if is_cache_initialized("limiter"):
+            # Only busy clients lease ahead, so idle ones forfeit nothing
+            requested = max(cost, self.lease_size) if now - state.last_lease < self.lease_ttl else cost
+            try:
+                granted, wait = await self._lease(key, requested, cost)
+                self.redis_hits += 1
+                state.last_lease = now
+                if granted < cost:
+                    state.leased = 0
+                    state.denied_until = now + wait
+                    return wait
+                state.leased = granted - cost
+                state.lease_expires = now + self.lease_ttl
+                return 0.0
+            except Exception as e:
+                logger.warning(f"Rate limiter falling back to local bucket: {str(e)}")
+
+        self.degraded_hits += 1
+        return state.fallback.take(now, cost)
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self._clients),
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "degraded_hits": self.degraded_hits,
+        }
+
+def client_key(connection: HTTPConnection) -> str:
+    """
+    Identify the caller by IP address.
+
+    Behind the Azure ingress the real address is the last X-Forwarded-For
+    entry, the one the proxy appended; earlier entries are client-supplied.
+    """
+    forwarded = connection.headers.get("x-forwarded-for")
+    if forwarded:
+        return forwarded.rsplit(",", 1)[-1].strip()
+    return connection.client.host if connection.client else "unknown"
+
+# Creating stars and voting (likes and dislikes share one bucket) are limited separately
+create_limiter = RateLimiter(settings.API.RATE_LIMIT_TIMES, settings.API.RATE_LIMIT_SECONDS)
+vote_limiter = RateLimiter(settings.API.RATE_LIMIT_VOTE_TIMES, settings.API.RATE_LIMIT_SECONDS)
+
+async def check_rate_limit(limiter: RateLimiter, scope: str, connection: HTTPConnection, cost: int = 1) -> float:
+    """Spend tokens for the caller; returns 0 if allowed, else seconds until retry"""
+    return await limiter.hit(f"{scope}:{client_key(connection)}", cost)
+
+def rate_limit(limiter: RateLimiter, scope: str):
+    """Route dependency answering 429 with Retry-After once a client's bucket is empty"""
+    async def dependency(request: Request) -> None:
+        retry_after = await check_rate_limit(limiter, scope, request)
+        if retry_after > 0:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests",
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+    return dependency
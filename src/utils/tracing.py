@@ -0,0 +1,99 @@
+"""
+Per-request timing spans.
+Storage calls, Redis commands, serialization, compression and event publishing
+record how long they took against the current request. The middleware sums
+them per category into a Server-Timing header, so browser devtools show where
+a slow request spent its time, and logs the full span list for a sample of
+requests.
+"""
+
+import contextvars
+import logging
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class RequestTrace:
+    """Spans recorded while handling one request"""
+
+    __slots__ = ("start", "spans")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        # (category, start offset, duration), all in seconds. Worker threads
+        # append here too; list.append is atomic so no lock is needed.
+        self.spans: List[Tuple[str, float, float]] = []
+
+    def add(self, name: str, start: float, duration: float) -> None:
+        self.spans.append((name, start - self.start, duration))
+
+    def totals(self) -> Dict[str, Tuple[float, int]]:
+        """Summed duration and span count per category, in first-seen order"""
+        totals: Dict[str, Tuple[float, int]] = {}
+        for name, _, duration in list(self.spans):
+            total, count = totals.get(name, (0.0, 0))
+            totals[name] = (total + duration, count + 1)
+        return totals
+
+    def server_timing(self, total: float) -> str:
+        """Server-Timing header value; durations are in milliseconds"""
+        parts = [f"{name};dur={duration * 1000:.1f}" for name, (duration, _) in self.totals().items()]
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+    def export(self) -> List[Dict[str, Any]]:
+        return [
+            {"name": name, "offset_ms": round(offset * 1000, 3), "duration_ms": round(duration * 1000, 3)}
+            for name, offset, duration in list(self.spans)
+        ]
+
+_current: contextvars.ContextVar[Optional[RequestTrace]] = contextvars.ContextVar("request_trace", default=None)
+
+def start_trace() -> Tuple[RequestTrace, contextvars.Token]:
+    """Begin tracing the current request; pass the token to end_trace"""
+    trace = RequestTrace()
+    return trace, _current.set(trace)
+
+def end_trace(token: contextvars.Token) -> None:
+    _current.reset(token)
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current.get()
+
+def record_span(name: str, start: float, duration: float) -> None:
+    """Add a span measured with time.perf_counter to the current request, if any"""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, start, duration)
+
+class span:
+    """Context manager timing its block as a span of the current request"""
+
+    __slots__ = ("name", "trace", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.trace = _current.get()
+        if self.trace is not None:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.trace is not None:
+            self.trace.add(self.name, self.start, time.perf_counter() - self.start)
+        return False
+
+def should_export(sample_rate: float) -> bool:
+    return sample_rate > 0 and random.random() < sample_rate
+
+def export_trace(trace: RequestTrace, method: str, path: str, status: int, total: float) -> None:
+    """Log a sampled request's spans as one structured record"""
+    logger.info(
+        "trace %s %s %s %.1fms", method, path, status, total * 1000,
+        extra={"trace": {"method": method, "path": path, "status": status,
+                         "duration_ms": round(total * 1000, 3), "spans": trace.export()}}
+    )
@@ -1,2 +1,2 @@
-# This file makes the tests directory a proper package
+# This file makes the tests directory a proper package
 # which helps with imports 
\ No newline at end of file
@@ -0,0 +1,51 @@
+import asyncio
+import gzip
+
+import pytest
+
+from src.api import compression
+from src.api.compression import CompressedBodyCache, negotiate_encoding
+
+def test_negotiate_encoding():
+    """Test that the preferred accepted coding is chosen"""
+    assert negotiate_encoding(None) == "identity"
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=0, identity") == "identity"
+    assert negotiate_encoding("deflate") == "identity"
+    if "br" in compression.COMPRESSORS:
+        assert negotiate_encoding("gzip, deflate, br") == "br"
+        assert negotiate_encoding("br;q=0.5, gzip") == "gzip"
+        assert negotiate_encoding("*") == "br"
+    else:
+        assert negotiate_encoding("*") == "gzip"
+
+def test_body_built_and_compressed_once_per_key():
+    """Test that concurrent requests share one build and one compression"""
+    cache = CompressedBodyCache()
+    builds = []
+
+    async def build():
+        builds.append(1)
+        await asyncio.sleep(0)
+        return b'{"stars":[' + b'"x",' * 1000 + b'"x"]}'
+
+    async def scenario():
+        results = await asyncio.gather(*(cache.get("g.1", build, "gzip") for _ in range(5)))
+        identity = await cache.get("g.1", build)
+        changed = await cache.get("g.2", build, "gzip")
+        return results, identity, changed
+
+    results, identity, changed = asyncio.run(scenario())
+    assert len(builds) == 2
+    assert {encoding for encoding, _ in results} == {"gzip"}
+    assert all(body is results[0][1] for _, body in results)
+    assert gzip.decompress(results[0][1]) == identity[1]
+    assert changed[0] == "gzip"
+
+def test_small_bodies_are_not_compressed():
+    """Test that bodies under MIN_COMPRESS_SIZE are sent as identity"""
+    async def build():
+        return b"[]"
+
+    cache = CompressedBodyCache()
+    assert asyncio.run(cache.get("g.1", build, "gzip")) == ("identity", b"[]")
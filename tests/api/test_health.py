@@ -1,13 +1,49 @@
-import pytest
-from fastapi.testclient import TestClient
-from src.main import app
-
-# Create a test client
-client = TestClient(app)
-
-# Test health check endpoint
-def test_health_check():
-    """Test that health check endpoint returns 200 and healthy status"""
-    response = client.get("/health")
-    assert response.status_code == 200
-    assert response.json()["status"] == "healthy" 
\ No newline at end of file
+import pytest
+from unittest.mock import MagicMock
+from fastapi.testclient import TestClient
+from src.main import app
+from src.db import redis_cache
+from src.db.redis_cache import CircuitBreaker, InstrumentedConnectionPool
+
+# Create a test client
+client = TestClient(app)
+
+# Test health check endpoint
+def test_health_check():
+    """Test that health check endpoint returns 200 and healthy status"""
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json()["status"] == "healthy"
+
+class FakeRedis:
+    """Answers the diagnostics commands with a real, unopened connection pool"""
+
+    def __init__(self):
+        self.connection_pool = InstrumentedConnectionPool(role="cache", max_connections=4)
+
+    async def info(self):
+        return {"redis_version": "7.2.0", "used_memory_human": "1M", "uptime_in_days": 3}
+
+    async def client_list(self):
+        return [{"id": "1"}, {"id": "2"}]
+
+# Test the Redis diagnostics endpoint with Redis set up
+def test_redis_info_reports_pools_and_breakers(monkeypatch):
+    """Test that /health/redis reports pool stats and each role's breaker"""
+    monkeypatch.setattr(redis_cache, "FastAPICache", MagicMock())
+    monkeypatch.setitem(redis_cache._clients, "cache", FakeRedis())
+    counters = CircuitBreaker(1, 1.0, 60.0)
+    counters.before_call()
+    counters.record(0.0, failed=True)
+    monkeypatch.setitem(redis_cache.breakers, "counters", counters)
+
+    response = client.get("/health/redis")
+
+    assert response.status_code == 200
+    info = response.json()
+    assert info["status"] == "connected"
+    assert info["clients"] == 2
+    assert info["pools"]["cache"]["size"] == 4
+    assert info["breakers"]["cache"]["circuit_open"] is False
+    assert info["breakers"]["counters"]["circuit_open"] is True
+    assert info["breakers"]["counters"]["trips"] == 1
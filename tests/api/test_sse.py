@@ -1,46 +1,92 @@
-import pytest
-import asyncio
-from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock, AsyncMock
-import json
-
-from src.main import app
-from src.api.sse import star_event_queue
-
-# Create a test client
-client = TestClient(app)
-
-# Mock dependencies
-@pytest.fixture
-def mock_star_event_queue():
-    """Mock the star event queue for testing SSE endpoints"""
-    with patch('src.api.sse.star_event_queue') as mock_queue:
-        # Configure the mock to return test events when needed
-        yield mock_queue
-
-# Test SSE connection - skipping for now as it requires complex async mocking
-@pytest.mark.skip(reason="SSE testing requires proper async setup - to be implemented")
-def test_sse_connection():
-    """Test that SSE endpoint establishes a connection and sends keep-alive"""
-    with client.stream("GET", "/events/stars") as response:
-        # Verify the response headers
-        assert response.status_code == 200
-        assert response.headers["content-type"] == "text/event-stream"
-        
-        # Get the first message (should be a keep-alive)
-        for line in response.iter_lines():
-            if line:
-                assert line.startswith(b"data: ")
-                assert line.endswith(b"\n\n")
-                break
-
-# TODO: Implement a proper test that sets up the async environment correctly
-@pytest.mark.skip(reason="SSE endpoint testing requires proper async setup - to be implemented")
-def test_sse_endpoint_exists():
-    """Simple test to verify the SSE endpoint route exists (doesn't test streaming)"""
-    # This just tests route registration, not the actual SSE functionality
-    with patch('src.api.sse.star_event_queue'):
-        response = client.get("/events/stars")
-        assert response.status_code != 404, "SSE endpoint should exist"
-
-# Add more tests for event publishing, receiving different event types, etc. 
\ No newline at end of file
+import pytest
+import asyncio
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.api.sse_hub import ConnectionHub, KEEPALIVE_FRAME
+
+# Create a test client
+client = TestClient(app)
+
+# Test the stream statistics endpoint
+def test_sse_stats_endpoint():
+    """Test that the stats endpoint reports the hub state"""
+    response = client.get("/events/stars/stats")
+    assert response.status_code == 200
+    assert response.json()["hub"]["connections"] == 0
+
+@pytest.mark.asyncio
+async def test_hub_broadcast_and_heartbeat():
+    """Test that broadcast frames reach a connection and idle clients get keep-alives"""
+    hub = ConnectionHub(heartbeat_interval=0.01, queue_size=8)
+    conn = hub.register()
+    frames = conn.frames()
+
+    assert hub.broadcast({"type": "delete", "data": {"id": "1"}}) == 1
+    assert await frames.__anext__() == 'data: {"type": "delete", "data": {"id": "1"}}\n\n'
+
+    # Nothing published, so the shared heartbeat should send a keep-alive
+    assert await asyncio.wait_for(frames.__anext__(), timeout=1.0) == KEEPALIVE_FRAME
+    assert hub.stats()["connections"] == 1
+
+    hub.unregister(conn)
+    assert len(hub) == 0
+    await hub.close()
+
+@pytest.mark.asyncio
+async def test_hub_drops_slow_connections():
+    """Test that a connection with a full queue is dropped instead of blocking the publisher"""
+    hub = ConnectionHub(heartbeat_interval=60, queue_size=2)
+    conn = hub.register()
+
+    for i in range(2):
+        hub.broadcast({"type": "delete", "data": {"id": str(i)}})
+    assert hub.broadcast({"type": "delete", "data": {"id": "2"}}) == 0
+    assert hub.stats()["total_dropped"] == 1
+
+    # The dropped stream ends without delivering the backlog
+    with pytest.raises(StopAsyncIteration):
+        await conn.frames().__anext__()
+    await hub.close()
+
+@pytest.mark.asyncio
+async def test_stream_unregisters_on_disconnect_during_send():
+    """Test that a client that disconnects while a frame is being written leaves the hub"""
+    from src.api.sse_hub import hub
+    from src.api.sse_publisher import publish_star_event
+
+    started = asyncio.Event()
+    stuck = asyncio.Event()
+    disconnected = asyncio.Event()
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            started.set()
+        elif message.get("body"):
+            # A client that stopped reading: the write never completes
+            stuck.set()
+            await asyncio.Event().wait()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/events/stars/stream", "raw_path": b"/events/stars/stream",
+        "query_string": b"", "root_path": "", "headers": [], "client": ("127.0.0.1", 1), "server": ("test", 80),
+    }
+    stream = asyncio.create_task(app(scope, receive, send))
+    await asyncio.wait_for(started.wait(), timeout=1.0)
+    await publish_star_event("delete", {"id": "1"})
+    await asyncio.wait_for(stuck.wait(), timeout=1.0)
+    assert len(hub) == 1
+
+    disconnected.set()
+    await asyncio.wait_for(stream, timeout=1.0)
+    assert len(hub) == 0
@@ -1,113 +1,235 @@
-import pytest
-import time
-from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
-import sys
-
-from src.main import app
-from src.models.star import Star
-
-# Create a test client
-client = TestClient(app)
-
-# Apply patches for critical dependencies
-patches = [
-    patch('src.api.stars.tables', {"Stars": MagicMock(), "UserStars": MagicMock()}),
-    patch('src.db.redis_cache.FastAPILimiter', MagicMock()),
-    patch('src.db.redis_cache.aioredis', MagicMock()),
-    patch('src.db.redis_cache.FastAPICache', MagicMock())
-]
-
-# Start all the patches
-for p in patches:
-    p.start()
-
-# Create a mock limiter
-mock_limiter = MagicMock()
-mock_limiter.limit = lambda x: lambda func: func
-sys.modules['src.db.redis_cache'].limiter = mock_limiter
-
-# Test creating a star
-def test_create_star():
-    """Test creating a new star"""
-    # Test data
-    test_star = {
-        "x": 0.5,
-        "y": 0.5,
-        "message": "Test Star"
-    }
-    
-    # Make request
-    response = client.post("/stars", json=test_star)
-    
-    # Assertions
-    assert response.status_code == 200
-    assert "id" in response.json()  # Check UUID was generated
-    assert response.json()["x"] == test_star["x"]
-    assert response.json()["y"] == test_star["y"]
-    assert response.json()["message"] == test_star["message"]
-
-# Test getting stars
-def test_get_stars():
-    """Test retrieving all stars"""
-    # Setup mock return data
-    from src.api.stars import tables
-    current_time = time.time()
-    tables["Stars"].list_entities.return_value = [
-        {
-            "PartitionKey": "STAR_202310",
-            "RowKey": "1",
-            "X": 0.5,
-            "Y": 0.5,
-            "Message": "Test Star",
-            "Brightness": 100.0,
-            "LastLiked": current_time,
-            "CreatedAt": current_time
-        }
-    ]
-    
-    # Make request
-    response = client.get("/stars")
-    
-    # Assertions
-    assert response.status_code == 200
-    assert len(response.json()) == 1
-    star = response.json()[0]
-    assert star["id"] == "1"
-    assert star["x"] == 0.5
-    assert star["y"] == 0.5
-    assert star["message"] == "Test Star"
-
-# Test validation of coordinates
-def test_validate_coordinates():
-    """Test that coordinates are validated"""
-    # Test invalid x coordinate
-    test_star = {
-        "x": 2.0,  # Invalid - outside range
-        "y": 0.5,
-        "message": "Invalid Star"
-    }
-    response = client.post("/stars", json=test_star)
-    assert response.status_code == 422  # Validation error
-    
-    # Test invalid y coordinate
-    test_star = {
-        "x": 0.5,
-        "y": -2.0,  # Invalid - outside range
-        "message": "Invalid Star"
-    }
-    response = client.post("/stars", json=test_star)
-    assert response.status_code == 422  # Validation error
-
-# Test message length validation
-def test_validate_message_length():
-    """Test that message length is validated"""
-    # Create a message that's too long (over 280 chars)
-    long_message = "x" * 300
-    test_star = {
-        "x": 0.5,
-        "y": 0.5,
-        "message": long_message
-    }
-    response = client.post("/stars", json=test_star)
+import pytest
+import time
+from fastapi.testclient import TestClient
+from unittest.mock import patch, MagicMock, AsyncMock
+import sys
+
+from src.main import app
+from src.models.star import Star
+
+# Create a test client
+client = TestClient(app)
+
+# Apply patches for critical dependencies
+patches = [
+    patch('src.db.azure_tables.tables', {"Stars": MagicMock(), "UserStars": MagicMock()}),
+    patch('src.db.redis_cache.FastAPILimiter', MagicMock()),
+    patch('src.db.redis_cache.aioredis', MagicMock()),
+    patch('src.db.redis_cache.FastAPICache', MagicMock()),
+    patch('src.utils.rate_limit.check_rate_limit', AsyncMock(return_value=0.0))
+]
+
+# Start all the patches
+for p in patches:
+    p.start()
+
+# Create a mock limiter
+mock_limiter = MagicMock()
+mock_limiter.limit = lambda x: lambda func: func
+sys.modules['src.db.redis_cache'].limiter = mock_limiter
+
+def teardown_module():
+    """Undo the module-wide patches so later test modules see the real dependencies"""
+    for p in patches:
+        p.stop()
+
+# Test creating a star
+def test_create_star():
+    """Test creating a new star"""
+    # Test data
+    test_star = {
+        "x": 0.5,
+        "y": 0.5,
+        "message": "Test Star"
+    }
+    
+    # Make request
+    response = client.post("/stars", json=test_star)
+    
+    # Assertions
+    assert response.status_code == 200
+    assert "id" in response.json()  # Check UUID was generated
+    assert response.json()["x"] == test_star["x"]
+    assert response.json()["y"] == test_star["y"]
+    assert response.json()["message"] == test_star["message"]
+
+# Test getting stars
+def test_get_stars():
+    """Test retrieving all stars"""
+    # Setup mock return data
+    from src.db.azure_tables import tables
+    current_time = time.time()
+    tables["Stars"].list_entities.return_value = [
+        {
+            "PartitionKey": "STAR_202310",
+            "RowKey": "1",
+            "X": 0.5,
+            "Y": 0.5,
+            "Message": "Test Star",
+            "Brightness": 100.0,
+            "LastLiked": current_time,
+            "CreatedAt": current_time
+        }
+    ]
+    
+    # Make request
+    response = client.get("/stars")
+    
+    # Assertions
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+    star = response.json()[0]
+    assert star["id"] == "1"
+    assert star["x"] == 0.5
+    assert star["y"] == 0.5
+    assert star["message"] == "Test Star"
+
+# Test conditional requests on the star list
+def test_get_stars_etag():
+    """Test that an unchanged star list is answered with 304 Not Modified"""
+    response = client.get("/stars")
+    etag = response.headers["ETag"]
+
+    response = client.get("/stars", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    # Any mutation bumps the version and invalidates the ETag
+    client.post("/stars", json={"x": 0.1, "y": 0.1, "message": "New Star"})
+    response = client.get("/stars", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+# Test precompressed full star list
+def test_get_stars_compressed():
+    """Test that the full star list is served with a negotiated Content-Encoding"""
+    from src.db.azure_tables import tables
+    from src.db.versioning import StarVersion
+    tables["Stars"].list_entities.return_value = [
+        {"PartitionKey": "STAR_202310", "RowKey": str(i), "X": 0.5, "Y": 0.5, "Message": f"Star {i}"}
+        for i in range(100)
+    ]
+    # A mutation moves the version on so the new list is loaded
+    client.post("/stars", json={"x": 0.1, "y": 0.1, "message": "New Star"})
+
+    response = client.get("/stars", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert len(response.json()) == 100
+    gzip_etag = response.headers["ETag"]
+
+    response = client.get("/stars", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in response.headers
+    assert len(response.json()) == 100
+    # Different codings are different representations
+    identity_etag = response.headers["ETag"]
+    assert identity_etag != gzip_etag
+    assert StarVersion.parse(identity_etag) == StarVersion.parse(gzip_etag)
+
+    response = client.get("/stars", headers={"Accept-Encoding": "gzip", "If-None-Match": gzip_etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == gzip_etag
+    assert response.headers["Vary"] == "Accept-Encoding"
+
+# Test delta sync of star changes
+def test_get_star_changes():
+    """Test that changes since a version are returned, and unknown versions ask for a resync"""
+    since = client.get("/stars").headers["ETag"].strip('"')
+    created = client.post("/stars", json={"x": 0.2, "y": 0.3, "message": "Delta Star"}).json()
+
+    response = client.get("/stars/changes", params={"since": since})
+    assert response.status_code == 200
+    assert response.json()["changes"] == [{"op": "create", **created}]
+    # Without Redis the ETag also carries a time bucket; it parses back to the version
+    from src.db.versioning import StarVersion
+    assert response.json()["version"] == str(StarVersion.parse(client.get("/stars").headers["ETag"]))
+
+    response = client.get("/stars/changes", params={"since": "unknown.1"})
+    assert response.status_code == 410
+    assert response.json()["resync"] is True
+
+    response = client.get("/stars/changes", params={"since": "not-a-version"})
+    assert response.status_code == 400
+
+# Test that /popular is not taken for a star id
+def test_get_popular_stars_route():
+    """Test that /stars/popular reaches the popular stars endpoint"""
+    from src.db.azure_tables import tables
+    tables["Stars"].query_entities.reset_mock()
+
+    response = client.get("/stars/popular")
+
+    assert response.status_code == 200
+    assert response.json() == []
+    tables["Stars"].query_entities.assert_not_called()
+
+# Test that storage throttling is not hidden by the active list
+def test_get_active_stars_reports_throttling():
+    """Test that a throttled table read answers 503 instead of an empty list"""
+    from azure.core.exceptions import HttpResponseError
+    from src.db.azure_tables import tables
+    throttled = HttpResponseError(message="The server is busy.")
+    throttled.status_code = 503
+    tables["Stars"].list_entities.side_effect = throttled
+    try:
+        response = client.get("/stars/active")
+    finally:
+        tables["Stars"].list_entities.side_effect = None
+
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+
+# Test the viewport query
+def test_get_stars_in_viewport():
+    """Test that only stars inside the rectangle are returned and inverted or non-finite edges are refused"""
+    from src.db.azure_tables import tables
+    tables["Stars"].list_entities.return_value = [
+        {"PartitionKey": "STAR_202310", "RowKey": "in", "X": 0.2, "Y": 0.2, "Message": "In", "LastLiked": 1.0},
+        {"PartitionKey": "STAR_202310", "RowKey": "out", "X": 0.8, "Y": 0.2, "Message": "Out", "LastLiked": 1.0}
+    ]
+
+    response = client.get("/stars/viewport", params={"x_min": 0, "y_min": 0, "x_max": 0.5, "y_max": 0.5})
+    assert response.status_code == 200
+    assert [star["id"] for star in response.json()] == ["in"]
+
+    response = client.get("/stars/viewport", params={"x_min": 0.5, "y_min": 0, "x_max": 0, "y_max": 0.5})
+    assert response.status_code == 400
+
+    for bad in ("nan", "inf", "-inf"):
+        response = client.get("/stars/viewport", params={"x_min": bad, "y_min": 0, "x_max": 0.5, "y_max": 0.5})
+        assert response.status_code == 422
+
+# Test validation of coordinates
+def test_validate_coordinates():
+    """Test that coordinates are validated"""
+    # Test invalid x coordinate
+    test_star = {
+        "x": 2.0,  # Invalid - outside range
+        "y": 0.5,
+        "message": "Invalid Star"
+    }
+    response = client.post("/stars", json=test_star)
+    assert response.status_code == 422  # Validation error
+    
+    # Test invalid y coordinate
+    test_star = {
+        "x": 0.5,
+        "y": -2.0,  # Invalid - outside range
+        "message": "Invalid Star"
+    }
+    response = client.post("/stars", json=test_star)
+    assert response.status_code == 422  # Validation error
+
+# Test message length validation
+def test_validate_message_length():
+    """Test that message length is validated"""
+    # Create a message that's too long (over 280 chars)
+    long_message = "x" * 300
+    test_star = {
+        "x": 0.5,
+        "y": 0.5,
+        "message": long_message
+    }
+    response = client.post("/stars", json=test_star)
     assert response.status_code == 422  # Validation error 
\ No newline at end of file
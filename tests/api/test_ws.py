@@ -0,0 +1,102 @@
+import pytest
+import uuid
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.api.event_codec import (
+    DELETE_BATCH_CODE, DELETE_BATCH_LAYOUT, UPDATE_LAYOUT, decode_like_batch, encode_struct
+)
+
+# Create a test client
+client = TestClient(app)
+
+# Test the fixed struct layout for update events
+def test_struct_encoding_for_updates():
+    """Test that update events are packed into 25 byte binary frames"""
+    star_id = str(uuid.uuid4())
+    frame = encode_struct({"type": "update", "data": {"id": star_id, "last_liked": 12.5}})
+
+    assert isinstance(frame, bytes)
+    assert len(frame) == UPDATE_LAYOUT.size
+    type_code, raw_id, last_liked = UPDATE_LAYOUT.unpack(frame)
+    assert type_code == 2
+    assert str(uuid.UUID(bytes=raw_id)) == star_id
+    assert last_liked == 12.5
+
+    # Events that don't fit the layout fall back to JSON text
+    assert isinstance(encode_struct({"type": "create", "data": {"id": star_id, "x": 0.1}}), str)
+
+# Test the batched delete layout
+def test_struct_encoding_for_batched_deletes():
+    """Test that a batched delete packs a count and every UUID into one frame"""
+    star_ids = [str(uuid.uuid4()) for _ in range(3)]
+    frame = encode_struct({"type": "delete", "data": {"ids": star_ids}})
+    assert DELETE_BATCH_LAYOUT.unpack_from(frame) == (DELETE_BATCH_CODE, 3)
+    assert frame[DELETE_BATCH_LAYOUT.size:] == b"".join(uuid.UUID(star_id).bytes for star_id in star_ids)
+    # Ids the layout cannot carry fall back to JSON
+    assert isinstance(encode_struct({"type": "delete", "data": {"ids": ["debug-star"]}}), str)
+
+# Test decoding binary like batches
+def test_decode_binary_like_batch():
+    """Test that concatenated UUIDs decode into a list of star ids"""
+    star_ids = [str(uuid.uuid4()) for _ in range(3)]
+    message = b"".join(uuid.UUID(star_id).bytes for star_id in star_ids)
+    assert decode_like_batch("struct", message) == star_ids
+
+    with pytest.raises(ValueError):
+        decode_like_batch("struct", b"\x00" * 15)
+
+# Test the WebSocket endpoint
+def test_websocket_like_batch_ack():
+    """Test that a like batch over the socket is acknowledged"""
+    with client.websocket_connect("/events/stars/ws", subprotocols=["starmap.struct"]) as websocket:
+        assert websocket.accepted_subprotocol == "starmap.struct"
+        websocket.send_json({"likes": ["missing-star"]})
+        ack = websocket.receive_json()
+        assert ack["type"] == "ack"
+        assert ack["failed"] == ["missing-star"]
+
+def test_websocket_like_batch_isolates_failures(monkeypatch):
+    """Test that each like gets its own deadline and a failing like only fails itself"""
+    from src.api import ws
+    from src.config.settings import settings
+    from src.utils.deadline import remaining
+
+    budgets = []
+
+    async def like_star(star_id):
+        budgets.append(remaining())
+        if star_id == "broken":
+            raise RuntimeError("storage exploded")
+
+    monkeypatch.setattr(ws, "like_star", like_star)
+    with client.websocket_connect("/events/stars/ws") as websocket:
+        websocket.send_json({"likes": ["a", "broken", "b"]})
+        ack = websocket.receive_json()
+        assert ack == {"type": "ack", "liked": ["a", "b"], "failed": ["broken"]}
+        # The socket is still usable after a failed like
+        websocket.send_json({"likes": ["c"]})
+        assert websocket.receive_json()["liked"] == ["c"]
+
+    assert len(budgets) == 4
+    assert all(0 < left <= settings.API.WRITE_DEADLINE for left in budgets)
+
+def test_websocket_like_batch_fits_the_vote_bucket(monkeypatch):
+    """Test that oversize batches are refused before the limiter and a full batch is granted"""
+    from src.api import ws
+    from src.utils.rate_limit import RateLimiter
+
+    async def like_star(star_id):
+        pass
+
+    monkeypatch.setattr(ws, "like_star", like_star)
+    monkeypatch.setattr(ws, "vote_limiter", RateLimiter(ws.vote_limiter.capacity, 60))
+    assert ws.MAX_LIKE_BATCH <= ws.vote_limiter.capacity
+    with client.websocket_connect("/events/stars/ws") as websocket:
+        websocket.send_json({"likes": [f"s{i}" for i in range(ws.MAX_LIKE_BATCH + 1)]})
+        assert websocket.receive_json()["type"] == "error"
+        # The refused batch spent nothing, so a full one still fits
+        websocket.send_json({"likes": [f"s{i}" for i in range(ws.MAX_LIKE_BATCH)]})
+        ack = websocket.receive_json()
+        assert ack["type"] == "ack"
+        assert len(ack["liked"]) == ws.MAX_LIKE_BATCH
@@ -0,0 +1,59 @@
+import asyncio
+
+from azure.core.exceptions import ResourceNotFoundError
+
+from src.db import azure_tables
+from src.db.azure_tables import get_star_entity
+from src.utils.metrics import storage_duration, storage_entities
+
+class FakeStarsTable:
+    def __init__(self, entities):
+        self.entities = {entity["RowKey"]: entity for entity in entities}
+        self.queries = 0
+        self.point_reads = 0
+
+    def query_entities(self, query_filter, parameters=None, **kwargs):
+        self.queries += 1
+        entity = self.entities.get(parameters["id"])
+        return iter([entity] if entity else [])
+
+    def get_entity(self, partition_key, row_key, **kwargs):
+        self.point_reads += 1
+        entity = self.entities.get(row_key)
+        if entity is None or entity["PartitionKey"] != partition_key:
+            raise ResourceNotFoundError("Not found")
+        return entity
+
+def test_get_star_entity_learns_partitions():
+    """Test that a star found by query is read by partition and row key afterwards"""
+    star = {"PartitionKey": "STAR_202501", "RowKey": "lookup-star", "X": 0.1, "Y": 0.2}
+    table = FakeStarsTable([star])
+    azure_tables.forget_star_partition("lookup-star")
+
+    assert asyncio.run(get_star_entity(table, "lookup-star")) == star
+    assert asyncio.run(get_star_entity(table, "lookup-star")) == star
+    assert (table.queries, table.point_reads) == (1, 1)
+
+    # A deleted star is forgotten
+    del table.entities["lookup-star"]
+    assert asyncio.run(get_star_entity(table, "lookup-star")) is None
+    assert asyncio.run(get_star_entity(table, "lookup-star")) is None
+    assert (table.queries, table.point_reads) == (2, 2)
+
+def test_instrumented_table_counts_pages_and_entities():
+    """Test that each page fetch is timed as one call and its entities are counted"""
+    class PagedResult:
+        def by_page(self):
+            return iter([[{"RowKey": "a"}, {"RowKey": "b"}], [{"RowKey": "c"}]])
+
+    class Client:
+        def query_entities(self, query_filter, **kwargs):
+            return PagedResult()
+
+    table = azure_tables.InstrumentedTableClient(Client(), "MetricsTest")
+    labels = ("MetricsTest", "query_entities")
+    calls_before = storage_duration.count(*labels)
+
+    assert [entity["RowKey"] for entity in table.query_entities("PartitionKey eq 'x'")] == ["a", "b", "c"]
+    assert storage_duration.count(*labels) - calls_before == 2
+    assert storage_entities.value(*labels) == 3
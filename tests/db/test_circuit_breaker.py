@@ -0,0 +1,85 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.db import redis_cache
+from src.db.redis_cache import CircuitBreaker, CircuitOpenError
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def make_breaker():
+    clock = FakeClock()
+    return CircuitBreaker(failure_threshold=3, slow_call_seconds=0.1, reset_seconds=10, clock=clock), clock
+
+def fail(breaker, times=1, elapsed=0.01, failed=True):
+    for _ in range(times):
+        breaker.before_call()
+        breaker.record(elapsed, failed)
+
+def test_trips_after_consecutive_failures():
+    """Test that the breaker opens after the threshold and rejects calls at once"""
+    breaker, _ = make_breaker()
+    fail(breaker, 2)
+    fail(breaker, failed=False)
+    fail(breaker, 2)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    fail(breaker)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.stats()["trips"] == 1
+    assert breaker.stats()["rejected"] == 1
+
+def test_slow_calls_count_as_failures():
+    breaker, _ = make_breaker()
+    fail(breaker, 3, elapsed=0.5, failed=False)
+    assert breaker.state == CircuitBreaker.OPEN
+
+def test_half_open_probe():
+    """Test that one probe is let through after the reset time and decides the state"""
+    breaker, clock = make_breaker()
+    fail(breaker, 3)
+    clock.now += 10
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record(0.01, failed=True)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now += 10
+    breaker.before_call()
+    breaker.record(0.01, failed=False)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_abandoned_probe_frees_slot():
+    breaker, clock = make_breaker()
+    fail(breaker, 3)
+    clock.now += 10
+    breaker.before_call()
+    breaker.abandon()
+    breaker.before_call()
+
+def test_is_cache_initialized_reflects_breaker(monkeypatch):
+    """Test that an open breaker makes only its own role report Redis unavailable"""
+    breaker, clock = make_breaker()
+    fastapi_cache = MagicMock()
+    monkeypatch.setitem(redis_cache.breakers, "counters", breaker)
+    monkeypatch.setattr(redis_cache, "FastAPICache", fastapi_cache)
+    assert redis_cache.is_cache_initialized("counters")
+
+    fail(breaker, 3)
+    assert not redis_cache.is_cache_initialized("counters")
+    assert redis_cache.is_cache_initialized()
+    clock.now += 10
+    assert redis_cache.is_cache_initialized("counters")
+
+    fastapi_cache._backend = None
+    assert not redis_cache.is_cache_initialized()
@@ -0,0 +1,55 @@
+import asyncio
+import threading
+import time
+
+from src.db.hedging import HedgePolicy, LatencyWindow
+
+def warmed_policy(**kwargs):
+    policy = HedgePolicy(enabled=True, min_samples=10, min_delay=0.0, **kwargs)
+    for _ in range(10):
+        policy.latency.add(0.01)
+    return policy
+
+def test_latency_window_percentile():
+    window = LatencyWindow(size=100, refresh_every=1)
+    for ms in range(1, 101):
+        window.add(ms / 1000)
+    assert window.percentile(95) == 0.095
+    assert window.percentile(50) == 0.05
+
+def test_no_hedge_before_enough_samples():
+    policy = HedgePolicy(enabled=True, min_samples=10)
+    assert asyncio.run(policy.call(lambda: "ok")) == "ok"
+    assert policy.hedge_delay() is None
+    assert policy.stats()["hedged"] == 0
+
+def test_slow_read_is_hedged_and_hedge_wins():
+    """Test that a read slower than the percentile is retried and the faster copy is used"""
+    policy = warmed_policy(max_extra_load=1.0)
+    calls = []
+    lock = threading.Lock()
+
+    def read():
+        with lock:
+            calls.append(1)
+            first = len(calls) == 1
+        # The first copy stalls, the hedge answers quickly
+        time.sleep(0.5 if first else 0.0)
+        return "slow" if first else "fast"
+
+    assert asyncio.run(policy.call(read)) == "fast"
+    stats = policy.stats()
+    assert stats["hedged"] == 1
+    assert stats["hedge_wins"] == 1
+
+def test_hedging_respects_budget():
+    """Test that hedges stop once the extra load budget is spent"""
+    policy = warmed_policy(max_extra_load=0.0)
+
+    def read():
+        time.sleep(0.05)
+        return "ok"
+
+    assert asyncio.run(policy.call(read)) == "ok"
+    assert policy.stats()["hedged"] == 0
+    assert policy.stats()["budget_exhausted"] == 1
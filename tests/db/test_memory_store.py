@@ -0,0 +1,168 @@
+import asyncio
+import os
+import shutil
+import time
+
+import pytest
+
+from src.db import memory_store
+from src.db.memory_store import MemoryProvider
+
+def star(star_id, x=0.0, y=0.0, last_liked=100.0, user_id=None):
+    return {
+        "PartitionKey": "STAR_202401",
+        "RowKey": star_id,
+        "X": x,
+        "Y": y,
+        "Message": f"Star {star_id}",
+        "LastLiked": last_liked,
+        "creationDate": 10.0,
+        "UserId": user_id,
+        "Username": None
+    }
+
+def ids(found):
+    return sorted(entity["RowKey"] for entity in found)
+
+@pytest.fixture(params=[False, True], ids=["records", "columnar"])
+def store(request, tmp_path):
+    if request.param:
+        pytest.importorskip("numpy")
+    provider = MemoryProvider(str(tmp_path / "data"), snapshot_interval=3600, columnar=request.param).open()
+    yield provider
+    provider.close()
+
+@pytest.mark.asyncio
+async def test_crash_recovery_replays_snapshot_and_journal(store, tmp_path):
+    """Test that a copy of a live store's files recovers every acknowledged write"""
+    for i in range(20):
+        await store.create_star(star(f"s{i}", i / 20, -i / 20, user_id=f"u{i % 3}"))
+    store.snapshot()
+    await store.update_star(dict(star("s1", user_id="u1"), LastLiked=500.0, X=0.9))
+    await store.delete_star(star("s2"))
+    await store.create_star(star("late", 0.5, 0.5))
+
+    # What a power cut would leave behind: the store was never closed
+    crashed = str(tmp_path / "crashed")
+    shutil.copytree(store.directory, crashed)
+    recovered = MemoryProvider(crashed, columnar=store._columns is not None).open()
+    try:
+        assert len(recovered) == 20
+        assert ids(await recovered.active_stars(200.0)) == ["s1"]
+        assert ids(await recovered.stars_in_viewport(0.5, 0.5, 0.5, 0.5)) == ["late"]
+        assert ids(await recovered.list_stars()) == ids(await store.list_stars())
+        liked = await recovered.get_star("s1")
+        assert liked["LastLiked"] == 500.0
+        assert liked["X"] == 0.05
+        assert await recovered.get_star("s2") is None
+        assert ids(await recovered.stars_by_user("u1")) == ids(await store.stars_by_user("u1"))
+    finally:
+        recovered.close()
+
+@pytest.mark.asyncio
+async def test_torn_tail_is_truncated(store, tmp_path):
+    """Test that a half-written last record is dropped and the journal accepts writes again"""
+    await store.create_star(star("a"))
+    await store.create_star(star("b"))
+    store.close()
+    segment = max(name for name in os.listdir(store.directory) if name.startswith("journal-"))
+    path = os.path.join(store.directory, segment)
+    with open(path, "ab") as f:
+        f.write(b"0badc0de {\"q\":99,\"o\":\"put\"")
+
+    reopened = MemoryProvider(store.directory).open()
+    try:
+        assert ids(await reopened.list_stars()) == ["a", "b"]
+        await reopened.create_star(star("c"))
+    finally:
+        reopened.close()
+    again = MemoryProvider(store.directory).open()
+    try:
+        assert ids(await again.list_stars()) == ["a", "b", "c"]
+    finally:
+        again.close()
+
+@pytest.mark.asyncio
+async def test_corrupt_record_mid_segment_refuses_to_start(store, tmp_path):
+    """Test that a damaged record followed by others fails recovery instead of truncating them"""
+    for star_id in "abcde":
+        await store.create_star(star(star_id))
+    crashed = str(tmp_path / "crashed")
+    shutil.copytree(store.directory, crashed)
+    segment = max(name for name in os.listdir(crashed) if name.startswith("journal-"))
+    path = os.path.join(crashed, segment)
+    with open(path, "rb") as f:
+        lines = f.readlines()
+    # Flip one byte inside the second record's payload
+    damaged = bytearray(lines[1])
+    damaged[20] ^= 0x01
+    lines[1] = bytes(damaged)
+    with open(path, "wb") as f:
+        f.writelines(lines)
+    size = os.path.getsize(path)
+
+    with pytest.raises(RuntimeError, match="Corrupt star journal record"):
+        MemoryProvider(crashed).open()
+    assert os.path.getsize(path) == size
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_share_fsyncs(store, monkeypatch):
+    """Test that writes arriving during an fsync are committed together"""
+    fsyncs = []
+    real_fsync = os.fsync
+
+    def slow_fsync(fd):
+        fsyncs.append(fd)
+        real_fsync(fd)
+        # Give the other writers time to queue behind this commit
+        time.sleep(0.005)
+
+    monkeypatch.setattr(memory_store.os, "fsync", slow_fsync)
+
+    await asyncio.gather(*(store.create_star(star(f"s{i}")) for i in range(200)))
+
+    assert len(store) == 200
+    assert 0 < len(fsyncs) < 50
+    with pytest.raises(ValueError):
+        await store.create_star(star("s0"))
+
+@pytest.mark.asyncio
+async def test_snapshot_replaces_journal_and_queries_match_a_scan(store, monkeypatch):
+    """Test that a snapshot drops covered segments, and the indexed queries and GC"""
+    for i in range(300):
+        await store.create_star(star(f"s{i}", (i % 17) / 8 - 1, (i % 11) / 5 - 1, float(i * 100), f"u{i % 4}"))
+    everything = await store.list_stars()
+
+    seq = store.snapshot()
+
+    names = sorted(os.listdir(store.directory))
+    assert names == [f"journal-{seq + 1:016d}.log", f"snapshot-{seq:016d}.snap"]
+    inside = [s for s in everything if -0.3 <= s["X"] <= 0.25 and -0.6 <= s["Y"] <= 0.2]
+    assert inside
+    assert ids(await store.stars_in_viewport(-0.3, -0.6, 0.25, 0.2)) == ids(inside)
+    assert ids(await store.stars_in_viewport(-50, -50, 50, 50)) == ids(everything)
+    assert ids(await store.active_stars(20000.0)) == ids(s for s in everything if s["LastLiked"] >= 20000.0)
+
+    from src.config.settings import settings
+    from src.tasks.gc_stars import collect_expired_stars
+    monkeypatch.setattr(settings.GC, "MAX_DELETES_PER_SECOND", 100000)
+    deleted = await collect_expired_stars(store, now=86400 + 10000.5)
+
+    assert sorted(deleted) == sorted(f"s{i}" for i in range(101))
+    assert len(store) == 199
+    assert ids(await store.stars_by_user("u0")) == ids(s for s in everything[101:] if s["UserId"] == "u0")
+
+@pytest.mark.asyncio
+async def test_gc_keeps_stars_liked_after_the_scan(store):
+    """Test that a star liked while garbage collection paces itself is not deleted"""
+    for i in range(10):
+        await store.create_star(star(f"s{i}", last_liked=float(i)))
+
+    async def pace(count):
+        # A like arriving between the scan and the first batch
+        await store.update_star(dict(star("s3"), LastLiked=1000.0))
+
+    deleted = await store.delete_expired(100.0, batch_size=4, pace=pace)
+
+    assert sorted(deleted) == sorted(f"s{i}" for i in range(10) if i != 3)
+    assert ids(await store.list_stars()) == ["s3"]
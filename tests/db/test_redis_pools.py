@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from src.db import redis_cache
+from src.db.redis_cache import GuardedRedis, InstrumentedConnectionPool, PoolExhaustedError, get_redis_client
+from src.utils.metrics import redis_pool_acquire, registry
+
+class FakeConnection:
+    """Stands in for a socket connection so the pool can be exercised offline"""
+
+    def __init__(self, **kwargs):
+        self.pid = None
+
+    async def connect(self):
+        pass
+
+    async def can_read_destructive(self):
+        return False
+
+    async def disconnect(self):
+        pass
+
+def test_pool_stats_and_timeout():
+    """Test that the pool reports usage and fails callers past its timeout"""
+    acquired_before = redis_pool_acquire.count("counters")
+
+    async def scenario():
+        pool = InstrumentedConnectionPool(
+            role="counters", max_connections=1, timeout=0.05, connection_class=FakeConnection
+        )
+        connection = await pool.get_connection("GET")
+        busy = pool.stats()
+
+        waiter = asyncio.create_task(pool.get_connection("GET"))
+        await asyncio.sleep(0)
+        waiting = pool.stats()["waiters"]
+        with pytest.raises(PoolExhaustedError):
+            await waiter
+
+        await pool.release(connection)
+        return busy, waiting, pool.stats()
+
+    busy, waiting, idle = asyncio.run(scenario())
+    assert busy["size"] == 1
+    assert busy["in_use"] == 1
+    assert busy["created"] == 1
+    assert waiting == 1
+    assert idle["in_use"] == 0
+    assert idle["waiters"] == 0
+    assert idle["acquired"] == 1
+    assert idle["errors"] == 1
+    assert redis_pool_acquire.count("counters") == acquired_before + 1
+    assert 'redis_pool_acquire_seconds_count{role="counters"}' in registry.render()
+
+def test_exhausted_pool_does_not_trip_breaker(monkeypatch):
+    """Test that waiting in vain for a pooled connection is not counted as a Redis failure"""
+    breaker = redis_cache.CircuitBreaker(1, 1.0, 10.0)
+    monkeypatch.setitem(redis_cache.breakers, "counters", breaker)
+
+    async def scenario():
+        pool = InstrumentedConnectionPool(
+            role="counters", max_connections=1, timeout=0.01, connection_class=FakeConnection
+        )
+        held = await pool.get_connection("GET")
+        client = GuardedRedis(connection_pool=pool)
+        for _ in range(3):
+            with pytest.raises(PoolExhaustedError):
+                await client.execute_command("GET", "key")
+        await pool.release(held)
+
+    asyncio.run(scenario())
+    assert breaker.state == breaker.CLOSED
+    assert breaker.stats()["trips"] == 0
+
+def test_unknown_role():
+    with pytest.raises(ValueError):
+        get_redis_client("sessions")
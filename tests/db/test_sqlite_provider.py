@@ -0,0 +1,122 @@
+import asyncio
+import random
+import sqlite3
+
+import pytest
+
+from src.db.sqlite_provider import SELECT_ACTIVE, SELECT_VIEWPORT, SqliteProvider
+
+def star(star_id, x=0.0, y=0.0, last_liked=100.0, user_id=None):
+    return {
+        "PartitionKey": "STAR_202401",
+        "RowKey": star_id,
+        "X": x,
+        "Y": y,
+        "Message": f"Star {star_id}",
+        "LastLiked": last_liked,
+        "creationDate": 10.0,
+        "UserId": user_id,
+        "Username": None
+    }
+
+@pytest.fixture
+def db(tmp_path):
+    provider = SqliteProvider(str(tmp_path / "stars.db")).open()
+    yield provider
+    provider.close()
+
+def test_round_trip_keeps_entity_shape(db):
+    """Test that stars come back shaped like table entities and updates keep the position"""
+    asyncio.run(db.create_star(star("a", 0.25, -0.5, user_id="u1")))
+
+    assert asyncio.run(db.get_star("a")) == star("a", 0.25, -0.5, user_id="u1")
+    assert asyncio.run(db.get_star("missing")) is None
+
+    liked = dict(asyncio.run(db.get_star("a")), LastLiked=200.0, X=0.9)
+    asyncio.run(db.update_star(liked))
+    stored = asyncio.run(db.get_star("a"))
+    assert stored["LastLiked"] == 200.0
+    assert stored["X"] == 0.25
+
+    asyncio.run(db.delete_star(stored))
+    assert asyncio.run(db.list_stars()) == []
+    with pytest.raises(KeyError):
+        asyncio.run(db.update_star(stored))
+
+def test_refuses_foreign_stars_table(tmp_path):
+    """Test that a database holding some other stars table is not used"""
+    path = str(tmp_path / "stars.db")
+    # The table the legacy SQLAlchemy prototype creates in its stars.db
+    legacy = sqlite3.connect(path)
+    legacy.execute("CREATE TABLE stars (id INTEGER PRIMARY KEY, x FLOAT, y FLOAT, message VARCHAR)")
+    legacy.commit()
+    legacy.close()
+
+    with pytest.raises(RuntimeError, match="SQLITE_PATH"):
+        SqliteProvider(path).open()
+
+    future = sqlite3.connect(path)
+    future.execute("DROP TABLE stars")
+    future.execute("PRAGMA user_version = 99")
+    future.close()
+    with pytest.raises(RuntimeError, match="version 99"):
+        SqliteProvider(path).open()
+
+def test_creates_missing_directory_and_reopens(tmp_path):
+    """Test that a new database gets its directory and schema version, and opens again"""
+    path = str(tmp_path / "data" / "stars.sqlite3")
+    SqliteProvider(path).open().close()
+    provider = SqliteProvider(path).open()
+    try:
+        assert provider._reader().execute("PRAGMA user_version").fetchone()[0] == 1
+    finally:
+        provider.close()
+
+def test_wal_mode_and_indexed_queries(db):
+    """Test WAL journaling and that active and viewport queries use their indexes"""
+    connection = db._reader()
+    assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    def plan(sql, *parameters):
+        return " ".join(row[-1] for row in connection.execute("EXPLAIN QUERY PLAN " + sql, parameters))
+
+    assert "stars_last_liked" in plan(SELECT_ACTIVE, 0.0)
+    # Index 2 is an R*Tree search constrained on the coordinates
+    assert "VIRTUAL TABLE INDEX 2:" in plan(SELECT_VIEWPORT, 0.0, 1.0, 0.0, 1.0)
+
+def test_queries_match_a_scan(db):
+    """Test active, per-user and viewport queries against filtering every star"""
+    rng = random.Random(7)
+    stars = [
+        star(f"s{i}", round(rng.uniform(-1, 1), 3), round(rng.uniform(-1, 1), 3),
+             float(rng.randrange(1000)), f"u{i % 5}")
+        for i in range(500)
+    ]
+    # A star on the viewport's edge, where the R*Tree's 32-bit floats round
+    stars.append(star("edge", 0.1, 0.3))
+    for entity in stars:
+        asyncio.run(db.create_star(entity))
+
+    def ids(found):
+        return sorted(entity["RowKey"] for entity in found)
+
+    assert ids(asyncio.run(db.active_stars(600.0))) == ids(s for s in stars if s["LastLiked"] >= 600.0)
+    assert ids(asyncio.run(db.stars_by_user("u3"))) == ids(s for s in stars if s["UserId"] == "u3")
+    inside = [s for s in stars if -0.2 <= s["X"] <= 0.1 and 0.3 <= s["Y"] <= 0.7]
+    assert "edge" in ids(inside)
+    assert ids(asyncio.run(db.stars_in_viewport(-0.2, 0.3, 0.1, 0.7))) == ids(inside)
+
+def test_gc_deletes_in_batches(db, monkeypatch):
+    """Test a garbage collection pass, including the R*Tree rows of deleted stars"""
+    from src.config.settings import settings
+    from src.tasks.gc_stars import collect_expired_stars
+    monkeypatch.setattr(settings.GC, "MAX_DELETES_PER_SECOND", 100000)
+    monkeypatch.setattr(settings.GC, "BATCH_SIZE", 40)
+    for i in range(250):
+        asyncio.run(db.create_star(star(f"s{i}", last_liked=float(i * 100))))
+
+    deleted = asyncio.run(collect_expired_stars(db, now=86400 + 10000.5))
+
+    assert sorted(deleted) == sorted(f"s{i}" for i in range(101))
+    assert len(asyncio.run(db.list_stars())) == 149
+    assert db._reader().execute("SELECT count(*) FROM star_positions").fetchone()[0] == 149
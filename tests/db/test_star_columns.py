@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from src.db.star_columns import StarColumns
+
+@pytest.fixture
+def store():
+    store = StarColumns(capacity=2)
+    store.append("a", 0.0, 0.0, last_liked=100.0, creation_date=10.0)
+    store.append("b", 0.5, 0.5, last_liked=200.0, creation_date=20.0)
+    store.append("c", -0.5, 0.9, last_liked=300.0, creation_date=30.0)
+    store.append("d", 0.9, -0.9, last_liked=None, creation_date=40.0)
+    return store
+
+# Test vectorized queries
+def test_queries(store):
+    """Test time-window, bounding-box and top-N queries"""
+    assert len(store) == 4
+    assert sorted(store.active_since(200.0)) == ["b", "c"]
+    assert store.expired_before(150.0) == ["a"]
+    assert sorted(store.in_bbox(-0.1, -0.1, 0.6, 0.6)) == ["a", "b"]
+    assert store.top_n(2) == ["c", "b"]
+    assert store.top_n(10) == ["c", "b", "a", "d"]
+
+# Test updates and deletes
+def test_update_and_delete(store):
+    """Test that deletes keep the id index consistent"""
+    assert store.set_last_liked("a", 500.0)
+    assert store.delete("a")
+    assert not store.delete("a")
+    assert "a" not in store
+    assert sorted(store.ids.tolist()) == ["b", "c", "d"]
+
+    # The row moved into the freed slot is still addressable
+    assert store.set_last_liked("d", 400.0)
+    assert store.top_n(1) == ["d"]
+    assert store.delete_many(["b", "c", "missing"]) == 2
+    assert store.ids.tolist() == ["d"]
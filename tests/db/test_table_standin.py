@@ -0,0 +1,144 @@
+import pytest
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    HttpResponseError, ResourceExistsError, ResourceModifiedError, ResourceNotFoundError,
+    ServiceResponseTimeoutError
+)
+from azure.data.tables import TableTransactionError, UpdateMode
+
+from src.db.table_standin import Latency, LocalTableClient
+
+def make_table(count=10, partitions=("STAR_202401", "STAR_202402")):
+    table = LocalTableClient("Stars")
+    for i in range(count):
+        table.create_entity({
+            "PartitionKey": partitions[i % len(partitions)],
+            "RowKey": f"star-{i:03d}",
+            "LastLiked": float(i * 100),
+            "Message": f"Star {i}",
+        })
+    return table
+
+def test_pages_follow_continuation_tokens_in_key_order():
+    """Test that listings page in (PartitionKey, RowKey) order and resume from a token"""
+    table = make_table(10)
+
+    pages = table.list_entities(results_per_page=4).by_page()
+    first = list(next(pages))
+    token = pages.continuation_token
+
+    assert [e["RowKey"] for e in first] == ["star-000", "star-002", "star-004", "star-006"]
+    assert token == {"PartitionKey": "STAR_202401", "RowKey": "star-008"}
+
+    resumed = table.list_entities(results_per_page=4).by_page(continuation_token=token)
+    rest = [e["RowKey"] for page in resumed for e in page]
+    assert rest == ["star-008", "star-001", "star-003", "star-005", "star-007", "star-009"]
+    assert table.calls["list_entities"] == 1 + 2
+
+def test_query_filter_subset_with_parameters():
+    """Test comparisons, and/or/not, parameters, and that missing properties never match"""
+    table = make_table(10)
+    table.create_entity({"PartitionKey": "STAR_202401", "RowKey": "no-likes"})
+
+    def ids(query_filter, **parameters):
+        return sorted(e["RowKey"] for e in table.query_entities(query_filter, parameters=parameters))
+
+    assert ids("LastLiked lt @cutoff", cutoff=300.0) == ["star-000", "star-001", "star-002"]
+    assert ids("PartitionKey eq 'STAR_202402' and LastLiked ge 500") == ["star-005", "star-007", "star-009"]
+    assert ids("RowKey eq 'star-001' or (RowKey eq 'star-002' and not Message eq 'x')") == ["star-001", "star-002"]
+    assert "no-likes" not in ids("LastLiked ne 100")
+    # Values of different types never compare equal
+    assert ids("Message eq 3") == []
+    with pytest.raises(ValueError):
+        table.query_entities("LastLiked lt")
+
+def test_select_projects_properties():
+    """Test that select returns only the named properties"""
+    table = make_table(2)
+
+    entity = next(iter(table.query_entities("RowKey eq @id", parameters={"id": "star-001"}, select=["RowKey"])))
+
+    assert dict(entity) == {"RowKey": "star-001"}
+    assert entity.metadata["etag"]
+
+def test_merge_replace_and_etag_conditions():
+    """Test MERGE keeps other properties, REPLACE drops them, and stale ETags are refused"""
+    table = make_table(1)
+    entity = table.get_entity("STAR_202401", "star-000")
+    # Returned entities are copies, as from the service
+    entity["LastLiked"] = 5.0
+    assert table.get_entity("STAR_202401", "star-000")["LastLiked"] == 0.0
+
+    table.update_entity({"PartitionKey": "STAR_202401", "RowKey": "star-000", "LastLiked": 5.0})
+    assert table.get_entity("STAR_202401", "star-000")["Message"] == "Star 0"
+
+    with pytest.raises(ResourceModifiedError):
+        table.update_entity(entity, match_condition=MatchConditions.IfNotModified)
+
+    fresh = table.get_entity("STAR_202401", "star-000")
+    table.update_entity({"PartitionKey": "STAR_202401", "RowKey": "star-000", "LastLiked": 7.0},
+                        mode=UpdateMode.REPLACE, etag=fresh.metadata["etag"],
+                        match_condition=MatchConditions.IfNotModified)
+    assert dict(table.get_entity("STAR_202401", "star-000")) == {
+        "PartitionKey": "STAR_202401", "RowKey": "star-000", "LastLiked": 7.0
+    }
+
+    with pytest.raises(ResourceExistsError):
+        table.create_entity({"PartitionKey": "STAR_202401", "RowKey": "star-000"})
+    with pytest.raises(ResourceNotFoundError):
+        table.update_entity({"PartitionKey": "STAR_202401", "RowKey": "missing"})
+    # Deleting a missing entity is not an error
+    table.delete_entity("STAR_202401", "missing")
+
+def test_transactions_are_atomic():
+    """Test that one failing operation rejects the whole batch"""
+    table = make_table(4)
+
+    with pytest.raises(TableTransactionError) as error:
+        table.submit_transaction([
+            ("delete", {"PartitionKey": "STAR_202401", "RowKey": "star-000"}),
+            ("delete", {"PartitionKey": "STAR_202401", "RowKey": "gone"}),
+        ])
+    assert error.value.index == 1
+    assert len(table) == 4
+
+    with pytest.raises(ValueError):
+        table.submit_transaction([
+            ("delete", {"PartitionKey": "STAR_202401", "RowKey": "star-000"}),
+            ("delete", {"PartitionKey": "STAR_202402", "RowKey": "star-001"}),
+        ])
+
+    table.submit_transaction([
+        ("delete", {"PartitionKey": "STAR_202401", "RowKey": "star-000"}),
+        ("upsert", {"PartitionKey": "STAR_202401", "RowKey": "star-002", "Message": "kept"}),
+    ])
+    assert len(table) == 3
+    assert table.get_entity("STAR_202401", "star-002")["LastLiked"] == 200.0
+
+def test_throttling_and_timeouts():
+    """Test injected 503s and latency beyond the client's read timeout"""
+    throttled = LocalTableClient("Stars", throttle_rate=1.0, seed=1)
+    with pytest.raises(HttpResponseError) as error:
+        throttled.get_entity("p", "r")
+    assert error.value.status_code == 503
+
+    slow = LocalTableClient("Stars", latency={"get_entity": Latency(50)})
+    with pytest.raises(ServiceResponseTimeoutError):
+        slow.get_entity("p", "r", read_timeout=0.01)
+    # Operations without a latency take none
+    slow.create_entity({"PartitionKey": "p", "RowKey": "r"}, read_timeout=0.01)
+
+@pytest.mark.asyncio
+async def test_gc_pages_and_deletes_in_transactions(monkeypatch):
+    """Test a garbage collection pass against the stand-in end to end"""
+    from src.config.settings import settings
+    from src.db.azure_tables import TableStorageProvider
+    from src.tasks.gc_stars import collect_expired_stars
+    monkeypatch.setattr(settings.GC, "MAX_DELETES_PER_SECOND", 100000)
+    table = make_table(250)
+
+    deleted = await collect_expired_stars(TableStorageProvider(table), now=86400 + 10000.5)
+
+    assert len(deleted) == 101
+    assert len(table) == 149
+    assert table.calls["submit_transaction"] >= 2
@@ -0,0 +1,90 @@
+import asyncio
+from collections import deque
+
+import pytest
+
+from src.db import versioning
+from src.db.versioning import (
+    ChangesTooOld, StarVersion, bump_version, coalesce_changes, get_changes_since, get_version, star_change
+)
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_coalesce_changes():
+    """Test that each star is reduced to its latest change"""
+    entries = [
+        (1, star_change("create", {"id": "a", "x": 0.1, "last_liked": 10})),
+        (2, star_change("update", {"id": "a", "last_liked": 20})),
+        (3, star_change("update", {"id": "b", "last_liked": 30})),
+        (4, star_change("delete", {"id": "b"})),
+    ]
+    assert coalesce_changes(entries) == [
+        {"op": "create", "id": "a", "x": 0.1, "last_liked": 20},
+        {"op": "delete", "id": "b"},
+    ]
+
+def test_local_changes_since():
+    """Test catching up from the local journal"""
+    since = run(get_version())
+    run(bump_version([star_change("create", {"id": "a", "last_liked": 1})]))
+    run(bump_version([star_change("update", {"id": "a", "last_liked": 2})]))
+
+    result = run(get_changes_since(since))
+    assert result["version"] == str(run(get_version()))
+    assert result["changes"] == [{"op": "create", "id": "a", "last_liked": 2}]
+
+    # Up to date clients get no changes
+    assert run(get_changes_since(run(get_version())))["changes"] == []
+
+    # Versions from another counter cannot be compared
+    with pytest.raises(ChangesTooOld):
+        run(get_changes_since(StarVersion("other", since.number)))
+
+def test_unjournaled_bump_requires_resync():
+    """Test that a bump without changes leaves a gap that forces a resync"""
+    since = run(get_version())
+    run(bump_version())
+    with pytest.raises(ChangesTooOld):
+        run(get_changes_since(since))
+
+def test_evicted_changes_require_resync(monkeypatch):
+    """Test that versions past retention are too old"""
+    monkeypatch.setattr(versioning, "_local_journal", deque(maxlen=2))
+    monkeypatch.setattr(versioning, "_local_floor", 0)
+    since = run(get_version())
+    run(bump_version([star_change("delete", {"id": "a"})]))
+    middle = run(get_version())
+    run(bump_version([star_change("delete", {"id": "b"}), star_change("delete", {"id": "c"})]))
+
+    with pytest.raises(ChangesTooOld):
+        run(get_changes_since(since))
+    assert run(get_changes_since(middle))["changes"] == [
+        {"op": "delete", "id": "b"},
+        {"op": "delete", "id": "c"},
+    ]
+
+def test_local_etag_expires_with_time(monkeypatch):
+    """Test that an ETag from a local counter changes with the time bucket and parses back"""
+    now = [1000.0]
+    monkeypatch.setattr(versioning.time, "time", lambda: now[0])
+    local = StarVersion("abc123", 7)
+    shared = StarVersion(versioning.REDIS_EPOCH, 7)
+
+    etag = local.etag()
+    assert StarVersion.parse(etag) == local
+    assert StarVersion.parse(local.etag("-a5")) == local
+
+    now[0] += versioning.LOCAL_ETAG_SECONDS
+    assert local.etag() != etag
+    assert shared.etag() == '"g.7"'
+
+def test_parse_accepts_every_etag_form():
+    """Test that ETags from /stars and /stars/active parse back to their version"""
+    shared = StarVersion(versioning.REDIS_EPOCH, 5)
+    assert StarVersion.parse('"g.5-a123"') == shared
+    assert StarVersion.parse("g.5-a123") == shared
+    assert StarVersion.parse(shared.etag()) == shared
+    for invalid in ("", "g", "g.", "g.x", "g.5-", "g.5 extra"):
+        with pytest.raises(ValueError):
+            StarVersion.parse(invalid)
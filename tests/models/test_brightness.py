@@ -0,0 +1,37 @@
+import pytest
+from pydantic import ValidationError
+
+from src.config.settings import BrightnessSettings, settings
+from src.models.star import calculate_brightness_batch, calculate_current_brightness
+
+@pytest.fixture(params=["exponential", "linear", "legacy"])
+def decay_model(request, monkeypatch):
+    monkeypatch.setattr(settings.BRIGHTNESS, "MODEL", request.param)
+    return request.param
+
+# Test the batch and scalar paths agree
+def test_batch_matches_scalar(decay_model):
+    """Test that the vectorized computation matches the per-star formula"""
+    now = 100000.0
+    last_liked = [now, now - 60, now - 3600, now - 86400, None, now + 10]
+    expected = [calculate_current_brightness(value, now) for value in last_liked]
+    assert calculate_brightness_batch(last_liked, now) == pytest.approx(expected)
+
+# Test the exponential model
+def test_exponential_half_life(monkeypatch):
+    """Test that a star loses half of its brightness above the floor per half-life"""
+    monkeypatch.setattr(settings.BRIGHTNESS, "MODEL", "exponential")
+    cfg = settings.BRIGHTNESS
+    now = 50000.0
+    assert calculate_current_brightness(now, now) == pytest.approx(cfg.MAX)
+    halfway = cfg.MIN + (cfg.MAX - cfg.MIN) / 2
+    assert calculate_current_brightness(now - cfg.HALF_LIFE, now) == pytest.approx(halfway)
+    assert calculate_current_brightness(None, now) == cfg.MIN
+
+# Test that settings which would divide by zero are rejected
+@pytest.mark.parametrize("field", ["HALF_LIFE", "BUCKET_SECONDS"])
+@pytest.mark.parametrize("value", [0, -5])
+def test_rejects_non_positive_periods(field, value):
+    """Test that a zero or negative half-life or bucket fails at startup"""
+    with pytest.raises(ValidationError):
+        BrightnessSettings(**{field: value})
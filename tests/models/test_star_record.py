@@ -0,0 +1,59 @@
+import uuid
+
+import pytest
+
+from src.models.star_record import StarRecord
+from src.api.serialization import star_to_dict
+
+def make_entity(row_key):
+    return {
+        "PartitionKey": "STAR_202501",
+        "RowKey": row_key,
+        "X": 0.25,
+        "Y": -0.5,
+        "Message": "Test Star",
+        "LastLiked": 100.0,
+        "creationDate": 50.0,
+        "UserId": "user-1",
+        "Username": "tester"
+    }
+
+# Test entity round trip
+def test_record_round_trip():
+    """Test that a record converts back to the same entity and API dict"""
+    entity = make_entity(str(uuid.uuid4()))
+    record = StarRecord.from_entity(entity)
+
+    assert isinstance(record.key, int)
+    assert record.id == entity["RowKey"]
+    assert record.to_entity() == entity
+    assert record.to_dict() == star_to_dict(entity)
+
+# Test non-UUID row keys
+def test_record_keeps_non_uuid_ids():
+    """Test that ids that are not canonical UUIDs are stored unchanged"""
+    for row_key in ["debug-1234abcd", str(uuid.uuid4()).upper()]:
+        record = StarRecord.from_entity(make_entity(row_key))
+        assert record.id == row_key
+
+# Test string interning
+def test_record_interns_user_fields():
+    """Test that usernames are shared between records"""
+    records = []
+    for _ in range(2):
+        entity = make_entity(str(uuid.uuid4()))
+        # Separate string objects, as decoded from two different responses
+        entity["Username"] = "".join(["test", "er", str(uuid.uuid4())[:0]])
+        records.append(StarRecord.from_entity(entity))
+    assert records[0].username is records[1].username
+
+# Test that records cannot change under a store's indexes
+def test_record_is_read_only():
+    """Test that setting or deleting a field raises AttributeError"""
+    record = StarRecord.from_entity(make_entity(str(uuid.uuid4())))
+
+    with pytest.raises(AttributeError):
+        record.last_liked = 200.0
+    with pytest.raises(AttributeError):
+        del record.x
+    assert record.last_liked == 100.0
@@ -0,0 +1 @@
+# This file makes the tests/tasks directory a proper package 
\ No newline at end of file
@@ -0,0 +1,128 @@
+import time
+
+import pytest
+
+from src.api.sse_hub import hub
+from src.config.settings import settings
+from src.db.azure_tables import TableStorageProvider
+from src.db.table_standin import LocalTableClient
+from src.tasks import gc_stars
+from src.tasks.gc_stars import DeleteThrottle, collect_expired_stars
+
+class FakeRedis:
+    """The SET NX and DEL calls GC makes, against a dict"""
+
+    def __init__(self):
+        self.values = {}
+        self.deleted = []
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    async def delete(self, *keys):
+        self.deleted.extend(keys)
+        for key in keys:
+            self.values.pop(key, None)
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(gc_stars, "is_cache_initialized", lambda role="cache": True)
+    monkeypatch.setattr(gc_stars, "get_redis_client", lambda role="cache": fake)
+    return fake
+
+@pytest.fixture
+def events(monkeypatch):
+    published = []
+
+    async def publish(event_type, data):
+        published.append((event_type, data))
+
+    monkeypatch.setattr(gc_stars, "publish_star_event", publish)
+    return published
+
+def make_table(count):
+    table = LocalTableClient("Stars")
+    for i in range(count):
+        table.create_entity({
+            "PartitionKey": "STAR_202401",
+            "RowKey": f"star-{i:03d}",
+            "X": 0.0,
+            "Y": 0.0,
+            "Message": f"Star {i}",
+            "LastLiked": float(i * 100),
+        })
+    return table
+
+@pytest.mark.asyncio
+async def test_throttle_paces_deletes():
+    """Test that deletes beyond the rate wait for their share of a second"""
+    throttle = DeleteThrottle(rate=1000)
+    start = time.monotonic()
+
+    await throttle.wait(100)
+    first = time.monotonic() - start
+    await throttle.wait(100)
+    await throttle.wait(100)
+
+    assert first < 0.05
+    assert time.monotonic() - start >= 0.2
+
+@pytest.mark.asyncio
+async def test_lock_lets_one_replica_run(redis):
+    """Test that only the first replica in an interval takes the GC lock"""
+    assert await gc_stars._acquire_gc_lock()
+    assert not await gc_stars._acquire_gc_lock()
+
+    redis.values.clear()
+    assert await gc_stars._acquire_gc_lock()
+
+@pytest.mark.asyncio
+async def test_gc_keeps_stars_liked_after_the_scan(monkeypatch, redis, events):
+    """Test that a like landing between the expired page and its delete keeps the star"""
+    monkeypatch.setattr(settings.GC, "MAX_DELETES_PER_SECOND", 100000)
+    table = make_table(10)
+    original = table.submit_transaction
+
+    def submit_after_like(operations, **kwargs):
+        # A user likes star-003 after GC read it as expired
+        table.update_entity({"PartitionKey": "STAR_202401", "RowKey": "star-003", "LastLiked": 1e12})
+        table.submit_transaction = original
+        return original(operations, **kwargs)
+
+    table.submit_transaction = submit_after_like
+
+    deleted = await collect_expired_stars(TableStorageProvider(table), now=86400 + 500.5)
+
+    assert sorted(deleted) == ["star-000", "star-001", "star-002", "star-004", "star-005"]
+    assert table.get_entity("STAR_202401", "star-003")["LastLiked"] == 1e12
+    assert len(table) == 5
+
+    # One batched delete event for the pass
+    assert events == [("delete", {"ids": deleted})]
+    # Cached copies of the deleted stars and the active list are dropped
+    assert "active_stars" in redis.deleted
+    assert {f"star:{star_id}" for star_id in deleted} <= set(redis.deleted)
+    assert "star:star-003" not in redis.deleted
+
+@pytest.mark.asyncio
+async def test_gc_pass_larger_than_queue_keeps_clients(monkeypatch, redis):
+    """Test that deleting more stars than a connection queue holds does not drop its clients"""
+    monkeypatch.setattr(settings.GC, "MAX_DELETES_PER_SECOND", 100000)
+    count = hub.queue_size + 44
+    table = make_table(count)
+    streams = [hub.register(encoding=encoding, keepalive=False) for encoding in ("sse", "struct")]
+    try:
+        deleted = await collect_expired_stars(TableStorageProvider(table), now=86400 + count * 100)
+
+        assert len(deleted) == count
+        for conn in streams:
+            assert not conn.closed
+            assert conn.queue.qsize() == 1
+    finally:
+        for conn in streams:
+            hub.unregister(conn)
+            conn.close()
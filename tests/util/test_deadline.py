@@ -0,0 +1,128 @@
+import asyncio
+import base64
+import time
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+from azure.core.exceptions import HttpResponseError, ServiceResponseTimeoutError
+from azure.core.pipeline.transport import HttpTransport, RequestsTransportResponse
+from azure.data.tables import TableClient
+
+from src.db import azure_tables
+from src.utils.deadline import DeadlineExceeded, ServiceUnavailable, remaining, set_deadline, within_deadline
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_within_deadline_fails_fast():
+    """Test that a call slower than the remaining budget is answered with 504"""
+    async def scenario():
+        set_deadline(0.05)
+        start = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            await within_deadline(asyncio.sleep(5))
+        return time.monotonic() - start
+
+    assert run(scenario()) < 1
+
+def test_set_deadline_keeps_tighter_budget():
+    """Test that an inner scope cannot extend the request's deadline"""
+    async def scenario():
+        set_deadline(1)
+        set_deadline(60)
+        return remaining()
+
+    assert run(scenario()) <= 1
+
+def test_storage_options_fit_deadline():
+    """Test that retries, backoff and per-attempt timeouts are cut to the remaining budget"""
+    async def scenario(budget):
+        set_deadline(budget)
+        return azure_tables.storage_call_options()
+
+    assert "retry_total" not in azure_tables.storage_call_options()
+
+    options = run(scenario(2))
+    assert options["timeout"] == 1
+    assert options["retry_backoff_max"] <= 1
+    assert (options["retry_total"] + 1) * options["read_timeout"] <= 2
+
+    # Under a second the service timeout would round to 0, and there is no time to retry
+    options = run(scenario(0.5))
+    assert "timeout" not in options
+    assert options["retry_total"] == 0
+    assert options["read_timeout"] <= 0.5
+
+class ThrottledTransport(HttpTransport):
+    """Answers every request with 503 and records what the SDK pipeline sent"""
+
+    def __init__(self):
+        self.requests = []
+        self.sleeps = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def sleep(self, duration):
+        self.sleeps.append(duration)
+
+    def send(self, request, **kwargs):
+        self.requests.append((request.url, kwargs.get("connection_timeout"), kwargs.get("read_timeout")))
+        response = requests.Response()
+        response.status_code = 503
+        response.reason = "Server Busy"
+        response.headers["Content-Type"] = "application/json"
+        response._content = b'{"odata.error":{"code":"ServerBusy","message":{"value":"The server is busy."}}}'
+        return RequestsTransportResponse(request, response)
+
+@pytest.mark.parametrize("budget", [0.5, 3])
+def test_storage_options_bound_the_sdk_pipeline(budget):
+    """Test that a throttled call through the real tables SDK retries and waits only within the budget"""
+    transport = ThrottledTransport()
+    key = base64.b64encode(b"k" * 32).decode()
+    client = TableClient.from_connection_string(
+        f"DefaultEndpointsProtocol=https;AccountName=account;AccountKey={key};EndpointSuffix=core.windows.net",
+        "Stars", transport=transport, **azure_tables.retry_options
+    )
+
+    async def scenario():
+        set_deadline(budget)
+        return azure_tables.storage_call_options()
+
+    with pytest.raises(HttpResponseError):
+        client.get_entity("p", "r", **run(scenario()))
+
+    attempts = len(transport.requests)
+    assert attempts == (1 if budget < 1 else azure_tables._retries_within(budget) + 1)
+    assert sum(transport.sleeps) <= budget / 2
+    for url, connection_timeout, read_timeout in transport.requests:
+        assert attempts * read_timeout <= budget
+        assert connection_timeout == read_timeout
+        service_timeout = parse_qs(urlparse(url).query).get("timeout")
+        assert service_timeout == (None if budget < 1 else [str(int(budget) - 1)])
+
+def test_run_storage_maps_errors():
+    """Test that SDK timeouts become 504 and throttling becomes 503"""
+    def timed_out(**options):
+        raise ServiceResponseTimeoutError("timed out")
+
+    def throttled(**options):
+        error = HttpResponseError("busy")
+        error.status_code = 503
+        raise error
+
+    with pytest.raises(DeadlineExceeded):
+        run(azure_tables.run_storage(timed_out))
+    with pytest.raises(ServiceUnavailable) as excinfo:
+        run(azure_tables.run_storage(throttled))
+    assert excinfo.value.headers["Retry-After"] == "1"
@@ -0,0 +1,64 @@
+import json
+import logging
+import queue
+
+from src.utils.logging import JsonFormatter, NonBlockingQueueHandler, RateSampler
+
+def make_record(msg, *args, level=logging.INFO, name="test"):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+def test_sampler_limits_each_message_template():
+    """Test that records past the per-second limit are dropped per template, and counted"""
+    sampler = RateSampler(per_second=3)
+
+    passed = [sampler.filter(make_record("Liking star %s", i)) for i in range(10)]
+    other = sampler.filter(make_record("Looking up star %s", 1))
+
+    assert passed == [True] * 3 + [False] * 7
+    assert other is True
+    assert sampler.suppressed_total == 7
+
+def test_sampler_reports_suppressed_count_on_next_record(monkeypatch):
+    """Test that the first record of a new second carries the number suppressed"""
+    now = [100.0]
+    monkeypatch.setattr("src.utils.logging.time.monotonic", lambda: now[0])
+    sampler = RateSampler(per_second=1)
+    for i in range(5):
+        sampler.filter(make_record("Liking star %s", i))
+
+    now[0] = 101.0
+    record = make_record("Liking star %s", 99)
+
+    assert sampler.filter(record) is True
+    assert record.suppressed == 4
+
+def test_sampler_never_drops_warnings():
+    """Test that warnings pass whatever the rate"""
+    sampler = RateSampler(per_second=1)
+
+    assert all(sampler.filter(make_record("Slow call %s", i, level=logging.WARNING)) for i in range(10))
+
+def test_json_formatter_includes_extras():
+    """Test that fields passed with extra= become JSON keys"""
+    logger = logging.getLogger("test.json")
+    record = logger.makeRecord("test.json", logging.INFO, __file__, 1, "Liked %s", ("star-1",), None,
+                               extra={"star_id": "star-1", "likes": 3})
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["msg"] == "Liked star-1"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "test.json"
+    assert entry["star_id"] == "star-1"
+    assert entry["likes"] == 3
+
+def test_queue_handler_drops_instead_of_blocking():
+    """Test that a full queue drops records rather than waiting for the writer"""
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=2))
+
+    for i in range(5):
+        handler.handle(make_record("Liking star %s", i))
+
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+    assert handler.queue.get_nowait().msg == "Liking star 0"
@@ -0,0 +1,37 @@
+import asyncio
+import time
+
+from src.utils.loop_monitor import LoopMonitor
+
+def test_monitor_names_blocking_call():
+    """Test that a blocking call on the loop is caught with its stack and ranked"""
+    async def scenario():
+        monitor = LoopMonitor(interval=0.02, threshold=0.05)
+        monitor.start()
+        await asyncio.sleep(0.1)
+        time.sleep(0.3)  # Blocks the loop
+        await asyncio.sleep(0.1)
+        await monitor.stop()
+        return monitor
+
+    monitor = asyncio.run(scenario())
+    assert monitor.stalls == 1
+    assert monitor.max_lag >= 0.25
+    top = monitor.top_sites()[0]
+    assert ":scenario:" in top["site"]
+    assert top["total_ms"] >= 250
+    assert "time.sleep(0.3)" in top["stack"]
+
+def test_monitor_quiet_when_loop_is_free():
+    """Test that ordinary awaits do not count as stalls"""
+    async def scenario():
+        monitor = LoopMonitor(interval=0.02, threshold=0.05)
+        monitor.start()
+        await asyncio.gather(*(asyncio.sleep(0.01) for _ in range(100)))
+        await asyncio.sleep(0.2)
+        await monitor.stop()
+        return monitor
+
+    monitor = asyncio.run(scenario())
+    assert monitor.stalls == 0
+    assert monitor.stats()["blocked"] is None
@@ -0,0 +1,32 @@
+from src.utils.metrics import Family, MetricsRegistry
+
+def test_histogram_renders_cumulative_buckets():
+    """Test that observations land in cumulative buckets with sum and count"""
+    registry = MetricsRegistry()
+    latency = registry.histogram("op_seconds", "Operation latency", ("op",), buckets=(0.1, 1.0))
+    latency.observe(0.05, "read")
+    latency.observe(0.5, "read")
+    latency.observe(5.0, "read")
+
+    lines = registry.render().splitlines()
+    assert 'op_seconds_bucket{op="read",le="0.1"} 1' in lines
+    assert 'op_seconds_bucket{op="read",le="1"} 2' in lines
+    assert 'op_seconds_bucket{op="read",le="+Inf"} 3' in lines
+    assert 'op_seconds_count{op="read"} 3' in lines
+    assert 'op_seconds_sum{op="read"} 5.55' in lines
+
+def test_counters_and_collectors():
+    """Test that counters keep one series per label set and collectors run at scrape time"""
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", ("route", "status"))
+    requests.inc("/stars/{star_id}", "200")
+    requests.inc("/stars/{star_id}", "200")
+    requests.inc("/stars/{star_id}", "404")
+    connections = [3]
+    registry.add_collector(lambda: [Family("open_connections", "gauge", "Open", [({}, connections[0])])])
+
+    connections[0] = 7
+    text = registry.render()
+    assert 'requests_total{route="/stars/{star_id}",status="200"} 2' in text
+    assert 'requests_total{route="/stars/{star_id}",status="404"} 1' in text
+    assert "# TYPE open_connections gauge\nopen_connections 7" in text
@@ -0,0 +1,49 @@
+import threading
+import time
+
+import pytest
+
+from src.utils.profiler import ProfilerBusy, SamplingProfiler
+
+def spin(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+def profile_spinning_thread(profiler, seconds=0.3):
+    stop = threading.Event()
+    worker = threading.Thread(target=spin, args=(stop,), name="spinner")
+    worker.start()
+    try:
+        return profiler.run(seconds, 0.005)
+    finally:
+        stop.set()
+        worker.join()
+
+def test_profile_finds_busy_function():
+    """Test that a thread burning CPU shows up in the collapsed stacks"""
+    profile = profile_spinning_thread(SamplingProfiler())
+
+    assert profile.samples > 10
+    lines = profile.collapsed().splitlines()
+    assert any(line.startswith("spinner;") and ":spin:" in line for line in lines)
+    assert profile.overhead < 0.05
+
+def test_speedscope_output():
+    """Test that speedscope samples index into the shared frame list"""
+    profile = profile_spinning_thread(SamplingProfiler(), seconds=0.1)
+    document = profile.speedscope()
+
+    frames = document["shared"]["frames"]
+    sampled = document["profiles"][0]
+    assert len(sampled["samples"]) == len(sampled["weights"])
+    assert all(0 <= index < len(frames) for stack in sampled["samples"] for index in stack)
+
+def test_one_profile_at_a_time():
+    """Test that a second profile is refused while one is running"""
+    profiler = SamplingProfiler()
+    runner = threading.Thread(target=profiler.run, args=(0.3, 0.01))
+    runner.start()
+    time.sleep(0.05)
+    with pytest.raises(ProfilerBusy):
+        profiler.run(0.1, 0.01)
+    runner.join()
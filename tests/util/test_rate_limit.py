@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from src.utils import rate_limit
+from src.utils.rate_limit import RateLimiter, TokenBucket
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_token_bucket():
+    """Test that the bucket allows a burst, then refills at its rate"""
+    bucket = TokenBucket(capacity=2, rate=1.0, now=0.0)
+    assert bucket.take(0.0) == 0
+    assert bucket.take(0.0) == 0
+    assert bucket.take(0.0) == pytest.approx(1.0)
+    assert bucket.take(0.5) == pytest.approx(0.5)
+    assert bucket.take(1.0) == 0
+
+def test_limiter_degrades_to_local_bucket(monkeypatch):
+    """Test that the limit is enforced per replica when Redis is unavailable"""
+    monkeypatch.setattr(rate_limit, "is_cache_initialized", lambda role="cache": False)
+    clock = FakeClock()
+    limiter = RateLimiter(times=3, seconds=60, clock=clock)
+
+    assert [run(limiter.hit("a")) for _ in range(3)] == [0, 0, 0]
+    assert run(limiter.hit("a")) == pytest.approx(20.0)
+    # Other clients have their own bucket
+    assert run(limiter.hit("b")) == 0
+    assert limiter.stats()["degraded_hits"] == 5
+
+def test_limiter_leases_from_redis(monkeypatch):
+    """Test that busy clients are served from leased tokens and denials are remembered"""
+    monkeypatch.setattr(rate_limit, "is_cache_initialized", lambda role="cache": True)
+    clock = FakeClock()
+    limiter = RateLimiter(times=10, seconds=10, lease_size=4, clock=clock)
+    remote = {"tokens": 10}
+    calls = []
+
+    async def lease(key, requested, cost):
+        calls.append(requested)
+        granted = min(requested, remote["tokens"]) if remote["tokens"] >= cost else 0
+        remote["tokens"] -= granted
+        return granted, 0.0 if granted else 2.0
+
+    monkeypatch.setattr(limiter, "_lease", lease)
+
+    # The first hit takes one token, the next one leases ahead
+    assert run(limiter.hit("a")) == 0
+    assert run(limiter.hit("a")) == 0
+    assert calls == [1, 4]
+    # Leased tokens are spent without going to Redis
+    assert [run(limiter.hit("a")) for _ in range(3)] == [0, 0, 0]
+    assert len(calls) == 2
+
+    remote["tokens"] = 0
+    assert run(limiter.hit("a")) == 2.0
+    clock.now += 1
+    assert run(limiter.hit("a")) == pytest.approx(1.0)
+    assert len(calls) == 3
+
+    # Unused leases expire after lease_ttl
+    clock.now += 5
+    remote["tokens"] = 10
+    assert run(limiter.hit("a")) == 0
+    assert limiter.stats()["local_hits"] == 4
+
+def test_limiter_bounds_tracked_keys(monkeypatch):
+    """Test that the least recently used clients are dropped"""
+    monkeypatch.setattr(rate_limit, "is_cache_initialized", lambda role="cache": False)
+    limiter = RateLimiter(times=1, seconds=60, max_keys=2, clock=FakeClock())
+    for key in ("a", "b", "c"):
+        run(limiter.hit(key))
+    assert limiter.stats()["keys"] == 2
+
+def test_dependency_answers_429_with_retry_after(monkeypatch):
+    """Test that the route dependency enforces the limit in every environment"""
+    from fastapi import HTTPException
+    from starlette.requests import Request
+
+    monkeypatch.setattr(rate_limit, "is_cache_initialized", lambda role="cache": False)
+    limiter = RateLimiter(times=1, seconds=60, clock=FakeClock())
+    dependency = rate_limit.rate_limit(limiter, "vote")
+    request = Request({"type": "http", "headers": [], "client": ("10.0.0.1", 1234)})
+
+    run(dependency(request))
+    with pytest.raises(HTTPException) as denied:
+        run(dependency(request))
+    assert denied.value.status_code == 429
+    assert denied.value.headers["Retry-After"] == "60"
@@ -0,0 +1,38 @@
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.api.serialization import json_response
+from src.utils.middleware import register_middleware
+from src.utils.tracing import RequestTrace, record_span, span
+
+def test_server_timing_sums_spans_per_category():
+    """Test that spans of the same category are summed in first-seen order"""
+    trace = RequestTrace()
+    trace.add("table", trace.start, 0.300)
+    trace.add("redis", trace.start, 0.004)
+    trace.add("table", trace.start, 0.012)
+
+    assert trace.server_timing(0.5) == "table;dur=312.0, redis;dur=4.0, total;dur=500.0"
+
+def test_spans_outside_a_request_are_ignored():
+    """Test that code running without a trace, like background tasks, records nothing"""
+    with span("ser"):
+        pass
+    record_span("table", time.perf_counter(), 0.1)
+
+def test_middleware_adds_server_timing_header():
+    """Test that spans recorded by a route reach the Server-Timing header"""
+    app = FastAPI()
+    register_middleware(app)
+
+    @app.get("/traced")
+    async def traced():
+        record_span("table", time.perf_counter(), 0.25)
+        return json_response({"ok": True})
+
+    response = TestClient(app).get("/traced")
+    timing = response.headers["Server-Timing"]
+    assert timing.startswith("table;dur=250.0, ser;dur=")
+    assert "total;dur=" in timing